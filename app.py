@@ -1,51 +1,62 @@
-import streamlit as st
 import pandas as pd
+import streamlit as st
 import plotly.express as px
-import subprocess
-import os
+from src import data_layer, rollups
 
 st.set_page_config(page_title="Karachi AQI Dashboard", layout="centered")
 st.title("🌫️ Karachi AQI Dashboard (Forecast-Based)")
 
-# --- Paths ---
-daily_csv = "data/daily_predictions.csv"
-forecast_csv = "data/forecast_3day.csv"
-prediction_script = "predict_today.py"
-
-# --- Run prediction script ---
-if os.path.exists(prediction_script):
-    subprocess.run(["python", prediction_script], check=True)
+# --- Background prediction (one refresher per server, not per session) ---
+data_layer.start_refresher()
 
 # --- Latest AQI ---
 st.subheader("📊 Latest Predicted AQI")
-if os.path.exists(daily_csv):
-    df = pd.read_csv(daily_csv)
-    df['prediction_time'] = pd.to_datetime(df['prediction_time'], errors='coerce')
-    df = df.drop_duplicates(subset=['prediction_time'], keep='last')
-    
-    if not df.empty:
-        latest = df.sort_values("prediction_time", ascending=False).iloc[0]
+if data_layer.has_history():
+    latest = data_layer.latest_prediction()
+    if latest is not None:
         st.metric(label="AQI", value=f"{latest['aqi_predicted']:.2f}")
+        if pd.notna(latest.get("aqi_lower")):
+            st.caption(f"Likely range: {latest['aqi_lower']:.0f}–{latest['aqi_upper']:.0f}")
         st.caption(f"🕒 Time: {latest['prediction_time']}")
     else:
         st.warning("⚠️ No prediction data available.")
 else:
-    st.warning("⚠️ daily_predictions.csv not found.")
+    st.warning("⚠️ Prediction history not found.")
+
+# --- History ---
+st.subheader("📉 AQI History")
+ranges = {"7 days": 7, "30 days": 30, "1 year": 365, "All": None}
+choice = st.radio("Range", list(ranges), horizontal=True, label_visibility="collapsed")
+history = data_layer.load_history_series(ranges[choice])
+if history is not None and not history[0].empty:
+    history_df, resolution = history
+    if resolution == "raw":
+        fig = px.line(history_df, x="prediction_time", y="aqi_predicted")
+    else:
+        # Aggregated buckets: the mean, with the p95 and max of each bucket
+        fig = px.line(history_df, x="bucket", y=["aqi_predicted_mean", "aqi_predicted_p95", "aqi_predicted_max"])
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"{resolution.capitalize()} values, {len(history_df)} points")
+else:
+    st.info("No prediction history to chart yet.")
 
 # --- 3-Day Forecast ---
 st.subheader("📈 3-Day AQI Forecast")
-if os.path.exists(forecast_csv):
-    forecast_df = pd.read_csv(forecast_csv)
-    forecast_df['prediction_time'] = pd.to_datetime(forecast_df['prediction_time'], errors='coerce')
-    forecast_df = forecast_df.sort_values("prediction_time")
-    
+# Hourly model forecast when available, else the daily summary
+forecast_df = data_layer.load_hourly_forecast()
+if forecast_df is None:
+    forecast_df = data_layer.load_forecast()
+if forecast_df is not None:
     if not forecast_df.empty:
+        # Interval bounds are drawn when the forecast has them (older files don't)
+        y = [c for c in ["aqi_predicted", "aqi_lower", "aqi_upper"] if c in forecast_df.columns]
         fig = px.line(
-            forecast_df,
+            rollups.downsample(forecast_df, "prediction_time", "aqi_predicted"),
             x="prediction_time",
-            y="aqi_predicted",
+            y=y,
             title="📅 Forecasted AQI for Next 3 Days",
-            markers=True
+            markers=True,
+            hover_data=[c for c in ["dominant_pollutant"] if c in forecast_df.columns],
         )
         st.plotly_chart(fig, use_container_width=True)
     else:
@@ -53,6 +64,26 @@ if os.path.exists(forecast_csv):
 else:
     st.warning("⚠️ Forecast CSV not found.")
 
+# --- AQI across Karachi ---
+st.subheader("🗺️ AQI Across Karachi")
+spatial = data_layer.load_aqi_grid()
+if spatial is not None and spatial[0]["aqi"].notna().any():
+    grid, stations = spatial
+    fig = px.scatter_map(grid.dropna(subset=["aqi"]), lat="lat", lon="lon", color="aqi",
+                         color_continuous_scale="RdYlGn_r", range_color=(0, 300), opacity=0.45,
+                         zoom=9.5, height=500)
+    fig.update_traces(marker_size=9, hoverinfo="skip", hovertemplate=None)
+    if stations is not None and not stations.empty:
+        fig.add_trace(px.scatter_map(stations, lat="lat", lon="lon", hover_name="station",
+                                     hover_data={"aqi": True, "lat": False, "lon": False}).data[0])
+        fig.data[-1].marker.color = "black"
+    fig.update_layout(map_style="open-street-map", margin=dict(l=0, r=0, t=0, b=0))
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"Interpolated from {stations['aqi'].notna().sum() if stations is not None else 0} stations "
+               f"at {grid['time'].iloc[0]}")
+else:
+    st.info("No station map yet (run `python aqi.py spatial`).")
+
 # --- Auto-refresh ---
 from streamlit_autorefresh import st_autorefresh
 st_autorefresh(interval=60*1000, key="datarefresh")
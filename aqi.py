@@ -0,0 +1,169 @@
+"""Single entry point for the pipeline jobs.
+
+Usage: python aqi.py <job> [options]
+       python aqi.py run fetch predict alert
+       python aqi.py schedule [--daemon]
+
+Each job imports its module (and with it pandas, sklearn, matplotlib, ...)
+only when it runs, so `--help` and light jobs start fast. `run` executes
+several jobs in order in one process: the interpreter start-up, the shared
+imports and the in-process model are paid once instead of once per job.
+`schedule` runs only the stages whose inputs changed (see src.scheduler).
+"""
+import sys
+import time
+import argparse
+import importlib
+
+
+def _call(module, func, **kwargs):
+    return getattr(importlib.import_module(module), func)(**kwargs)
+
+
+def fetch(args):
+    return _call("fetech_features", "main")
+
+
+def features(args):
+    return _call("src.build_features", "compute_and_append", full=getattr(args, "full", False))
+
+
+def train(args):
+    return _call("train_model", "main", force=getattr(args, "force", False))
+
+
+def predict(args):
+    return _call("predict_today", "main")
+
+
+def forecast(args):
+    return _call("forecast_aqi", "main")
+
+
+def alert(args):
+    return _call("src.alerts", "check_and_alert")
+
+
+def eda(args):
+    return _call("src.eda", "run_eda", force=getattr(args, "force", False))
+
+
+def spatial(args):
+    return _call("src.spatial", "main", **({"method": args.method} if getattr(args, "method", None) else {}))
+
+
+def explain(args):
+    return _call("src.explain", "main", days=getattr(args, "days", 7))
+
+
+def backfill(args):
+    if getattr(args, "bulk", None):
+        # None keeps backfill_data's default (AQI_STANDARD) without importing it here
+        standard = {"standard": args.standard} if args.standard else {}
+        return _call("backfill_data", "bulk_backfill", paths=args.bulk, start=args.start, end=args.end,
+                     stations=args.stations, fmt=args.format, station=args.station,
+                     averaging=not args.no_averaging, **standard)
+    return _call("backfill_data", "fetch_and_append")
+
+
+def serve(args):
+    kwargs = {k: getattr(args, k) for k in ("host", "port") if getattr(args, k, None) is not None}
+    return _call("src.prediction_service", "serve", **kwargs)
+
+
+# name -> (function, help); `run` accepts every job except serve
+JOBS = {
+    "fetch": (fetch, "fetch the current reading into the rolling feature store"),
+    "features": (features, "build model features from the prediction history"),
+    "train": (train, "train (or update) the model"),
+    "predict": (predict, "predict today's AQI into the history store"),
+    "forecast": (forecast, "write the hourly and 3-day forecasts"),
+    "alert": (alert, "send alerts for the latest prediction and the forecast"),
+    "eda": (eda, "write EDA reports for the feature store"),
+    "explain": (explain, "SHAP explanations of the last week's predictions"),
+    "spatial": (spatial, "interpolate every Karachi station's AQI onto a map grid"),
+    "backfill": (backfill, "append the current reading (or --bulk exports) to the raw data CSV"),
+    "serve": (serve, "run the resident prediction service"),
+}
+
+
+def run(args):
+    """Run several jobs in order in this process; stops at the first failure unless --keep-going.
+
+    Holds the pipeline lock, so it never overlaps a scheduler pass.
+    """
+    from src import scheduler
+    with scheduler.pipeline_lock():
+        return _run_jobs(args)
+
+
+def _run_jobs(args):
+    failed = []
+    for name in args.jobs:
+        print(f"== {name} ==")
+        t0 = time.perf_counter()
+        try:
+            JOBS[name][0](None)
+        except Exception as e:
+            print(f"{name} failed after {time.perf_counter() - t0:.2f}s: {type(e).__name__}: {e}")
+            failed.append(name)
+            if not args.keep_going:
+                break
+        else:
+            print(f"{name} done in {time.perf_counter() - t0:.2f}s")
+    return 1 if failed else 0
+
+
+def schedule(args):
+    return _call("src.scheduler", "main", daemon_mode=args.daemon, stages=args.stages, force=args.force,
+                 dry_run=args.dry_run, max_workers=args.workers)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="aqi", description="Karachi AQI pipeline jobs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, (fn, help_) in JOBS.items():
+        p = sub.add_parser(name, help=help_, description=help_)
+        p.set_defaults(handler=fn)
+        if name in ("train", "eda"):
+            p.add_argument("--force", action="store_true",
+                           help="retrain from scratch" if name == "train" else "re-render every artifact")
+        elif name == "features":
+            p.add_argument("--full", action="store_true", help="rebuild the features file from scratch")
+        elif name == "explain":
+            p.add_argument("--days", type=float, default=7)
+        elif name == "spatial":
+            p.add_argument("--method", choices=["idw", "gp"], help="default: SPATIAL_METHOD or idw")
+        elif name == "backfill":
+            p.add_argument("--bulk", nargs="+", metavar="CSV", help="historical WAQI/OpenAQ export files to load")
+            p.add_argument("--format", choices=["auto", "waqi", "long"], default="auto")
+            p.add_argument("--start")
+            p.add_argument("--end")
+            p.add_argument("--stations", nargs="+")
+            p.add_argument("--station", help="station name for files that don't name one")
+            p.add_argument("--standard", help="AQI breakpoints for concentration exports (default: AQI_STANDARD or epa)")
+            p.add_argument("--no-averaging", action="store_true",
+                           help="index hourly concentrations without 8h/24h averages")
+        elif name == "serve":
+            p.add_argument("--host")
+            p.add_argument("--port", type=int)
+    p = sub.add_parser("run", help="run several jobs in one process, in order",
+                       description="Run several jobs in one process, in order, e.g. `run fetch predict alert`.")
+    p.add_argument("jobs", nargs="+", choices=[name for name in JOBS if name != "serve"])
+    p.add_argument("--keep-going", action="store_true", help="run the remaining jobs after a failure")
+    p.set_defaults(handler=run)
+    p = sub.add_parser("schedule", help="run the stages whose inputs changed, once or as a daemon",
+                       description="Run the pipeline DAG, skipping stages whose inputs are unchanged.")
+    _call("src.scheduler", "build_parser", parser=p)
+    p.set_defaults(handler=schedule)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    result = args.handler(args)
+    return result if isinstance(result, int) and args.command in ("run", "schedule") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,491 @@
+"""Append readings to the raw training data (data/raw_aqi_data_karachi.csv).
+
+python backfill_data.py
+    appends the current reading of the city feed.
+
+python backfill_data.py --bulk exports/*.csv [--start 2019-01-01] [--end 2024-12-31] [--stations "karachi us consulate"]
+                        [--standard epa] [--no-averaging]
+    loads historical bulk exports. Two layouts are recognised from the header:
+
+    - WAQI station exports, one row per day and a column per pollutant
+      ("date, pm25, pm10, o3, no2, so2, co"). The values are per-pollutant
+      AQI sub-indices, so a row's aqi is their maximum. The station is the
+      file name (or --station).
+    - Long exports, one row per station, time and pollutant: OpenAQ
+      ("location, datetime/utc, parameter, value, unit, ...") and the WAQI
+      data platform ("Date, Country, City, Specie, ..., median, ...").
+      WAQI medians are sub-indices already. OpenAQ values are
+      concentrations: they are converted to the units of the AQI tables
+      (src.aqi_calc), averaged per station over the standard's windows
+      (24 h PM, 8 h O3/CO) unless --no-averaging, and stored as
+      sub-indices like every other row of the raw file, with aqi their
+      maximum. Long exports must be sorted by time, oldest first (a chunk's
+      last readings and the averaging windows are carried into the next
+      chunk); a file that goes back in time is rejected.
+
+    Files (also .csv.gz) are read in chunks of CHUNK_ROWS and normalised to
+    the raw schema with a station column. Times with a UTC offset are
+    converted to TIMEZONE. --end is inclusive; a date without a time covers
+    that whole day. A row is skipped if a reading for the same
+    station and minute is already in the raw file, checked against a hash
+    index of (station, minute) keys kept next to it (KEYS_SUFFIX). New rows
+    are appended BATCH_ROWS at a time, so memory stays bounded by the chunk
+    and batch size plus 8 bytes per stored row.
+"""
 import os
+import re
+import json
+import hashlib
+import argparse
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from pandas.tseries.api import guess_datetime_format
+from dotenv import load_dotenv
 from fetch_data import fetch_aqi_data
+from src import aqi_calc, schema
 
 CITY = "karachi"
-TOKEN = "49ac32407e3a6bbf5332f84468ee1cb16ee550fd"  # Your API token
+RAW_DATA_CSV = "data/raw_aqi_data_karachi.csv"
+RAW = schema.DATASETS["raw"]
+TIME_COL = RAW.time_col
+POLLUTANTS = ["pm25", "pm10", "co", "no2", "so2", "o3"]
+RAW_COLUMNS = [TIME_COL, "aqi"] + POLLUTANTS + ["station"]
+# Station of rows written before the raw file had a station column
+DEFAULT_STATION = CITY
+# Local time of the raw file; exports with UTC offsets are converted to it
+TIMEZONE = "Asia/Karachi"
+CHUNK_ROWS = 250_000
+BATCH_ROWS = 500_000
+KEYS_SUFFIX = ".keys.npz"
+# Bytes of the raw file's head stored with the index, to notice a rewritten file
+HEAD_BYTES = 1 << 16
 
-def fetch_and_append():
-    data = fetch_aqi_data(CITY, TOKEN)
-    if data:
-        # Add the current fetch timestamp (regardless of API timestamp)
-        data['fetched_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        df = pd.DataFrame([data])
-        os.makedirs("data", exist_ok=True)
-        file_path = "data/raw_aqi_data_karachi.csv"
-
-        # Append to the CSV
-        if os.path.exists(file_path):
-            df.to_csv(file_path, mode='a', header=False, index=False)
+# Column names of the long layouts (lower-cased)
+_LONG_TIME = ["datetime", "datetimeutc", "datetime_utc", "utc", "date.utc", "date"]
+_LONG_STATION = ["location", "location_name", "locationname", "location_id", "locationid", "city"]
+_LONG_PARAMETER = ["parameter", "specie", "pollutant"]
+_LONG_VALUE = ["value", "median"]
+_LONG_UNIT = ["unit", "units"]
+_PARAMETER_ALIASES = {"pm2.5": "pm25", "pm2_5": "pm25"}
+
+
+def api_token():
+    load_dotenv()
+    token = os.getenv("AQI_API_TOKEN")
+    if not token:
+        raise ValueError("API token not found. Please set AQI_API_TOKEN in your .env file.")
+    return token
+
+
+# --- Hash index of the stored (station, minute) keys ---
+
+def row_keys(times, stations):
+    """uint64 hash per row of (station, time truncated to the minute)."""
+    minutes = pd.Series(np.asarray(times, dtype="datetime64[ns]").astype("datetime64[m]").astype("int64"))
+    frame = pd.DataFrame({"station": pd.Series(np.asarray(stations, dtype=object)).str.lower(),
+                          "minute": minutes})
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def _head_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read(HEAD_BYTES)).hexdigest()
+
+
+def _file_keys(path, offset=0):
+    """Keys of the raw file's rows after byte `offset` (a line boundary), read in chunks."""
+    names = schema._header(path)
+    keys = [np.empty(0, dtype=np.uint64)]
+    with open(path, "rb") as f:
+        if offset:
+            f.seek(offset)
         else:
-            df.to_csv(file_path, index=False)
+            f.readline()
+        usecols = [TIME_COL] + (["station"] if "station" in names else [])
+        try:
+            reader = pd.read_csv(f, header=None, names=names, usecols=usecols, dtype=str, chunksize=CHUNK_ROWS)
+        except pd.errors.EmptyDataError:
+            return keys[0]
+        with reader:
+            for chunk in reader:
+                times = schema.parse_times(chunk[TIME_COL], RAW.time_format)
+                stations = chunk["station"].fillna(DEFAULT_STATION) if "station" in chunk else DEFAULT_STATION
+                stations = pd.Series(stations, index=chunk.index)
+                keys.append(row_keys(times, stations)[times.notna().to_numpy()])
+    return np.unique(np.concatenate(keys))
+
+
+class KeyIndex:
+    """Sorted unique row keys of the raw file, persisted next to it.
+
+    The index records how many bytes of the file it covers. Rows appended
+    by other writers since then are hashed on load; a shrunk or rewritten
+    file is re-indexed from scratch.
+    """
+
+    def __init__(self, path=RAW_DATA_CSV):
+        self.path = path
+        self.index_path = path + KEYS_SUFFIX
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        covered = 0
+        try:
+            with np.load(self.index_path) as saved:
+                meta = json.loads(str(saved["meta"]))
+                if meta["bytes"] <= size and meta["head"] == _head_hash(self.path):
+                    self.keys, covered = saved["keys"], meta["bytes"]
+        except (OSError, KeyError, ValueError):
+            pass
+        if covered < size:
+            print(f"Indexing {self.path} from byte {covered}...")
+            self.keys = np.union1d(self.keys, _file_keys(self.path, covered))
+            self.save()
+
+    def save(self):
+        meta = {"bytes": os.path.getsize(self.path), "head": _head_hash(self.path)}
+        tmp = self.index_path + ".tmp.npz"
+        np.savez(tmp, keys=self.keys, meta=json.dumps(meta))
+        os.replace(tmp, self.index_path)
+
+    def new(self, keys):
+        """Mask of keys not in the index and not repeated earlier in `keys`."""
+        pos = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys) - 1, 0))
+        fresh = self.keys[pos] != keys if len(self.keys) else np.ones(len(keys), dtype=bool)
+        _, first = np.unique(keys, return_index=True)
+        unique = np.zeros(len(keys), dtype=bool)
+        unique[first] = True
+        return fresh & unique
+
+    def add(self, keys):
+        self.keys = np.union1d(self.keys, keys)
+
+
+# --- Writing ---
+
+def _ensure_header(path):
+    """Create the raw file, or add the station column to one written without it."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        with open(path, "w", newline="") as f:
+            f.write(",".join(RAW_COLUMNS) + "\n")
+        return
+    names = schema._header(path)
+    if "station" in names:
+        missing = [c for c in RAW_COLUMNS if c not in names]
+        if missing:
+            raise ValueError(f"{path} lacks the columns {missing}")
+        return
+    # One streaming pass: append ",<station>" to every line
+    print(f"Adding a station column to {path} (existing rows: {DEFAULT_STATION})")
+    tmp = path + ".tmp"
+    with open(path, newline="") as src, open(tmp, "w", newline="") as dst:
+        dst.write(src.readline().rstrip("\r\n") + ",station\n")
+        for line in src:
+            line = line.rstrip("\r\n")
+            if line:
+                dst.write(f"{line},{DEFAULT_STATION}\n")
+    os.replace(tmp, path)
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def _write(path, frames):
+    names = schema._header(path)
+    if not _ends_with_newline(path):
+        with open(path, "a", newline="") as f:
+            f.write("\n")
+    df = pd.concat(frames, ignore_index=True)
+    df[TIME_COL] = _per_unique(df[TIME_COL], lambda v: pd.to_datetime(v).dt.strftime(RAW.time_format))
+    df.reindex(columns=names).to_csv(path, mode="a", header=False, index=False)
+    return len(df)
+
+
+class Writer:
+    """Dedups rows against the key index and appends them in batches."""
+
+    def __init__(self, path=RAW_DATA_CSV, batch_rows=BATCH_ROWS):
+        self.path = path
+        self.batch_rows = batch_rows
+        _ensure_header(path)
+        self.index = KeyIndex(path)
+        self.pending = []
+        self.pending_rows = 0
+        self.written = 0
+        self.duplicates = 0
+
+    def add(self, frame):
+        if frame.empty:
+            return
+        keys = row_keys(frame[TIME_COL], frame["station"])
+        keep = self.index.new(keys)
+        self.duplicates += int((~keep).sum())
+        if keep.any():
+            self.index.add(keys[keep])
+            self.pending.append(frame[keep])
+            self.pending_rows += int(keep.sum())
+        if self.pending_rows >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.written += _write(self.path, self.pending)
+            self.pending, self.pending_rows = [], 0
+            self.index.save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+        return False
+
+
+# --- Reading bulk exports ---
 
-        print(f"{data['fetched_at']} ✅ Data saved")
+def _find(columns, candidates):
+    lower = {c.lower(): c for c in columns}
+    return next((lower[c] for c in candidates if c in lower), None)
+
+
+def _columns(path):
+    return list(pd.read_csv(path, comment="#", skipinitialspace=True, nrows=0).columns)
+
+
+def _open_chunks(path, chunk_rows, dtype=str):
+    return pd.read_csv(path, comment="#", skipinitialspace=True, dtype=dtype, chunksize=chunk_rows)
+
+
+def detect_format(path):
+    """"waqi" (wide) or "long", from the export's header."""
+    columns = _columns(path)
+    if _find(columns, _LONG_PARAMETER) and _find(columns, _LONG_VALUE):
+        return "long"
+    if _find(columns, ["date", "datetime"]) and any(c.strip().lower() in POLLUTANTS for c in columns):
+        return "waqi"
+    raise ValueError(f"{path}: unrecognised export layout (columns: {', '.join(columns)})")
+
+
+def _per_unique(values, fn):
+    """fn applied to the distinct values only; long exports repeat each time and station many times."""
+    codes, uniques = pd.factorize(values)
+    mapped = pd.Series(fn(pd.Series(uniques, dtype=object))).to_numpy()
+    out = mapped.take(np.maximum(codes, 0))
+    if (codes < 0).any():
+        out = pd.Series(out).where(codes >= 0).to_numpy()
+    return pd.Series(out, index=values.index)
+
+
+def parse_export_times(values):
+    """Naive local timestamps; values with a UTC offset (or Z) are converted to TIMEZONE."""
+    return _per_unique(values, _parse_times).astype("datetime64[ns]")
+
+
+def _parse_times(values):
+    values = values.str.strip()
+    aware = values.str.contains(r"(?:Z|[+-]\d\d:?\d\d)$", na=False).to_numpy()
+    out = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    if aware.any():
+        utc = pd.to_datetime(values[aware], format="ISO8601", utc=True, errors="coerce")
+        out[aware] = utc.dt.tz_convert(TIMEZONE).dt.tz_localize(None)
+    if (~aware).any():
+        naive = values[~aware]
+        first = naive.dropna()
+        # The format of the first value, with per-value parsing only for those that don't match it
+        fmt = guess_datetime_format(first.iloc[0]) if len(first) else None
+        out[~aware] = schema.parse_times(naive, fmt or "mixed")
+    return out
+
+
+def _finish(df, start, end, stations):
+    """Drop rows outside [start, end), the station list or without a time; order the raw columns."""
+    keep = df[TIME_COL].notna()
+    if start is not None:
+        keep &= df[TIME_COL] >= start
+    if end is not None:
+        keep &= df[TIME_COL] < end
+    if stations:
+        keep &= df["station"].str.lower().isin(stations)
+    df = df[keep].reindex(columns=RAW_COLUMNS)
+    return df.astype({name: "float32" for name in ["aqi"] + POLLUTANTS})
+
+
+def _waqi_chunks(path, station, chunk_rows):
+    # Values are parsed as numbers by the reader; only the dates are kept as text
+    time_col = _find(_columns(path), ["date", "datetime"])
+    for chunk in _open_chunks(path, chunk_rows, dtype={time_col: str}):
+        chunk.columns = [c.strip().lower() for c in chunk.columns]
+        time_col = "date" if "date" in chunk.columns else "datetime"
+        out = pd.DataFrame({TIME_COL: parse_export_times(chunk[time_col])})
+        for name in POLLUTANTS:
+            out[name] = pd.to_numeric(chunk[name], errors="coerce").astype("float32") if name in chunk else np.nan
+        out["aqi"] = aqi_calc.combine(out[POLLUTANTS])[0]
+        out["station"] = station
+        yield out
+
+
+def _pivot(chunk, time_col, station_col, parameter_col, value_col, unit_col=None):
+    params = _per_unique(chunk[parameter_col], lambda v: v.str.strip().str.lower().replace(_PARAMETER_ALIASES))
+    long = pd.DataFrame({TIME_COL: parse_export_times(chunk[time_col]),
+                         "station": _per_unique(chunk[station_col], lambda v: v.str.strip()),
+                         "parameter": params,
+                         "value": pd.to_numeric(chunk[value_col], errors="coerce").astype("float64")})
+    long = long[long["parameter"].isin(POLLUTANTS)]
+    if unit_col is not None:
+        units = chunk.loc[long.index, unit_col].fillna("")
+        for (name, unit), rows in long.groupby([long["parameter"], units], sort=False).groups.items():
+            if unit:
+                long.loc[rows, "value"] = aqi_calc.convert(long.loc[rows, "value"], name, unit)
+    wide = long.pivot_table(index=[TIME_COL, "station"], columns="parameter", values="value",
+                            aggfunc="mean", observed=True).reset_index()
+    wide.columns.name = None
+    for name in POLLUTANTS:
+        wide[name] = wide[name].astype("float32") if name in wide else np.float32("nan")
+    return wide
+
+
+def end_bound(end):
+    """Exclusive upper bound for an inclusive --end: the next day for a date, else just after the time."""
+    if end is None:
+        return None
+    if isinstance(end, str) and re.fullmatch(r"\d{4}-\d{1,2}-\d{1,2}", end.strip()):
+        return pd.Timestamp(end.strip()) + pd.Timedelta(days=1)
+    return pd.Timestamp(end) + pd.Timedelta(1, "ns")
+
+
+def _in_order(wide, latest, path):
+    """Latest time so far; raises if `wide` starts before it."""
+    times = wide[TIME_COL].dropna()
+    if times.empty:
+        return latest
+    if latest is not None and times.min() < latest:
+        raise ValueError(f"{path}: rows go back in time ({times.min()} after {latest}); "
+                         f"long exports must be sorted by time, oldest first")
+    return times.max() if latest is None else max(latest, times.max())
+
+
+def _long_chunks(path, station, chunk_rows):
+    """Pivoted chunks of a long export, which must be sorted by time."""
+    cols = None
+    carry = None
+    latest = None
+    for chunk in _open_chunks(path, chunk_rows):
+        if cols is None:
+            cols = (_find(chunk.columns, _LONG_TIME), _find(chunk.columns, _LONG_STATION),
+                    _find(chunk.columns, _LONG_PARAMETER), _find(chunk.columns, _LONG_VALUE),
+                    _find(chunk.columns, _LONG_UNIT))
+            if cols[0] is None:
+                raise ValueError(f"{path}: no time column")
+        if station is not None or cols[1] is None:
+            cols = (cols[0], "_station") + cols[2:]
+            chunk["_station"] = station or os.path.basename(path).split(".")[0]
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        # Rows of the chunk's last timestamp may continue in the next chunk
+        last = chunk[cols[0]].iloc[-1]
+        tail = (chunk[cols[0]] == last).to_numpy()
+        carry, chunk = chunk[tail], chunk[~tail]
+        if not chunk.empty:
+            wide = _pivot(chunk, *cols)
+            latest = _in_order(wide, latest, path)
+            yield wide
+    if carry is not None and not carry.empty:
+        wide = _pivot(carry, *cols)
+        _in_order(wide, latest, path)
+        yield wide
+
+
+def _indexed(chunks, standard, averaging):
+    """Chunks of concentrations -> chunks of sub-indices, with aqi their maximum.
+
+    Averages need the readings before a chunk: the last (longest window) of
+    readings per station is carried into the next one.
+    """
+    span = max(pd.Timedelta(w) for w in aqi_calc.AVERAGING.values())
+    history = None
+    for wide in chunks:
+        if averaging:
+            both = wide if history is None else pd.concat([history, wide], ignore_index=True)
+            history = both[both[TIME_COL] > both[TIME_COL].max() - span]
+            wide = aqi_calc.averaged(both, TIME_COL, by="station").iloc[len(both) - len(wide):]
+        wide = wide.reset_index(drop=True)
+        wide[POLLUTANTS] = aqi_calc.sub_indices(wide, standard, POLLUTANTS).astype("float32")
+        wide["aqi"] = aqi_calc.combine(wide[POLLUTANTS])[0]
+        yield wide
+
+
+def read_export(path, fmt="auto", station=None, start=None, end=None, stations=None, chunk_rows=CHUNK_ROWS,
+                standard=aqi_calc.STANDARD, averaging=True):
+    """Yield the rows of a bulk export in the raw schema, chunk by chunk."""
+    fmt = detect_format(path) if fmt == "auto" else fmt
+    start = pd.Timestamp(start) if start is not None else None
+    end = end_bound(end)
+    stations = {s.lower() for s in stations} if stations else None
+    if fmt == "waqi":
+        name = station or os.path.basename(path).split(".")[0]
+        chunks = _waqi_chunks(path, name, chunk_rows)
+    elif _find(_columns(path), _LONG_VALUE).lower() == "median":
+        # The WAQI data platform gives sub-indices
+        chunks = (df.assign(aqi=aqi_calc.combine(df[POLLUTANTS])[0]) for df in _long_chunks(path, station, chunk_rows))
+    else:
+        chunks = _indexed(_long_chunks(path, station, chunk_rows), standard, averaging)
+    for df in chunks:
+        yield _finish(df, start, end, stations)
+
+
+def bulk_backfill(paths, start=None, end=None, stations=None, fmt="auto", station=None,
+                  out=RAW_DATA_CSV, chunk_rows=CHUNK_ROWS, batch_rows=BATCH_ROWS,
+                  standard=aqi_calc.STANDARD, averaging=True):
+    """Load bulk exports into the raw data file; returns (rows written, duplicates skipped)."""
+    with Writer(out, batch_rows) as writer:
+        for path in paths:
+            before = writer.written + writer.pending_rows
+            for df in read_export(path, fmt, station, start, end, stations, chunk_rows, standard, averaging):
+                writer.add(df)
+            print(f"{path}: {writer.written + writer.pending_rows - before} new rows")
+    print(f"✅ {writer.written} rows written to {out}, {writer.duplicates} duplicates skipped")
+    return writer.written, writer.duplicates
+
+
+def fetch_and_append(out=RAW_DATA_CSV):
+    data = fetch_aqi_data(CITY, api_token())
+    if data:
+        row = pd.DataFrame([{**data, "station": CITY}])
+        row[TIME_COL] = pd.to_datetime(row[TIME_COL])
+        with Writer(out) as writer:
+            writer.add(row.reindex(columns=RAW_COLUMNS))
+        if writer.written:
+            print(f"{row[TIME_COL].iloc[0]:%Y-%m-%d %H:%M:%S} ✅ Data saved")
+        else:
+            print(f"{row[TIME_COL].iloc[0]:%Y-%m-%d %H:%M} already stored")
     else:
         print(datetime.now(), "❌ Fetch failed")
 
+
 if __name__ == "__main__":
-    fetch_and_append()
+    parser = argparse.ArgumentParser(description="Append the current reading, or bulk exports, to the raw data.")
+    parser.add_argument("--bulk", nargs="+", metavar="CSV", help="historical export files to load")
+    parser.add_argument("--format", choices=["auto", "waqi", "long"], default="auto")
+    parser.add_argument("--start", help="first time to load, e.g. 2019-01-01")
+    parser.add_argument("--end", help="last time to load; a date includes the whole day")
+    parser.add_argument("--stations", nargs="+", help="only these stations (case-insensitive)")
+    parser.add_argument("--station", help="station name for files that don't name one (default: file name)")
+    parser.add_argument("--standard", default=aqi_calc.STANDARD,
+                        help=f"AQI breakpoints for concentration exports (default {aqi_calc.STANDARD})")
+    parser.add_argument("--no-averaging", action="store_true",
+                        help="index hourly concentrations as they are instead of 8h/24h averages")
+    args = parser.parse_args()
+    if args.bulk:
+        bulk_backfill(args.bulk, args.start, args.end, args.stations, args.format, args.station,
+                      standard=args.standard, averaging=not args.no_averaging)
+    else:
+        fetch_and_append()
@@ -0,0 +1,95 @@
+"""AQI from concentrations: per-row breakpoint lookups vs. src.aqi_calc.
+
+Usage: python -m benchmarks.bench_aqi_calc [--rows 1000000 10000000] [--loop-rows 100000]
+
+Synthetic readings (benchmarks.synthetic) of all six pollutants, in the
+units of the EPA tables, are turned into sub-indices, the AQI and the
+dominant pollutant three ways: a Python loop over the breakpoint table per
+value (on --loop-rows rows, the textbook implementation), pd.cut per
+pollutant, and aqi_calc.compute (np.searchsorted). The averaging windows
+(aqi_calc.averaged, 8 h / 24 h per station) are timed separately. Reported:
+seconds and rows per second.
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from src import aqi_calc
+from benchmarks import synthetic
+
+# Synthetic gases are generated in µg/m³ (CO in mg/m³)
+UNITS = {"pm25": "ug/m3", "pm10": "ug/m3", "o3": "ug/m3", "co": "mg/m3", "no2": "ug/m3", "so2": "ug/m3"}
+
+
+def readings(n_rows, stations=5):
+    df = pd.concat(synthetic.Generator(stations).chunks(n_rows), ignore_index=True)
+    for p in aqi_calc.POLLUTANTS:
+        df[p] = aqi_calc.convert(df[p], p, UNITS[p])
+    return df
+
+
+def per_row(df, standard=aqi_calc.STANDARD):
+    """One lookup per value, walking the table."""
+    tables = {p: aqi_calc.STANDARDS[standard][p] for p in aqi_calc.POLLUTANTS}
+    aqi, dominant = [], []
+    for row in df[aqi_calc.POLLUTANTS].itertuples(index=False):
+        best, name = None, None
+        for p, c in zip(aqi_calc.POLLUTANTS, row):
+            if c != c:
+                continue
+            c = int(max(c, 0) * 10 ** aqi_calc.DECIMALS[p]) / 10 ** aqi_calc.DECIMALS[p]
+            for lo, hi, ilo, ihi in tables[p]:
+                if c <= hi or (lo, hi) == tables[p][-1][:2]:
+                    c = min(c, hi)
+                    value = int((ihi - ilo) / (hi - lo) * (c - lo) + ilo + 0.5)
+                    break
+            if best is None or value > best:
+                best, name = value, p
+        aqi.append(best)
+        dominant.append(name)
+    return aqi, dominant
+
+
+def with_cut(df, standard=aqi_calc.STANDARD):
+    """pd.cut into the table's ranges, then the interpolation per pollutant."""
+    out = {}
+    for p in aqi_calc.POLLUTANTS:
+        lo, hi, ilo, ihi = aqi_calc.breakpoints(p, standard)
+        scale = 10.0 ** aqi_calc.DECIMALS[p]
+        c = (np.floor(df[p] * scale + 1e-9) / scale).clip(0, hi[-1])
+        i = pd.cut(c, np.concatenate([[-np.inf], hi[:-1], [np.inf]]), labels=False).to_numpy()
+        i = np.nan_to_num(i, nan=0).astype(int)
+        out[p] = np.floor(ilo[i] + (ihi[i] - ilo[i]) / (hi[i] - lo[i]) * (c - lo[i]) + 0.5)
+    return aqi_calc.combine(pd.DataFrame(out))
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--loop-rows", type=int, default=100_000, help="rows for the per-row loop")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'method':<26} {'seconds':>8} {'rows/s':>14}")
+    for n in args.rows:
+        df = readings(n)
+        sample = df.iloc[:args.loop_rows]
+        (loop_aqi, _), seconds = timed(lambda: per_row(sample))
+        print(f"{len(sample):>10} {'per-row loop':<26} {seconds:>8.2f} {len(sample) / seconds:>14,.0f}")
+        (cut_aqi, _), seconds = timed(lambda: with_cut(df))
+        print(f"{n:>10} {'pd.cut':<26} {seconds:>8.2f} {n / seconds:>14,.0f}")
+        result, seconds = timed(lambda: aqi_calc.compute(df))
+        print(f"{n:>10} {'aqi_calc.compute':<26} {seconds:>8.2f} {n / seconds:>14,.0f}")
+        assert np.allclose(result["aqi"].to_numpy()[:len(sample)], np.array(loop_aqi, dtype=float), equal_nan=True)
+        assert np.allclose(result["aqi"], cut_aqi, equal_nan=True)
+        _, seconds = timed(lambda: aqi_calc.averaged(df, "timestamp", by="station"))
+        print(f"{n:>10} {'aqi_calc.averaged':<26} {seconds:>8.2f} {n / seconds:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Bulk backfill: whole-file pandas load vs. backfill_data.bulk_backfill.
+
+Usage: python -m benchmarks.bench_backfill [--rows 1000000] [--stations 5]
+
+Synthetic readings (benchmarks.synthetic) are written as an OpenAQ-style
+long export (one row per station, hour and pollutant) and as WAQI wide
+exports (one file per station). Each is loaded into an empty raw file
+twice: the second load only finds duplicates. The in-memory baseline reads
+the export and the raw file whole, pivots, drops duplicates and rewrites
+the file. Reported: seconds, rows/s of the export and peak memory.
+"""
+import os
+import time
+import argparse
+import tempfile
+import pandas as pd
+import backfill_data
+from benchmarks import synthetic
+from benchmarks.bench_pipeline import _reset_peak, _peak_bytes
+
+POLLUTANTS = backfill_data.POLLUTANTS
+
+
+def write_exports(tmp, n_rows, stations):
+    """Long export with n_rows readings (x6 pollutant rows) and one WAQI file per station."""
+    long_path = os.path.join(tmp, "openaq.csv")
+    wide_paths = {}
+    gen = synthetic.Generator(stations)
+    for i, chunk in enumerate(gen.chunks(n_rows, 200_000)):
+        ts = chunk["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%S+05:00")
+        long = chunk.assign(datetime=ts).melt(id_vars=["datetime", "station"], value_vars=POLLUTANTS,
+                                              var_name="parameter", value_name="value")
+        long = long.sort_values(["datetime", "station"], kind="stable")
+        long.rename(columns={"station": "location"}).to_csv(long_path, mode="a", header=i == 0, index=False)
+        for name, rows in chunk.groupby("station"):
+            path = wide_paths.setdefault(name, os.path.join(tmp, f"{name}.csv"))
+            wide = rows[POLLUTANTS].assign(date=rows["timestamp"].dt.strftime("%Y/%m/%d %H:%M"))
+            wide[["date"] + POLLUTANTS].to_csv(path, mode="a", header=i == 0, index=False)
+    return long_path, list(wide_paths.values())
+
+
+def in_memory(paths, out):
+    """Everything in one frame: read, pivot, concat with the raw file, dedup, rewrite."""
+    frames = [pd.read_csv(out)] if os.path.getsize(out) else []
+    for path in paths:
+        long = pd.read_csv(path)
+        long["datetime"] = pd.to_datetime(long["datetime"], utc=True).dt.tz_convert(
+            backfill_data.TIMEZONE).dt.tz_localize(None).dt.strftime(backfill_data.RAW.time_format)
+        wide = long.pivot_table(index=["datetime", "location"], columns="parameter", values="value").reset_index()
+        frames.append(wide.rename(columns={"location": "station"}))
+    df = pd.concat(frames, ignore_index=True).drop_duplicates(["datetime", "station"])
+    df.reindex(columns=backfill_data.RAW_COLUMNS).to_csv(out, index=False)
+
+
+def measure(fn):
+    base = _reset_peak()
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0, (_peak_bytes() - base) / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000, help="station-hours in the export")
+    parser.add_argument("--stations", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        long_path, wide_paths = write_exports(tmp, args.rows, args.stations)
+        n_long = args.rows * len(POLLUTANTS)
+        results = []
+        out = os.path.join(tmp, "baseline.csv")
+        open(out, "w").close()
+        for run in ("first", "again"):
+            results.append((f"in-memory, long, {run}", n_long) + measure(lambda: in_memory([long_path], out)))
+        for label, paths, n in [("bulk_backfill, long", [long_path], n_long),
+                                ("bulk_backfill, waqi", wide_paths, args.rows)]:
+            out = os.path.join(tmp, f"raw-{label[-4:]}.csv")
+            for run in ("first", "again"):
+                results.append((f"{label}, {run}", n) + measure(
+                    lambda: backfill_data.bulk_backfill(paths, out=out)))
+    print(f"\n{'load':<30} {'seconds':>8} {'export rows/s':>14} {'peak MB':>8}")
+    for label, n, seconds, peak in results:
+        print(f"{label:<30} {seconds:>8.2f} {n / seconds:>14,.0f} {peak:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Walk-forward backtest cost vs. dataset size, serial and across the process pool.
+
+Usage: python -m benchmarks.bench_backtest [--sizes 1000 10000] [--models random_forest persistence]
+
+Synthetic hourly data (benchmarks.bench_train_model.synthetic_raw plus a
+datetime column) is written to a temporary CSV and backtested once with one
+worker and once with BACKTEST_WORKERS (all cores by default). The pooled
+report is printed as the backtest CLI would.
+"""
+import os
+import time
+import argparse
+import tempfile
+import pandas as pd
+from src import backtest
+from benchmarks.bench_train_model import synthetic_raw
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**3, 10**4])
+    parser.add_argument("--models", nargs="+", default=list(backtest.MODELS))
+    parser.add_argument("--folds", type=int, default=backtest.N_FOLDS)
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            df = synthetic_raw(n)
+            df.insert(0, "datetime", pd.date_range("2020-01-01", periods=n, freq="h").strftime("%m/%d/%Y %H:%M"))
+            path = os.path.join(tmp, f"raw_{n}.csv")
+            df.to_csv(path, index=False)
+            timings = {}
+            for workers in sorted({1, backtest.MAX_WORKERS}):
+                t0 = time.perf_counter()
+                report = backtest.run(path, args.models, args.folds, max_workers=workers)
+                timings[workers] = time.perf_counter() - t0
+            print(f"\n== {n:,} rows ==")
+            backtest.print_summary(report)
+            rows.append((n, timings))
+
+    print(f"\n{os.cpu_count()} cores")
+    print(f"{'rows':>10} {'1 worker':>10} {f'{backtest.MAX_WORKERS} workers':>11}")
+    for n, timings in rows:
+        print(f"{n:>10,} {timings[1]:>9.2f}s {timings[backtest.MAX_WORKERS]:>10.2f}s")
+
+
+if __name__ == "__main__":
+    main()
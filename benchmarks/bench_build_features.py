@@ -0,0 +1,65 @@
+"""Incremental feature build time as the prediction history grows.
+
+Usage: python -m benchmarks.bench_build_features [--sizes 1000 10000 100000 1000000]
+
+For each size, a history of one prediction per minute is written to a
+temporary store (closed months compacted), the features file is built once,
+then NEW_ROWS more predictions arrive and the incremental run is timed.
+"""
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from src import history_store, build_features
+
+NEW_ROWS = 100
+
+
+def make_history(start, n):
+    times = pd.date_range(start, periods=n, freq="min")
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({"prediction_time": times, "aqi_predicted": rng.uniform(50, 300, n).round(2)})
+
+
+def write_history(df, root):
+    """Bulk-load by month (upsert would write one file per day)."""
+    for month, rows in df.groupby(df["prediction_time"].dt.strftime("%Y-%m")):
+        history_store._write(history_store._normalize(rows),
+                             os.path.join(root, month, history_store.COMPACTED_FILE))
+    history_store._touch(root)
+
+
+def run(n):
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "history")
+        kwargs = dict(features_file=os.path.join(tmp, "features.csv"),
+                      watermark_file=os.path.join(tmp, "watermark.json"), history_root=root)
+        history = make_history("2020-01-01", n + NEW_ROWS)
+        write_history(history.iloc[:n], root)
+
+        t0 = time.perf_counter()
+        build_features.compute_and_append(full=True, **kwargs)
+        full = time.perf_counter() - t0
+
+        history_store.upsert(history.iloc[n:], root=root)
+        t0 = time.perf_counter()
+        added = build_features.compute_and_append(**kwargs)
+        incremental = time.perf_counter() - t0
+        assert added == NEW_ROWS, added
+    return full, incremental
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**3, 10**4, 10**5, 10**6])
+    args = parser.parse_args()
+    results = [(n, *run(n)) for n in args.sizes]
+    print(f"{'history rows':>14} {'full build':>12} {'incremental':>12}")
+    for n, full, incremental in results:
+        print(f"{n:>14,} {full * 1000:>9.1f} ms {incremental * 1000:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
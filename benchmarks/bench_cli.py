@@ -0,0 +1,65 @@
+"""Wall time of the short jobs: one script per job vs. `aqi.py run` in one process.
+
+Usage: python -m benchmarks.bench_cli [--jobs fetch predict forecast alert] [--repeat 3]
+
+A scratch workspace gets a small synthetic history, features store and
+trained model (as in benchmarks.bench_pipeline), and WAQI points at the
+local mock. The jobs are then run as separate `python <script>` processes,
+the way the workflows call them, and as one `python aqi.py run ...`.
+Also reported: the start-up of `aqi.py --help`.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+from benchmarks import bench_pipeline, mock_waqi
+
+SCRIPTS = {
+    "fetch": ["fetech_features.py"],
+    "predict": ["predict_today.py"],
+    "forecast": ["forecast_aqi.py"],
+    "alert": ["-m", "src.alerts"],
+    "eda": ["-m", "src.eda"],
+}
+SETUP_ROWS = 1000
+
+
+def timed_run(cmd, cwd, env):
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable] + cmd, cwd=cwd, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", nargs="+", choices=list(SCRIPTS), default=["fetch", "predict", "forecast", "alert"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    repo = os.getcwd()
+    server, url = mock_waqi.start()
+    env = {**os.environ, "AQI_API_TOKEN": "bench", "WAQI_BASE_URL": url, "PREDICTION_SERVICE_URL": "",
+           "HTTP_CACHE_TTL": "0", "METRICS_LOG": "", "MPLBACKEND": "Agg",
+           "PYTHONPATH": os.pathsep.join(filter(None, [repo, os.getenv("PYTHONPATH")]))}
+    try:
+        with tempfile.TemporaryDirectory() as workspace:
+            bench_pipeline.prepare(workspace, SETUP_ROWS)
+            scripts = [[os.path.join(repo, c) if c.endswith(".py") else c for c in SCRIPTS[job]] for job in args.jobs]
+            cli = [os.path.join(repo, "aqi.py")]
+            help_s = min(timed_run(cli + ["--help"], workspace, env) for _ in range(args.repeat))
+            separate = min(sum(timed_run(s, workspace, env) for s in scripts) for _ in range(args.repeat))
+            together = min(timed_run(cli + ["run"] + args.jobs, workspace, env) for _ in range(args.repeat))
+    finally:
+        server.shutdown()
+    jobs = " ".join(args.jobs)
+    print()
+    for label, seconds in [("aqi.py --help", help_s), (f"{len(args.jobs)} scripts ({jobs})", separate),
+                           (f"aqi.py run {jobs}", together)]:
+        print(f"{label:<50} {seconds:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Load time, RSS and file size: joblib pickle vs. compact artifact.
+
+Usage: python -m benchmarks.bench_compact_model [--rows 5000] [--trees 100]
+
+Uses models/karachi_aqi_model.pkl if present, otherwise fits a forest on
+synthetic data. Each artifact is loaded in a fresh interpreter, so the
+reported load time and RSS growth do not include the interpreter and
+NumPy/pandas imports. Also checks that the compact predictor matches sklearn.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import joblib
+from src import compact_model
+from benchmarks.bench_train_model import synthetic_raw
+import train_model
+
+PROBE = r"""
+import sys, time, json, resource
+import numpy as np, pandas as pd, joblib
+import sklearn.ensemble
+from src import compact_model
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS"):
+                return int(line.split()[1])
+
+path, X_path = sys.argv[1], sys.argv[2]
+X = pd.read_pickle(X_path)
+before = rss_kb()
+t0 = time.perf_counter()
+model = compact_model.load_model(path)
+load = time.perf_counter() - t0
+after_load = rss_kb()
+t0 = time.perf_counter()
+model.predict(X.iloc[:1])
+first = time.perf_counter() - t0
+print(json.dumps({"load_ms": load * 1000, "first_predict_ms": first * 1000,
+                  "rss_load_mb": (after_load - before) / 1024, "rss_predict_mb": (rss_kb() - before) / 1024}))
+"""
+
+
+def probe(path, X_path):
+    out = subprocess.run([sys.executable, "-c", PROBE, path, X_path], check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--trees", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pkl = train_model.MODEL_PATH
+        if not os.path.exists(pkl):
+            from sklearn.ensemble import RandomForestRegressor
+            df = synthetic_raw(args.rows)
+            pkl = os.path.join(tmp, "model.pkl")
+            model = RandomForestRegressor(n_estimators=args.trees, random_state=42)
+            joblib.dump(model.fit(df[train_model.FEATURES], df["aqi"]), pkl)
+        model = joblib.load(pkl)
+        X = synthetic_raw(2000, seed=1)[list(model.feature_names_in_)]
+        X_path = os.path.join(tmp, "X.pkl")
+        X.to_pickle(X_path)
+
+        compact = compact_model.export(model, os.path.join(tmp, "model" + compact_model.SUFFIX))
+        compressed = compact_model.export(model, os.path.join(tmp, "model.z" + compact_model.SUFFIX), compress=3)
+
+        fast = compact_model.load(compact)
+        err = np.abs(fast.predict(X) - model.predict(X)).max()
+        print(f"{len(model.estimators_)} trees; max |compact - sklearn| over {len(X)} rows: {err:.2e}\n")
+
+        print(f"{'artifact':<22} {'size':>9} {'load':>9} {'1st predict':>12} {'RSS load':>9} {'RSS +pred':>10}")
+        for label, path in [("joblib pickle", pkl), ("compact (mmap)", compact), ("compact (compressed)", compressed)]:
+            r = probe(path, X_path)
+            print(f"{label:<22} {os.path.getsize(path) / 1e6:>7.2f}MB {r['load_ms']:>7.1f}ms "
+                  f"{r['first_predict_ms']:>10.1f}ms {r['rss_load_mb']:>7.1f}MB {r['rss_predict_mb']:>8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
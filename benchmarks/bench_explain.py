@@ -0,0 +1,63 @@
+"""Explaining a week of predictions: per-row shap.Explainer vs. the cached batch service.
+
+Usage: python -m benchmarks.bench_explain [--train-rows 20000] [--rows 168]
+
+A forest is trained on synthetic raw data (benchmarks.synthetic). The last
+--rows rows are then explained the old way, with a new shap.Explainer over
+the full training frame per row, and by src.explain.ExplanationService for
+each background method: cold (explainer built), then warm (cached). The
+largest gap between a row's SHAP values plus base value and the model's
+prediction is reported as well.
+"""
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import joblib
+import shap
+import train_model
+from src import explain
+from benchmarks import synthetic
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def per_row(model, X, rows):
+    for i in range(len(rows)):
+        shap.Explainer(model, X)(rows.iloc[i:i + 1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--train-rows", type=int, default=20000)
+    parser.add_argument("--rows", type=int, default=168)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data = synthetic.write(os.path.join(tmp, "raw.csv"), args.train_rows, "raw")
+        model_path = os.path.join(tmp, "model.pkl")
+        train_model.main(force=True, data_path=data, model_path=model_path,
+                         meta_path=os.path.join(tmp, "model.meta.json"))
+        model = joblib.load(model_path)
+        X, _ = train_model.load_data(data)
+        rows = X.iloc[-args.rows:]
+
+        _, t_old = timed(lambda: per_row(model, X, rows))
+        print(f"\n{'method':<22} {'cold':>8} {'warm':>8} {'rows/s warm':>12} {'max additivity':>14}")
+        print(f"{'per-row Explainer':<22} {t_old:>7.2f}s {'':>8} {len(rows) / t_old:>12.0f}")
+        for method in ("kmeans", "sample", "none"):
+            service = explain.ExplanationService(model_path, data, method)
+            _, t_cold = timed(lambda: service.explain(rows))
+            out, t_warm = timed(lambda: service.explain(rows))
+            total = out[service.feature_names].sum(axis=1) + out["base_value"]
+            error = np.abs(total - model.predict(rows)).max()
+            print(f"{method:<22} {t_cold:>7.2f}s {t_warm:>7.2f}s {len(rows) / t_warm:>12.0f} {error:>14.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Fetch throughput: one unpooled requests.get per station vs. fetcher.fetch_many.
+
+Usage: python -m benchmarks.bench_fetcher [--stations 48] [--latency 0.05]
+
+Runs against benchmarks.mock_waqi with a simulated per-request latency, so
+no network access or API token is needed. The response cache is bypassed.
+"""
+import time
+import argparse
+import requests
+from src import fetcher
+from benchmarks import mock_waqi
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stations", type=int, default=48)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated network latency (s)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    server, base_url = mock_waqi.start(latency=args.latency)
+    targets = [f"station-{i}" for i in range(args.stations)]
+
+    t0 = time.perf_counter()
+    for target in targets:
+        requests.get(f"{base_url}/feed/{target}/?token=demo").json()
+    sequential = time.perf_counter() - t0
+    print(f"unpooled sequential: {sequential:6.2f} s  {args.stations / sequential:8.1f} stations/s")
+
+    for workers in args.workers:
+        session = fetcher.make_session(workers)
+        limiter = fetcher.RateLimiter(rate=0)
+        t0 = time.perf_counter()
+        records = fetcher.fetch_many(targets, "demo", max_workers=workers, base_url=base_url,
+                                     session=session, limiter=limiter, cache_ttl=0)
+        elapsed = time.perf_counter() - t0
+        assert len(records) == args.stations
+        print(f"fetch_many x{workers:<3}     : {elapsed:6.2f} s  {args.stations / elapsed:8.1f} stations/s")
+
+    # Per-host rate limit caps throughput regardless of worker count
+    limiter = fetcher.RateLimiter(rate=20)
+    t0 = time.perf_counter()
+    fetcher.fetch_many(targets, "demo", max_workers=16, base_url=base_url, limiter=limiter, cache_ttl=0)
+    elapsed = time.perf_counter() - t0
+    print(f"fetch_many x16, 20 req/s limit: {elapsed:6.2f} s  {args.stations / elapsed:8.1f} stations/s")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
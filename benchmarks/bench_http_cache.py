@@ -0,0 +1,54 @@
+"""Upstream calls and latency with the on-disk response cache: cold, warm and revalidated.
+
+Usage: python -m benchmarks.bench_http_cache [--stations 24] [--calls 5] [--latency 0.05]
+
+Each station is fetched `calls` times, as if several jobs asked for the same
+snapshot. Runs against benchmarks.mock_waqi in a temporary cache directory.
+"""
+import time
+import argparse
+import tempfile
+import numpy as np
+from src import fetcher, http_cache
+from benchmarks import mock_waqi
+
+
+def timed_fetches(targets, calls, base_url, limiter, **kwargs):
+    samples = []
+    for _ in range(calls):
+        for target in targets:
+            t0 = time.perf_counter()
+            assert fetcher.fetch_feed(target, "demo", base_url=base_url, limiter=limiter, **kwargs) is not None
+            samples.append(time.perf_counter() - t0)
+    return np.asarray(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stations", type=int, default=24)
+    parser.add_argument("--calls", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server, base_url = mock_waqi.start(latency=args.latency)
+    targets = [f"station-{i}" for i in range(args.stations)]
+    limiter = fetcher.RateLimiter(rate=0)
+    http_cache.CACHE_DIR = tempfile.mkdtemp()
+
+    def report(label, samples):
+        print(f"{label:<22} upstream calls={server.RequestHandlerClass.hits:4d}  "
+              f"p50={np.percentile(samples, 50):7.2f} ms  p99={np.percentile(samples, 99):7.2f} ms  "
+              f"{http_cache.stats()}")
+        server.RequestHandlerClass.hits = 0
+        http_cache.reset_stats()
+
+    report("no cache", timed_fetches(targets, args.calls, base_url, limiter, cache_ttl=0))
+    http_cache.clear()
+    report("cache, cold + warm", timed_fetches(targets, args.calls, base_url, limiter))
+    # Expired entries: one conditional request each, answered with 304
+    report("cache, expired (304)", timed_fetches(targets, 1, base_url, limiter, cache_ttl=1e-9))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
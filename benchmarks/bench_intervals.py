@@ -0,0 +1,73 @@
+"""Cost of prediction intervals vs. batch size and tree count.
+
+Usage: python -m benchmarks.bench_intervals [--trees 50 100 300] [--batch 1 72 1000 10000 100000]
+
+Forests are trained on synthetic raw data (benchmarks.synthetic). For each
+batch size, three things are timed: the plain sklearn predict() (mean only,
+for reference), the 5%/95% quantiles from a Python loop over
+estimators_[i].predict, CompactForest.predict_quantiles, which gets every
+tree's output from one lock-step NumPy pass, and
+compact_model.predict_quantiles, which picks between the two by batch size
+(what the prediction service uses). Best of --repeat runs.
+"""
+import os
+import time
+import argparse
+import tempfile
+import warnings
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+import train_model
+from src import compact_model
+from benchmarks import synthetic
+
+QUANTILES = [0.05, 0.95]
+
+
+def best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def per_tree_loop(model, X):
+    trees = np.stack([est.predict(X) for est in model.estimators_], axis=1)
+    return trees.mean(axis=1), np.quantile(trees, QUANTILES, axis=1).T
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trees", type=int, nargs="+", default=[50, 100, 300])
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 72, 1000, 10000, 100000])
+    parser.add_argument("--train-rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    # The forests are fitted with feature names and called with arrays
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        X, y = train_model.load_data(synthetic.write(os.path.join(tmp, "raw.csv"), args.train_rows, "raw"))
+    rng = np.random.default_rng(0)
+    pool = X.to_numpy(dtype=np.float32)
+    print(f"{'trees':>5} {'batch':>7} {'sklearn mean':>13} {'tree loop':>11} {'compact':>11} {'auto':>11}")
+    for n_trees in args.trees:
+        model = RandomForestRegressor(n_estimators=n_trees, random_state=0, n_jobs=-1).fit(X, y)
+        forest = compact_model.CompactForest.from_sklearn(model)
+        for n in args.batch:
+            batch = pool[rng.integers(0, len(pool), n)]
+            t_mean = best(lambda: model.predict(batch), args.repeat)
+            t_loop = best(lambda: per_tree_loop(model, batch), args.repeat)
+            t_compact = best(lambda: forest.predict_quantiles(batch, QUANTILES), args.repeat)
+            t_auto = best(lambda: compact_model.predict_quantiles(model, batch, QUANTILES, forest), args.repeat)
+            mean, q = forest.predict_quantiles(batch, QUANTILES)
+            assert np.allclose(mean, model.predict(batch))
+            assert np.allclose(q, per_tree_loop(model, batch)[1])
+            print(f"{n_trees:>5} {n:>7} {t_mean * 1e3:>11.2f}ms {t_loop * 1e3:>9.2f}ms "
+                  f"{t_compact * 1e3:>9.2f}ms {t_auto * 1e3:>9.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
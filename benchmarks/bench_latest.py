@@ -0,0 +1,65 @@
+"""Latest-prediction lookups: full reads vs. the history index and CSV tail reads.
+
+Usage: python -m benchmarks.bench_latest [--sizes 10000 100000 1000000]
+
+A synthetic prediction history (benchmarks.synthetic) is written as a CSV
+and imported into a scratch history store. The latest row is then looked
+up the old way (read everything, take the last row) and through
+history_store.latest() (warm index, and cold: index deleted) and
+schema.tail(); the answers are checked to match.
+"""
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+from src import history_store, schema
+from benchmarks import synthetic
+
+
+def timed(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        seconds = time.perf_counter() - t0
+        best = seconds if best is None else min(best, seconds)
+    return out, best
+
+
+def cold_latest(root):
+    os.remove(history_store.latest_path(root))
+    return history_store.latest(root=root)
+
+
+def same_row(a, b):
+    assert a["prediction_time"] == b["prediction_time"], (a["prediction_time"], b["prediction_time"])
+    assert np.isclose(a["aqi_predicted"], b["aqi_predicted"], rtol=1e-6)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**4, 10**5, 10**6])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'store full':>11} {'index warm':>11} {'index cold':>11} {'csv full':>9} {'csv tail':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            csv_path = os.path.join(tmp, f"predictions_{n}.csv")
+            root = os.path.join(tmp, f"history_{n}")
+            synthetic.write(csv_path, n, "predictions", freq=synthetic.freq_for(n))
+            history_store.import_csv(csv_path, root=root)
+
+            full, t_full = timed(lambda: history_store.read_range(root=root).iloc[-1])
+            warm, t_warm = timed(lambda: history_store.latest(root=root).iloc[-1])
+            cold, t_cold = timed(lambda: cold_latest(root).iloc[-1])
+            csv_full, t_csv_full = timed(lambda: schema.load("predictions", csv_path).iloc[-1])
+            csv_tail, t_csv_tail = timed(lambda: schema.tail("predictions", csv_path).iloc[-1])
+            for row in (warm, cold, csv_full, csv_tail):
+                same_row(full, row)
+            print(f"{n:>10,} {t_full * 1e3:>9.1f}ms {t_warm * 1e3:>9.2f}ms {t_cold * 1e3:>9.1f}ms "
+                  f"{t_csv_full * 1e3:>7.0f}ms {t_csv_tail * 1e3:>7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Wall time and peak memory of every pipeline stage at growing data sizes.
+
+Usage: python -m benchmarks.bench_pipeline [--sizes 1000 10000 100000] [--stages history_read eda]
+       [--repeat 3] [--no-caps] [--output reports/bench_pipeline.json]
+
+For each size a scratch workspace (data/, models/, reports/) is filled with
+synthetic data from benchmarks.synthetic in the project's CSV schemas, plus
+a small trained model. Each stage then runs in a fresh interpreter with the
+workspace as its working directory, so the scripts use their normal
+relative paths and no state leaks between stages. Peak memory is how far
+the process high-water mark (VmHWM, reset once the libraries are imported)
+rises above the resident set at that point. WAQI calls go to
+benchmarks.mock_waqi, so no network access or token is needed. Stages that
+fail (e.g. run out of memory) are reported, not fatal.
+
+Sizes are rows of the stage's input; for "fetch" they are stations. Some
+stages are capped by default (see STAGES) because they are far too slow
+beyond that size; --no-caps lifts the caps. tests/test_bench_pipeline.py
+runs every stage at 10^3 rows under pytest.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import contextlib
+import tempfile
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from benchmarks import synthetic
+
+REPORT_PATH = "reports/bench_pipeline.json"
+MODEL_TRAIN_ROWS = 2000
+
+
+class _Notifier:
+    """Accepts digests without sending them."""
+
+    def send_digest(self, breaches):
+        return True
+
+    def close(self):
+        pass
+
+
+def _with_mock(fn):
+    """Run fn with WAQI pointed at a local mock server (before src.fetcher is imported)."""
+    from benchmarks import mock_waqi
+    server, url = mock_waqi.start()
+    os.environ["WAQI_BASE_URL"] = url
+    try:
+        return fn()
+    finally:
+        server.shutdown()
+
+
+def stage_generate(n):
+    synthetic.write("scratch/raw.csv", n, "raw", freq=synthetic.freq_for(n))
+
+
+def stage_load_raw(n):
+    import train_model
+    train_model.load_frame()
+
+
+def stage_train(n):
+    import train_model
+    train_model.main(force=True, model_path="scratch/model.pkl", meta_path="scratch/model.meta.json")
+
+
+def stage_fetch(n):
+    def run():
+        from src import fetcher
+        # Unthrottled: this measures our side, not the API's rate limit
+        fetcher.fetch_many([f"station-{i}" for i in range(n)], "bench", cache_ttl=0,
+                           limiter=fetcher.RateLimiter(rate=0))
+    _with_mock(run)
+
+
+def stage_predict_today(n):
+    def run():
+        import predict_today
+        predict_today.main()
+    _with_mock(run)
+
+
+def stage_history_import(n):
+    from src import history_store
+    history_store.import_csv("data/daily_predictions.csv", root="scratch/history")
+
+
+def stage_history_read(n):
+    from src import history_store
+    history_store.read_range()
+
+
+def stage_build_features(n):
+    from src import build_features
+    build_features.compute_and_append(full=True)
+
+
+def stage_rolling_features(n):
+    import pandas as pd
+    from src import rolling_features
+    rolling_features.compute_batch(pd.read_csv("data/features_store.csv"))
+
+
+def stage_alerts(n):
+    from src import alerts
+    if os.path.exists(alerts.ALERT_STATE_FILE):
+        os.remove(alerts.ALERT_STATE_FILE)
+    alerts.check_and_alert(notifier=_Notifier())
+
+
+def stage_eda(n):
+    from src import eda
+    eda.run_eda(force=True)
+
+
+def stage_dashboard_load(n):
+    from src import data_layer
+    data_layer.load_daily_predictions()
+    data_layer.load_forecast()
+    data_layer.load_hourly_forecast()
+    data_layer.latest_prediction()
+
+
+# name -> (function, largest size run unless --no-caps)
+STAGES = {
+    "generate": (stage_generate, None),
+    "load_raw": (stage_load_raw, None),
+    "train": (stage_train, 10**5),
+    "fetch": (stage_fetch, 10**3),
+    "predict_today": (stage_predict_today, None),
+    "history_import": (stage_history_import, None),
+    "history_read": (stage_history_read, None),
+    "build_features": (stage_build_features, None),
+    "rolling_features": (stage_rolling_features, 10**6),
+    "alerts": (stage_alerts, None),
+    "eda": (stage_eda, None),
+    "dashboard_load": (stage_dashboard_load, None),
+}
+
+
+def _reset_peak():
+    """Reset the high-water mark to the current RSS and return it.
+
+    Linux keeps the mark across exec, so a fresh child would otherwise start
+    at the parent's peak.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    return _peak_bytes()
+
+
+def _peak_bytes():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # kilobytes on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def run_stage(name, workspace, n):
+    """Run one stage in the current (fresh) process; returns seconds and peak bytes."""
+    os.chdir(workspace)
+    # Preload the heavy libraries so the baseline covers them
+    import numpy, pandas, sklearn.ensemble, pyarrow.parquet  # noqa: F401,E401
+    baseline = _reset_peak()
+    t0 = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        STAGES[name][0](n)
+    seconds = time.perf_counter() - t0
+    return seconds, max(_peak_bytes() - baseline, 0)
+
+
+def prepare(workspace, n):
+    """Fill a workspace with n-row synthetic inputs for every stage."""
+    from src import history_store
+    import train_model
+    for sub in ("data", "models", "scratch"):
+        os.makedirs(os.path.join(workspace, sub), exist_ok=True)
+    data = os.path.join(workspace, "data")
+    freq = synthetic.freq_for(n)
+    synthetic.write(os.path.join(data, "raw_aqi_data_karachi.csv"), n, "raw", freq=freq)
+    synthetic.write(os.path.join(data, "daily_predictions.csv"), n, "predictions", freq=freq, seed=1)
+    synthetic.write(os.path.join(data, "features_store.csv"), n, "features_store", freq=freq, seed=2)
+    now = datetime.now().strftime("%Y-%m-%d")
+    synthetic.write(os.path.join(data, "forecast_hourly.csv"), 72, "forecast_hourly", start=now, seed=3)
+    synthetic.write(os.path.join(data, "forecast_3day.csv"), 3, "forecast_daily", start=now, seed=3)
+    history_store.import_csv(os.path.join(data, "daily_predictions.csv"),
+                             root=os.path.join(data, "history", "daily_predictions"))
+
+    small = os.path.join(workspace, "scratch", "model_train.csv")
+    synthetic.write(small, MODEL_TRAIN_ROWS, "raw")
+    train_model.main(force=True, data_path=small,
+                     model_path=os.path.join(workspace, "models", "karachi_aqi_model.pkl"),
+                     meta_path=os.path.join(workspace, "models", "karachi_aqi_model.meta.json"))
+
+
+def measure(name, workspace, n, repeat):
+    """Best time and largest peak over `repeat` fresh processes."""
+    ctx = multiprocessing.get_context("spawn")
+    times, peaks = [], []
+    for _ in range(repeat):
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                seconds, peak = pool.submit(run_stage, name, workspace, n).result()
+        except Exception as e:
+            return {"stage": name, "rows": n, "error": f"{type(e).__name__}: {e}".strip()[:300]}
+        times.append(seconds)
+        peaks.append(peak)
+    return {"stage": name, "rows": n, "seconds": round(min(times), 4), "peak_memory_bytes": max(peaks),
+            "repeat": repeat}
+
+
+def child_environ(repo):
+    """Environment of the stage processes: local mock only, in-process predictions, no real token."""
+    return {"AQI_API_TOKEN": "bench", "PREDICTION_SERVICE_URL": "", "PREDICT_REFRESH_SECONDS": "0",
+            "MPLBACKEND": "Agg", "PYTHONPATH": os.pathsep.join(filter(None, [repo, os.getenv("PYTHONPATH")]))}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**3, 10**4, 10**5])
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--no-caps", action="store_true", help="run every stage at every size")
+    parser.add_argument("--output", default=REPORT_PATH)
+    args = parser.parse_args()
+
+    os.environ.update(child_environ(os.getcwd()))
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            workspace = os.path.join(tmp, str(n))
+            t0 = time.perf_counter()
+            prepare(workspace, n)
+            print(f"\n== {n:,} rows (workspace ready in {time.perf_counter() - t0:.1f}s) ==")
+            for name in args.stages:
+                cap = STAGES[name][1]
+                if cap is not None and n > cap and not args.no_caps:
+                    continue
+                r = measure(name, workspace, n, args.repeat)
+                results.append(r)
+                if "error" in r:
+                    print(f"{name:<18} failed: {r['error']}")
+                else:
+                    print(f"{name:<18} {r['seconds']:>9.3f}s {r['peak_memory_bytes'] / 1e6:>9.1f} MB")
+
+    report = {"generated_at": datetime.now().isoformat(timespec="seconds"), "cpu_count": os.cpu_count(),
+              "sizes": args.sizes, "results": results}
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
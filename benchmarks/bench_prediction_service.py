@@ -0,0 +1,103 @@
+"""Startup time and p50/p99 latency: one-shot script vs. resident prediction service.
+
+Usage: python -m benchmarks.bench_prediction_service [--runs 20] [--requests 500]
+
+The one-shot path reproduces what predict_today.py paid per run before the
+service existed (cold interpreter, imports, joblib.load, one predict), minus
+the network call. If the trained model is missing, a stand-in forest with the
+same feature columns is trained into a temporary directory.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+import threading
+import numpy as np
+import pandas as pd
+import requests
+import joblib
+from src import prediction_service
+
+FEATURES = ['pm25', 'pm10', 'o3', 'co', 'no2', 'so2', 'hour', 'day', 'month', 'aqi_change']
+SAMPLE = {"pm25": 161, "pm10": 90, "o3": 20, "co": 1.0, "no2": 30, "so2": 10, "hour": 13, "day": 15, "month": 8}
+
+ONE_SHOT = """
+import sys, joblib, pandas as pd
+model = joblib.load(sys.argv[1])
+X = pd.DataFrame([{sample!r}]).reindex(columns=model.feature_names_in_, fill_value=0)
+model.predict(X)
+"""
+
+
+def stand_in_model(path):
+    from sklearn.ensemble import RandomForestRegressor
+    rng = np.random.default_rng(42)
+    X = pd.DataFrame(rng.uniform(0, 200, size=(500, len(FEATURES))), columns=FEATURES)
+    y = X["pm25"] * 0.8 + rng.normal(0, 10, len(X))
+    joblib.dump(RandomForestRegressor(n_estimators=100, random_state=42).fit(X, y), path)
+
+
+def percentiles(samples):
+    a = np.asarray(samples) * 1000
+    return f"p50={np.percentile(a, 50):8.2f} ms  p99={np.percentile(a, 99):8.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20, help="one-shot script runs")
+    parser.add_argument("--requests", type=int, default=500, help="service requests")
+    args = parser.parse_args()
+
+    model_path = prediction_service.MODEL_PATH
+    tmp = tempfile.TemporaryDirectory()
+    if not os.path.exists(model_path):
+        model_path = os.path.join(tmp.name, "model.pkl")
+        stand_in_model(model_path)
+        print(f"Using stand-in model at {model_path}")
+
+    # --- One-shot script (old behaviour) ---
+    code = ONE_SHOT.format(sample=SAMPLE)
+    script_times = []
+    for _ in range(args.runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code, model_path], check=True)
+        script_times.append(time.perf_counter() - t0)
+
+    # --- Resident service ---
+    t0 = time.perf_counter()
+    server = prediction_service.make_server(port=0, model_path=model_path)
+    startup = time.perf_counter() - t0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    service = prediction_service.get_service(model_path)
+
+    in_process = []
+    for _ in range(args.requests):
+        t0 = time.perf_counter()
+        service.predict(SAMPLE)
+        in_process.append(time.perf_counter() - t0)
+
+    session = requests.Session()
+    http = []
+    for _ in range(args.requests):
+        t0 = time.perf_counter()
+        session.post(f"{url}/predict", json={"features": SAMPLE}).raise_for_status()
+        http.append(time.perf_counter() - t0)
+
+    batch = pd.DataFrame([SAMPLE] * 1000)
+    t0 = time.perf_counter()
+    service.predict_batch(batch)
+    batch_time = time.perf_counter() - t0
+    server.shutdown()
+
+    print(f"one-shot script    ({args.runs} runs):    {percentiles(script_times)}")
+    print(f"service startup (model load):  {startup * 1000:8.2f} ms")
+    print(f"service in-process ({args.requests} calls): {percentiles(in_process)}")
+    print(f"service HTTP       ({args.requests} calls): {percentiles(http)}")
+    print(f"predict_batch(1000 rows):      {batch_time * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
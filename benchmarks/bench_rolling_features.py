@@ -0,0 +1,52 @@
+"""Streaming vs. batch rolling features: per-update latency.
+
+Usage: python -m benchmarks.bench_rolling_features [--sizes 1000 10000 100000]
+
+Per-update time with a warmed-up engine at each history size, next to the
+cost of recomputing the batch features over the whole history for each new
+observation. Parity of the two is checked by tests/test_rolling_features.py.
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from src import rolling_features as rf
+
+
+def synthetic_series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    minutes = np.cumsum(rng.integers(0, 180, n))  # includes duplicate timestamps
+    df = pd.DataFrame({"timestamp": pd.Timestamp("2024-01-01") + pd.to_timedelta(minutes, unit="min")})
+    for col in rf.POLLUTANTS:
+        values = rng.gamma(3, 30, n)
+        values[rng.random(n) < 0.05] = np.nan
+        df[col] = values
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**3, 10**4, 10**5])
+    parser.add_argument("--updates", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'history':>10} {'update p50':>11} {'update p99':>11} {'batch recompute':>16}")
+    for n in args.sizes:
+        df = synthetic_series(n + args.updates, seed=1)
+        history, new = df.iloc[:n], df.iloc[n:]
+        engine = rf.RollingFeatureEngine.from_history(history)
+        samples = []
+        for ts, values in zip(new["timestamp"], new[rf.POLLUTANTS].to_dict(orient="records")):
+            t0 = time.perf_counter()
+            engine.update(ts, values)
+            samples.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        rf.compute_batch(df.iloc[:n + 1])
+        batch = time.perf_counter() - t0
+        samples = np.asarray(samples) * 1000
+        print(f"{n:>10,} {np.percentile(samples, 50):>8.3f} ms {np.percentile(samples, 99):>8.3f} ms "
+              f"{batch * 1000:>13.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
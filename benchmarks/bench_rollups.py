@@ -0,0 +1,75 @@
+"""History charts: every stored point vs. rollups.series().
+
+Usage: python -m benchmarks.bench_rollups [--rows 100000 1000000]
+
+A history store of synthetic hourly predictions (benchmarks.synthetic) is
+written month by month and rolled up from scratch. Then one prediction is
+appended (upsert, including the incremental rollup refresh), and the
+dashboard's chart for each range is built both ways: all rows of the range
+into px.line, and the bounded series. Reported: seconds and the chart's
+point count and JSON size (what the browser receives).
+"""
+import os
+import time
+import argparse
+import tempfile
+import pandas as pd
+import plotly.express as px
+from src import history_store, rollups
+from benchmarks import synthetic
+
+RANGES = {"7 days": 7, "1 year": 365, "all": None}
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def write_store(root, n_rows):
+    gen = synthetic.Generator(1, freq="h")
+    for i, chunk in enumerate(gen.chunks(n_rows, 200_000)):
+        df = history_store._normalize(synthetic.to_schema(chunk, "predictions", seed=i))
+        for month, rows in df.groupby(df[history_store.TIME_COL].dt.strftime("%Y-%m")):
+            path = os.path.join(root, month, history_store.COMPACTED_FILE)
+            if os.path.exists(path):
+                rows = pd.concat([history_store._read_files([path]), rows], ignore_index=True)
+            history_store._write(rows, path)
+    return df[history_store.TIME_COL].max()
+
+
+def chart(df, x, y):
+    fig, seconds = timed(lambda: px.line(df, x=x, y=y).to_json())
+    return seconds, len(df), len(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'step':<28} {'seconds':>8} {'points':>9} {'json KB':>9}")
+    for n in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = os.path.join(tmp, "history")
+            last = write_store(root, n)
+            _, t_build = timed(lambda: rollups.rebuild(root))
+            print(f"{n:>9} {'rebuild rollups':<28} {t_build:>8.2f}")
+            row = {history_store.TIME_COL: last + pd.Timedelta(hours=1), "aqi_predicted": 150.0}
+            _, t_upsert = timed(lambda: history_store.upsert(pd.DataFrame([row]), root))
+            print(f"{n:>9} {'upsert one + refresh':<28} {t_upsert:>8.2f}")
+            for label, days in RANGES.items():
+                start = None if days is None else last - pd.Timedelta(days=days)
+                full, t_read = timed(lambda: history_store.read_range(start, root=root))
+                t_chart, points, size = chart(full, history_store.TIME_COL, "aqi_predicted")
+                print(f"{n:>9} {'all points, ' + label:<28} {t_read + t_chart:>8.2f} {points:>9} {size / 1024:>9.0f}")
+                (df, res), t_series = timed(lambda: rollups.series(start, root=root))
+                x, y = (history_store.TIME_COL, "aqi_predicted") if res == "raw" else \
+                    (rollups.BUCKET_COL, ["aqi_predicted_mean", "aqi_predicted_p95", "aqi_predicted_max"])
+                t_chart, points, size = chart(df, x, y)
+                print(f"{n:>9} {f'series ({res}), ' + label:<28} {t_series + t_chart:>8.2f} {points:>9} {size / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Parse time and frame size: inferred read_csv + coercion vs. src.schema.load.
+
+Usage: python -m benchmarks.bench_schema [--sizes 10000 100000 1000000]
+
+Synthetic raw and prediction CSVs (benchmarks.synthetic) are read the way
+the scripts used to (read_csv with inference, then pd.to_numeric /
+pd.to_datetime(errors="coerce", format="mixed")) and with the schema
+loader; the frames are checked to hold the same values.
+"""
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from src import schema
+from benchmarks import synthetic
+
+
+def inferred(name, path):
+    ds = schema.DATASETS[name]
+    df = pd.read_csv(path)
+    for col in df.columns:
+        if col == ds.time_col:
+            df[col] = pd.to_datetime(df[col], errors="coerce", format="mixed")
+        elif col != "station":
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**4, 10**5, 10**6])
+    parser.add_argument("--stations", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'dataset':<12} {'rows':>10} {'inferred':>10} {'schema':>9} {'MB before':>10} {'MB after':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            for name in ("raw", "predictions"):
+                path = os.path.join(tmp, f"{name}_{n}.csv")
+                synthetic.write(path, n, name, stations=args.stations, freq=synthetic.freq_for(n, args.stations))
+                old, t_old = timed(lambda: inferred(name, path))
+                new, t_new = timed(lambda: schema.load(name, path))
+                for col in new.columns:
+                    if col == "station":
+                        assert (old[col] == new[col].astype(object)).all()
+                    elif col == schema.DATASETS[name].time_col:
+                        assert old[col].equals(new[col]), col
+                    else:
+                        assert np.allclose(old[col], new[col], rtol=1e-6, equal_nan=True), col
+                mb_old = old.memory_usage(deep=True).sum() / 1e6
+                mb_new = new.memory_usage(deep=True).sum() / 1e6
+                print(f"{name:<12} {n:>10,} {t_old:>9.2f}s {t_new:>8.2f}s {mb_old:>10.1f} {mb_new:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
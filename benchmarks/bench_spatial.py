@@ -0,0 +1,76 @@
+"""Spatial AQI refresh: dense IDW vs. KD-tree IDW vs. the cached sparse weights.
+
+Usage: python -m benchmarks.bench_spatial [--steps 0.01 0.002 0.001] [--stations 30 300]
+
+Random stations over src.spatial.BOUNDS are interpolated onto grids of
+several resolutions. Timed per refresh: inverse distance weighting over
+every station with a dense (cells x stations) distance matrix, the
+IDW_NEIGHBORS nearest stations from a freshly built cKDTree, and
+src.spatial.idw with the weight matrix already cached (what an hourly
+refresh with unchanged stations costs). The Gaussian process is timed on
+the coarsest grid only. Best of --repeat runs.
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from src import spatial
+
+
+def best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def random_stations(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lat_min, lon_min, lat_max, lon_max = spatial.BOUNDS
+    aqi = rng.uniform(50, 250, n)
+    aqi[rng.random(n) < 0.1] = np.nan  # stations reporting "-"
+    return pd.DataFrame({"lat": rng.uniform(lat_min, lat_max, n), "lon": rng.uniform(lon_min, lon_max, n),
+                         "aqi": aqi})
+
+
+def dense_idw(stations, grid, power=spatial.IDW_POWER):
+    known = stations.dropna(subset=["aqi"])
+    xy = grid.project(known["lat"], known["lon"])
+    cells = grid.points()
+    d2 = ((cells[:, None, :] - xy[None, :, :]) ** 2).sum(axis=2)
+    w = 1.0 / np.maximum(d2, 1e-12) ** (power / 2)
+    return (w @ known["aqi"].to_numpy()) / w.sum(axis=1)
+
+
+def kdtree_idw(stations, grid):
+    W = spatial.idw_weights(grid.project(stations["lat"], stations["lon"]), grid.points())
+    values = stations["aqi"].to_numpy()
+    reported = ~np.isnan(values)
+    return (W @ np.where(reported, values, 0.0)) / (W @ reported.astype(float))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=float, nargs="+", default=[0.01, 0.002, 0.001])
+    parser.add_argument("--stations", type=int, nargs="+", default=[30, 300])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'stations':>8} {'cells':>8} {'dense IDW':>10} {'KD-tree IDW':>12} {'cached':>10} {'GP':>10}")
+    for n in args.stations:
+        stations = random_stations(n)
+        for i, step in enumerate(sorted(args.steps, reverse=True)):
+            grid = spatial.Grid(step=step)
+            t_dense = best(lambda: dense_idw(stations, grid), args.repeat)
+            t_tree = best(lambda: kdtree_idw(stations, grid), args.repeat)
+            spatial.weights(stations, grid, path=None)
+            t_cached = best(lambda: spatial.idw(stations, grid, path=None), args.repeat)
+            gp = f"{best(lambda: spatial.gaussian_process(stations, grid), 1) * 1e3:>8.0f}ms" if i == 0 else "-"
+            print(f"{n:>8} {len(grid):>8} {t_dense * 1e3:>8.1f}ms {t_tree * 1e3:>10.1f}ms "
+                  f"{t_cached * 1e3:>8.2f}ms {gp:>10}")
+
+
+if __name__ == "__main__":
+    main()
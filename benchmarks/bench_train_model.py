@@ -0,0 +1,70 @@
+"""Training cost vs. dataset size: single core, all cores, warm start and skip.
+
+Usage: python -m benchmarks.bench_train_model [--sizes 1000 10000 100000]
+
+Synthetic raw data is written to a temporary CSV. For each size the
+benchmark times a full fit on one core (the old behaviour), a full fit on
+all cores, a warm-start update after appending 1% more rows, and a rerun on
+unchanged data (fingerprint check only).
+"""
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+import train_model
+
+
+def synthetic_raw(n, seed=0):
+    rng = np.random.default_rng(seed)
+    times = pd.date_range("2020-01-01", periods=n, freq="h")
+    pm25 = rng.gamma(4, 30, n)
+    df = pd.DataFrame({
+        "pm25": pm25, "pm10": pm25 * 0.7 + rng.normal(0, 5, n), "o3": rng.uniform(5, 80, n),
+        "co": rng.uniform(0.1, 3, n), "no2": rng.uniform(5, 90, n), "so2": rng.uniform(2, 50, n),
+        "hour": times.hour, "day": times.day, "month": times.month, "aqi_change": rng.normal(0, 5, n),
+    })
+    df["aqi"] = (pm25 * 1.1 + df["pm10"] * 0.2 + rng.normal(0, 8, n)).round()
+    return df
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def run(n, tmp):
+    data = os.path.join(tmp, f"raw_{n}.csv")
+    model = os.path.join(tmp, f"model_{n}.pkl")
+    meta = os.path.join(tmp, f"meta_{n}.json")
+    df = synthetic_raw(n + n // 100)
+    df.iloc[:n].to_csv(data, index=False)
+    paths = dict(data_path=data, model_path=model, meta_path=meta)
+
+    train_model.N_JOBS = 1
+    single = timed(lambda: train_model.main(force=True, **paths))
+    train_model.N_JOBS = -1
+    parallel = timed(lambda: train_model.main(force=True, **paths))
+    size = os.path.getsize(model)
+    df.iloc[n:].to_csv(data, mode="a", header=False, index=False)
+    warm = timed(lambda: train_model.main(**paths))
+    skip = timed(lambda: train_model.main(**paths))
+    return single, parallel, warm, skip, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**3, 10**4, 10**5])
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [(n, *run(n, tmp)) for n in args.sizes]
+    print(f"\n{os.cpu_count()} cores")
+    print(f"{'rows':>10} {'1 core':>9} {'all cores':>10} {'warm +1%':>9} {'skip':>8} {'model size':>11}")
+    for n, single, parallel, warm, skip, size in results:
+        print(f"{n:>10,} {single:>8.2f}s {parallel:>9.2f}s {warm:>8.2f}s {skip * 1000:>6.1f}ms {size / 1e6:>9.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Local stand-in for api.waqi.info, for offline benchmarks.
+
+Serves /feed/<target>/ with a deterministic payload per target (same shape
+as the real feed, including daily forecasts) and /map/bounds/ with
+STATIONS stations spread over the requested box, after an optional
+simulated network latency. Responses carry an ETag and honour If-None-Match. Run standalone with `python -m benchmarks.mock_waqi --port 8900`.
+"""
+import json
+import time
+import zlib
+import argparse
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+KARACHI = (24.8607, 67.0011)
+# Stations returned by map/bounds; every seventh one has no current reading
+STATIONS = 30
+
+
+def feed_payload(target, now=None):
+    now = now or datetime.now()
+    seed = zlib.crc32(target.encode())
+    base = 60 + seed % 180
+    iaqi = {name: {"v": round(base * factor, 1)} for name, factor in
+            [("pm25", 1.0), ("pm10", 0.7), ("o3", 0.2), ("co", 0.01), ("no2", 0.15), ("so2", 0.08)]}
+    days = [(now + timedelta(days=i - 2)).strftime("%Y-%m-%d") for i in range(8)]
+    forecast = {name: [{"day": d, "avg": int(base * f) + i, "min": int(base * f) - 10 + i, "max": int(base * f) + 10 + i}
+                       for i, d in enumerate(days)]
+                for name, f in [("pm25", 1.0), ("pm10", 0.7), ("o3", 0.2), ("uvi", 0.01)]}
+    lat = KARACHI[0] + ((seed >> 8) % 200 - 100) / 1000
+    lon = KARACHI[1] + ((seed >> 16) % 200 - 100) / 1000
+    return {
+        "status": "ok",
+        "data": {
+            "aqi": base,
+            "idx": seed % 100000,
+            "city": {"name": target, "geo": [lat, lon]},
+            "time": {"s": now.strftime("%Y-%m-%d %H:00:00")},
+            "iaqi": iaqi,
+            "forecast": {"daily": forecast},
+        },
+    }
+
+
+def bounds_payload(latlng, n=STATIONS, now=None):
+    now = now or datetime.now()
+    lat_min, lon_min, lat_max, lon_max = [float(v) for v in latlng.split(",")]
+    stations = []
+    for i in range(n):
+        seed = zlib.crc32(f"station-{i}".encode())
+        lat = lat_min + (lat_max - lat_min) * (seed % 1000) / 1000
+        lon = lon_min + (lon_max - lon_min) * ((seed >> 10) % 1000) / 1000
+        aqi = "-" if i % 7 == 6 else str(60 + seed % 180)
+        stations.append({"lat": lat, "lon": lon, "uid": seed % 100000, "aqi": aqi,
+                         "station": {"name": f"station-{i}", "time": now.strftime("%Y-%m-%dT%H:00:00+05:00")}})
+    return {"status": "ok", "data": stations}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.0
+    hits = 0
+
+    def do_GET(self):
+        type(self).hits += 1
+        if self.latency:
+            time.sleep(self.latency)
+        parts = [p for p in urlsplit(self.path).path.split("/") if p]
+        if len(parts) >= 2 and parts[0] in ("feed", "forecast"):
+            payload = feed_payload(parts[-1])
+            status = 200
+        elif parts[:2] == ["map", "bounds"]:
+            payload = bounds_payload(parse_qs(urlsplit(self.path).query).get("latlng", ["24.7,66.8,25.1,67.4"])[0])
+            status = 200
+        else:
+            payload, status = {"status": "error", "data": "Unknown station"}, 404
+        body = json.dumps(payload).encode()
+        # Payloads only change hourly, so the hour is a valid validator
+        etag = f'"{zlib.crc32(parts[-1].encode() if parts else b"")}-{datetime.now():%Y%m%d%H}"'
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 200:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port=0, latency=0.0):
+    """Start the mock in a daemon thread; returns (server, base_url)."""
+    handler = type("Handler", (MockHandler,), {"latency": latency, "hits": 0})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each response")
+    args = parser.parse_args()
+    server, url = start(args.port, args.latency)
+    print(f"Mock WAQI API at {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
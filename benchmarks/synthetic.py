@@ -0,0 +1,199 @@
+"""Seeded synthetic pollutant/AQI histories in the project's CSV schemas.
+
+Usage: python -m benchmarks.synthetic --schema raw --rows 1000000 [--stations 5] [--out data.csv]
+
+Each station gets its own pollution level; every pollutant follows a yearly
+and a daily cycle (traffic peaks for PM/NO2/CO, a midday peak for O3) times
+AR(1) log-normal noise, so series are autocorrelated like real readings.
+AQI is the US EPA index of PM2.5/PM10. Rows are ordered by time, then
+station, and are produced in chunks so 10^7-row files are written without
+holding them in memory. The same seed always gives the same data.
+"""
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+from src import aqi_calc
+
+POLLUTANTS = ["pm25", "pm10", "o3", "co", "no2", "so2"]
+CHUNK_ROWS = 1_000_000
+START = "2015-01-01"
+# Share of pollutant readings left empty, like stations dropping a sensor
+MISSING_RATE = 0.01
+AR_PHI = 0.9
+
+# (mean level, noise sd in log space, daily profile)
+_PROFILES = {
+    "pm25": (60.0, 0.35, "traffic"),
+    "pm10": (110.0, 0.35, "traffic"),
+    "o3": (35.0, 0.25, "midday"),
+    "co": (0.9, 0.30, "traffic"),
+    "no2": (30.0, 0.30, "traffic"),
+    "so2": (12.0, 0.40, "flat"),
+}
+
+# Column orders of the files the pipeline reads and writes
+SCHEMAS = {
+    # data/raw_aqi_data_karachi.csv
+    "raw": ["datetime", "aqi", "pm25", "pm10", "co", "no2", "so2", "o3"],
+    # data/daily_predictions.csv / src.history_store.COLUMNS
+    "predictions": ["prediction_time", "aqi_predicted"] + POLLUTANTS + ["hour", "day", "month", "aqi", "aqi_change"],
+    # data/features_store.csv before the rolling features (fetech_features.BASE_COLUMNS)
+    "features_store": ["timestamp", "aqi", "pm25", "pm10", "o3", "no2", "so2", "co",
+                       "hour", "day", "month", "aqi_change"],
+    # data/features_karachi.csv (src.build_features.FEATURE_COLUMNS)
+    "features": ["prediction_time", "hour", "day_of_week", "aqi_predicted"],
+    # data/forecast_hourly.csv
+    "forecast_hourly": ["prediction_time", "pm25", "pm10", "o3", "co", "no2", "so2", "aqi_predicted"],
+    # data/forecast_3day.csv
+    "forecast_daily": ["prediction_time", "pm25", "pm10", "o3", "aqi_predicted", "aqi_min", "aqi_max"],
+}
+TIME_FORMATS = {"raw": "%m/%d/%Y %H:%M", "forecast_daily": "%Y-%m-%d"}
+
+
+def epa_aqi(pm25, pm10):
+    """US EPA AQI (2012 table, as WAQI reports it) from PM2.5 and PM10 concentrations."""
+    return aqi_calc.combine(aqi_calc.sub_indices({"pm25": pm25, "pm10": pm10}, "epa-2012"))[0]
+
+
+def _daily(kind, hours):
+    if kind == "traffic":
+        # Morning and evening rush hours
+        return 1 + 0.25 * np.cos(2 * np.pi * (hours - 8) / 24) + 0.15 * np.cos(4 * np.pi * (hours - 20) / 24)
+    if kind == "midday":
+        return 1 + 0.5 * np.cos(2 * np.pi * (hours - 14) / 24)
+    return np.ones_like(hours)
+
+
+def freq_for(n_rows, stations=1, years=10):
+    """Time step that spreads n_rows over about `years` years (1 s to 1 h)."""
+    seconds = pd.Timedelta(days=365 * years).total_seconds() * stations / max(n_rows, 1)
+    return pd.Timedelta(seconds=int(min(max(seconds, 1), 3600)))
+
+
+class Generator:
+    """Streams readings for `stations` stations, one row per station per time step."""
+
+    def __init__(self, stations=1, start=START, freq="h", seed=0, missing_rate=MISSING_RATE):
+        self.stations = [f"station-{i}" for i in range(stations)]
+        self.start = pd.Timestamp(start)
+        self.step = pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+        self.missing_rate = missing_rate
+        self.rng = np.random.default_rng(seed)
+        # Station pollution level, and the AR(1) filter state per pollutant and station
+        self.level = self.rng.lognormal(0, 0.3, stations)
+        self.state = {p: np.zeros((1, stations)) for p in POLLUTANTS}
+        self.t = 0
+
+    def steps(self, n_steps):
+        """Readings for the next n_steps time steps, in long format."""
+        times = pd.date_range(self.start + self.step * self.t, periods=n_steps, freq=self.step)
+        self.t += n_steps
+        hours = (times.hour + times.minute / 60).to_numpy()[:, None]
+        season = 1 + 0.35 * np.cos(2 * np.pi * (times.dayofyear.to_numpy()[:, None] - 15) / 365.25)
+        n_st = len(self.stations)
+
+        df = pd.DataFrame({
+            "timestamp": np.repeat(times, n_st),
+            "station": np.tile(np.array(self.stations, dtype=object), n_steps),
+        })
+        for name in POLLUTANTS:
+            mean, sd, kind = _PROFILES[name]
+            eps = self.rng.normal(0, sd * np.sqrt(1 - AR_PHI ** 2), (n_steps, n_st))
+            noise, self.state[name] = lfilter([1], [1, -AR_PHI], eps, axis=0, zi=self.state[name])
+            s = season if name != "o3" else 2 - season  # ozone peaks in summer
+            values = mean * self.level * s * _daily(kind, hours) * np.exp(noise)
+            df[name] = values.ravel().round(2 if name != "co" else 3)
+        df["aqi"] = epa_aqi(df["pm25"], df["pm10"])
+        if self.missing_rate:
+            for name in POLLUTANTS:
+                df.loc[self.rng.random(len(df)) < self.missing_rate, name] = np.nan
+        return df
+
+    def chunks(self, n_rows, chunk_rows=CHUNK_ROWS):
+        """Yield long-format chunks totalling n_rows rows."""
+        n_st = len(self.stations)
+        remaining = n_rows
+        while remaining > 0:
+            steps = max(1, min(remaining, chunk_rows) // n_st)
+            df = self.steps(steps)
+            yield df.iloc[:remaining]
+            remaining -= len(df)
+
+
+def to_schema(df, schema, seed=0, with_station=False):
+    """Shape a long-format chunk into one of SCHEMAS (plus a station column if asked)."""
+    ts = df["timestamp"]
+    rng = np.random.default_rng(seed)
+    out = pd.DataFrame(index=df.index)
+    if schema in ("raw", "features_store"):
+        out["datetime" if schema == "raw" else "timestamp"] = ts
+        out["aqi"] = df["aqi"]
+        for name in POLLUTANTS:
+            out[name] = df[name]
+        if schema == "features_store":
+            out["hour"], out["day"], out["month"] = ts.dt.hour, ts.dt.day, ts.dt.month
+            out["aqi_change"] = df.groupby("station")["aqi"].diff().fillna(0)
+    else:
+        # Model output: the true AQI with a prediction error
+        predicted = (df["aqi"] * rng.normal(1, 0.08, len(df))).round(2)
+        out["prediction_time"] = ts.dt.strftime("%Y-%m-%d") if schema == "forecast_daily" else ts
+        if schema == "predictions":
+            out["aqi_predicted"] = predicted
+            for name in POLLUTANTS:
+                out[name] = df[name]
+            out["hour"], out["day"], out["month"] = ts.dt.hour, ts.dt.day, ts.dt.month
+            out["aqi"] = df["aqi"]
+            out["aqi_change"] = (predicted - df["aqi"]).round(2)
+        elif schema == "features":
+            out["hour"], out["day_of_week"] = ts.dt.hour, ts.dt.dayofweek
+            out["aqi_predicted"] = predicted
+        else:
+            for name in SCHEMAS[schema][1:-1]:
+                if name in df:
+                    out[name] = df[name]
+            out["aqi_predicted"] = predicted
+            if schema == "forecast_daily":
+                out["aqi_min"] = (predicted * 0.85).round(2)
+                out["aqi_max"] = (predicted * 1.15).round(2)
+    if with_station:
+        out["station"] = df["station"]
+    return out[SCHEMAS[schema] + (["station"] if with_station else [])]
+
+
+def generate(n_rows, schema="raw", stations=1, start=START, freq="h", seed=0):
+    """n_rows of synthetic data in `schema`, in memory."""
+    if schema == "forecast_daily":
+        freq = "D"
+    gen = Generator(stations, start, freq, seed)
+    return pd.concat([to_schema(c, schema, seed + i, stations > 1) for i, c in enumerate(gen.chunks(n_rows))],
+                     ignore_index=True)
+
+
+def write(path, n_rows, schema="raw", stations=1, start=START, freq="h", seed=0, chunk_rows=CHUNK_ROWS):
+    """Write n_rows of synthetic data in `schema` to a CSV, one chunk at a time."""
+    if schema == "forecast_daily":
+        freq = "D"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    gen = Generator(stations, start, freq, seed)
+    for i, chunk in enumerate(gen.chunks(n_rows, chunk_rows)):
+        chunk = to_schema(chunk, schema, seed + i, stations > 1)
+        chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False,
+                     date_format=TIME_FORMATS.get(schema))
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic AQI data in one of the project's CSV schemas.")
+    parser.add_argument("--schema", choices=list(SCHEMAS), default="raw")
+    parser.add_argument("--rows", type=float, default=1000)
+    parser.add_argument("--stations", type=int, default=1)
+    parser.add_argument("--start", default=START)
+    parser.add_argument("--freq", default="h", help="time step per station (pandas offset, e.g. h, 10min)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+    out = args.out or f"synthetic_{args.schema}.csv"
+    write(out, int(args.rows), args.schema, args.stations, args.start, args.freq, args.seed)
+    print(f"Wrote {int(args.rows):,} {args.schema} rows to {out}")
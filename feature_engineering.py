@@ -1,14 +1,12 @@
-import requests
+from src import fetcher
 
 def fetch_aqi_data(city, token):
-    url = f"https://api.waqi.info/feed/{city}/?token={token}"
-    response = requests.get(url)
-    data = response.json()
+    data = fetcher.fetch_feed(city, token)
 
     print("🔍 Raw API response:", data)
 
-    if data.get('status') == 'ok':
-        forecast = data['data'].get('forecast', {}).get('daily', {})
+    if data is not None:
+        forecast = data.get('forecast', {}).get('daily', {})
 
         # Use forecast values instead of IAQI (more complete)
         pm25 = next((d.get('avg') for d in forecast.get('pm25', []) if d.get('day') == '2025-03-04'), None)
@@ -16,8 +14,8 @@ def fetch_aqi_data(city, token):
         o3 = next((d.get('avg') for d in forecast.get('o3', []) if d.get('day') == '2025-03-04'), None)
 
         return {
-            'datetime': data['data']['time']['s'],
-            'aqi': data['data']['aqi'],
+            'datetime': data['time']['s'],
+            'aqi': data['aqi'],
             'pm25': pm25,
             'pm10': pm10,
             'co': None,
@@ -1,65 +1,87 @@
-import requests
 import pandas as pd
 import os
 from datetime import datetime
 from dotenv import load_dotenv
+from src import fetcher, rolling_features, schema
 
-# Load environment variables
-load_dotenv()
-API_TOKEN = os.getenv("AQI_API_TOKEN")
 CITY = "Karachi"
 FEATURES_PATH = "data/features_store.csv"
+# Ring buffers behind the rolling features, so appends don't re-read the store
+ROLLING_STATE = "data/rolling_state.json"
 
-if not API_TOKEN:
-    raise ValueError("API token not found. Please set AQI_API_TOKEN in your .env file.")
+def api_token():
+    load_dotenv()
+    token = os.getenv("AQI_API_TOKEN")
+    if not token:
+        raise ValueError("API token not found. Please set AQI_API_TOKEN in your .env file.")
+    return token
 
 def fetch_aqi_data(city):
-    url = f"https://api.waqi.info/feed/{city}/?token={API_TOKEN}"
-    response = requests.get(url)
-    data = response.json()
-
-    if data.get("status") != "ok":
-        raise Exception(f"API Error: {data}")
-
-    aqi = data["data"]["aqi"]
-    iaqi = data["data"]["iaqi"]
-
-    pm25 = iaqi.get("pm25", {}).get("v", None)
-    pm10 = iaqi.get("pm10", {}).get("v", None)
-    o3 = iaqi.get("o3", {}).get("v", None)
+    data = fetcher.fetch_feed(city, api_token())
+    if data is None:
+        raise Exception(f"API Error: could not fetch {city}")
 
+    record = fetcher.normalize(city, data, fetched_at=datetime.utcnow())
     return {
-        "timestamp": datetime.utcnow(),
-        "aqi": aqi,
-        "pm25": pm25,
-        "pm10": pm10,
-        "o3": o3
+        "timestamp": record["fetched_at"],
+        "aqi": record["aqi"],
+        **{name: record[name] for name in rolling_features.POLLUTANTS}
     }
 
-# Always load old data if it exists, else start fresh
-if os.path.exists(FEATURES_PATH):
-    df = pd.read_csv(FEATURES_PATH)
-else:
-    df = pd.DataFrame(columns=["timestamp", "aqi", "pm25", "pm10", "o3"])
+BASE_COLUMNS = ["timestamp", "aqi"] + rolling_features.POLLUTANTS + ["hour", "day", "month", "aqi_change"]
+# Rolling features are also kept for the AQI itself (aqi_lag1 gives aqi_change)
+STREAM_COLUMNS = ["aqi"] + rolling_features.POLLUTANTS
+COLUMNS = BASE_COLUMNS + rolling_features.feature_names(STREAM_COLUMNS)
 
-# Fetch new data
-new_row = fetch_aqi_data(CITY)
-df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
+def rebuild(df):
+    """Recompute every feature over the whole store (first run or schema change)."""
+    for col in STREAM_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+    df = df.drop_duplicates(subset=["timestamp"], keep="last").copy()
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce", format="mixed")
+    df = df.dropna(subset=["timestamp"]).sort_values("timestamp").reset_index(drop=True)
+    df["hour"] = df["timestamp"].dt.hour
+    df["day"] = df["timestamp"].dt.day
+    df["month"] = df["timestamp"].dt.month
+    df["aqi_change"] = pd.to_numeric(df["aqi"], errors="coerce").diff().fillna(0)
+    df = pd.concat([df[BASE_COLUMNS], rolling_features.compute_batch(df, columns=STREAM_COLUMNS)], axis=1)
+    df.to_csv(FEATURES_PATH, index=False)
+    rolling_features.RollingFeatureEngine.from_history(df, columns=STREAM_COLUMNS).save(ROLLING_STATE)
+    return len(df)
 
-# Remove duplicates
-df.drop_duplicates(subset=["timestamp"], inplace=True)
-
-# Add time-based features
-df["timestamp"] = pd.to_datetime(df["timestamp"])
-df["hour"] = df["timestamp"].dt.hour
-df["day"] = df["timestamp"].dt.day
-df["month"] = df["timestamp"].dt.month
+def append(new_row):
+    """Features for one new observation from the persisted window state, appended to the store."""
+    engine = rolling_features.RollingFeatureEngine.load(ROLLING_STATE, STREAM_COLUMNS)
+    ts = pd.Timestamp(new_row["timestamp"])
+    features = engine.update(ts, new_row)
+    lag = features["aqi_lag1"]
+    row = {
+        **{col: new_row.get(col) for col in STREAM_COLUMNS},
+        "timestamp": ts,
+        "hour": ts.hour,
+        "day": ts.day,
+        "month": ts.month,
+        "aqi_change": 0 if pd.isna(lag) or new_row.get("aqi") is None else new_row["aqi"] - lag,
+        **features,
+    }
+    pd.DataFrame([row], columns=COLUMNS).to_csv(FEATURES_PATH, mode="a", header=False, index=False)
+    engine.save(ROLLING_STATE)
 
-# Add AQI change rate
-df["aqi_change"] = df["aqi"].diff().fillna(0)
+def main():
+    new_row = fetch_aqi_data(CITY)
+    os.makedirs(os.path.dirname(FEATURES_PATH), exist_ok=True)
 
-# Save to CSV
-os.makedirs(os.path.dirname(FEATURES_PATH), exist_ok=True)
-df.to_csv(FEATURES_PATH, index=False)
+    header = list(pd.read_csv(FEATURES_PATH, nrows=0).columns) if os.path.exists(FEATURES_PATH) else None
+    if header == COLUMNS and os.path.exists(ROLLING_STATE):
+        append(new_row)
+        print(f"Features updated successfully! Appended 1 row | Columns: {len(COLUMNS)}")
+    else:
+        # Always load old data if it exists, else start fresh
+        df = schema.load("features_store", FEATURES_PATH) if header is not None else pd.DataFrame(columns=["timestamp"])
+        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
+        total = rebuild(df)
+        print(f"Features rebuilt successfully! Total rows: {total} | Columns: {len(COLUMNS)}")
 
-print(f"Features updated successfully! Total rows: {len(df)} | Columns: {list(df.columns)}")
+if __name__ == "__main__":
+    main()
@@ -1,83 +1,122 @@
 import os
-import requests
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-import random
-import time
+from datetime import datetime
+from src import aqi_calc, fetcher, metrics, prediction_service
 
 
-API_TOKEN = os.getenv("AQI_API_TOKEN")
 CITY_LAT = 24.8607
 CITY_LON = 67.0011
 FORECAST_FILE = "data/forecast_3day.csv"
-MAX_RETRIES = 5
-RETRY_DELAY = 3  # seconds
+FORECAST_HOURLY_FILE = "data/forecast_hourly.csv"
+# Full calendar days after today in the daily forecast; the hourly one runs from the next
+# hour to the end of the last of them (72-96 hours)
+FORECAST_DAYS = 3
 
-if not API_TOKEN:
-    raise EnvironmentError("AQI_API_TOKEN environment variable not set!")
+# Pollutants with a WAQI daily forecast; the others are held at their current value
+FORECAST_POLLUTANTS = ["pm25", "pm10", "o3"]
+CURRENT_POLLUTANTS = ["co", "no2", "so2"]
+INTERVAL_COLUMNS = ["aqi_predicted", "aqi_lower", "aqi_upper"]
 
-API_URL = f"https://api.waqi.info/forecast/daily/geo:{CITY_LAT};{CITY_LON}/?token={API_TOKEN}"
+def api_token():
+    token = os.getenv("AQI_API_TOKEN")
+    if not token:
+        raise EnvironmentError("AQI_API_TOKEN environment variable not set!")
+    return token
 
 def fetch_forecast():
-    for attempt in range(1, MAX_RETRIES + 1):
-        try:
-            response = requests.get(API_URL, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            if data.get("status") != "ok" or "forecast" not in data.get("data", {}):
-                raise ValueError("Invalid API response structure")
-            return data["data"]["forecast"]["daily"]
-        except Exception as e:
-            print(f"API request failed (attempt {attempt}): {e}")
-            time.sleep(RETRY_DELAY)
-    print("[Warning] Max retries reached. Using placeholder forecast.")
-    return None
+    """Current station feed for the city centre (it carries the daily forecasts)."""
+    data = fetcher.fetch_feed((CITY_LAT, CITY_LON), api_token())
+    if data is None or "forecast" not in data:
+        print("[Warning] No forecast available.")
+        return None
+    return data
 
-def create_forecast_df(api_forecast):
-    rows = []
-    today = datetime.now()
-    if api_forecast:
-        # Use real API data
-        pm25_list = api_forecast.get("pm25", [])
-        pm10_list = api_forecast.get("pm10", [])
-        o3_list = api_forecast.get("o3", [])
-        for i in range(3):
-            try:
-                date_str = pm25_list[i]["day"]
-                rows.append({
-                    "prediction_time": date_str,
-                    "pm25": pm25_list[i]["avg"],
-                    "pm10": pm10_list[i]["avg"],
-                    "o3": o3_list[i]["avg"],
-                    "aqi_predicted": pm25_list[i]["avg"],  # simplified AQI proxy
-                })
-            except IndexError:
-                # If API data less than 3 days, fill placeholder
-                rows.append({
-                    "prediction_time": (today + timedelta(days=i)).strftime("%Y-%m-%d"),
-                    "pm25": random.randint(100, 200),
-                    "pm10": random.randint(80, 150),
-                    "o3": random.randint(10, 50),
-                    "aqi_predicted": random.randint(150, 250),
-                })
-    else:
-        # Placeholder if API fails
-        for i in range(3):
-            rows.append({
-                "prediction_time": (today + timedelta(days=i)).strftime("%Y-%m-%d"),
-                "pm25": random.randint(100, 200),
-                "pm10": random.randint(80, 150),
-                "o3": random.randint(10, 50),
-                "aqi_predicted": random.randint(150, 250),
-            })
-    return pd.DataFrame(rows)
+def horizon_hours(now=None, days=FORECAST_DAYS):
+    """Hours from the next full hour to midnight after the `days`-th day after today."""
+    now = pd.Timestamp(now or datetime.now())
+    end = now.normalize() + pd.Timedelta(days=days + 1)
+    return int((end - now.ceil("h")) / pd.Timedelta(hours=1))
 
+def build_feature_matrix(data, now=None, hours=None):
+    """One model feature row per hour over the next `hours` hours (default: horizon_hours()).
+
+    Daily forecast averages are anchored at noon of their day and linearly
+    interpolated to each hour (held flat beyond the first/last day).
+    """
+    now = now or datetime.now()
+    start = pd.Timestamp(now).ceil("h")
+    times = pd.date_range(start, periods=hours or horizon_hours(now), freq="h")
+    daily = data.get("forecast", {}).get("daily", {})
+    iaqi = data.get("iaqi", {})
+    hour_ns = times.asi8.astype(float)
+
+    X = pd.DataFrame({"prediction_time": times})
+    for name in FORECAST_POLLUTANTS:
+        days = daily.get(name, [])
+        if days:
+            anchors = (pd.to_datetime([d["day"] for d in days]) + pd.Timedelta(hours=12)).asi8.astype(float)
+            values = np.array([d["avg"] for d in days], dtype=float)
+            order = np.argsort(anchors)
+            X[name] = np.interp(hour_ns, anchors[order], values[order])
+        else:
+            X[name] = iaqi.get(name, {}).get("v", 0)
+    for name in CURRENT_POLLUTANTS:
+        X[name] = iaqi.get(name, {}).get("v", 0)
+    X["hour"] = times.hour
+    X["day"] = times.day
+    X["month"] = times.month
+    X["aqi_change"] = 0.0
+    return X
+
+def create_forecast_df(data, now=None):
+    """Hourly forecast through the end of the FORECAST_DAYS-th day with prediction intervals, from one model call.
+
+    WAQI forecasts sub-indices, so the pollutant with the highest one is the
+    hour's dominant pollutant.
+    """
+    X = build_feature_matrix(data, now)
+    predicted = prediction_service.predict_intervals(X.drop(columns=["prediction_time"]))
+    X = X.join(predicted)
+    X["dominant_pollutant"] = aqi_calc.combine(X[FORECAST_POLLUTANTS + CURRENT_POLLUTANTS])[1]
+    return X[["prediction_time"] + FORECAST_POLLUTANTS + CURRENT_POLLUTANTS + INTERVAL_COLUMNS +
+             ["dominant_pollutant"]].round(2)
+
+def daily_summary(hourly, days=FORECAST_DAYS):
+    """Per-day means of the hourly forecast (interval bounds included), plus the day's AQI range
+    and the pollutant with the highest mean sub-index.
+
+    Only the last `days` days with all 24 hours are summarised, so the rest of today is left out.
+    """
+    day = hourly["prediction_time"].dt.strftime("%Y-%m-%d").rename("prediction_time")
+    hourly = hourly[day.map(day.value_counts()) == 24]
+    day = day[hourly.index]
+    pollutants = [p for p in FORECAST_POLLUTANTS + CURRENT_POLLUTANTS if p in hourly]
+    means = hourly[pollutants].groupby(day).mean()
+    daily = hourly.groupby(day).agg(
+        pm25=("pm25", "mean"),
+        pm10=("pm10", "mean"),
+        o3=("o3", "mean"),
+        aqi_predicted=("aqi_predicted", "mean"),
+        aqi_min=("aqi_predicted", "min"),
+        aqi_max=("aqi_predicted", "max"),
+        aqi_lower=("aqi_lower", "mean"),
+        aqi_upper=("aqi_upper", "mean"),
+    )
+    daily["dominant_pollutant"] = aqi_calc.combine(means)[1]
+    return daily.tail(days).round(2).reset_index()
+
+@metrics.timer("job", job="forecast_aqi")
 def main():
     os.makedirs("data", exist_ok=True)
-    api_forecast = fetch_forecast()
-    df = create_forecast_df(api_forecast)
-    df.to_csv(FORECAST_FILE, index=False)
-    print(f"Forecast saved to {FORECAST_FILE}")
+    data = fetch_forecast()
+    if data is None:
+        # Fail the run, so the scheduler retries it instead of waiting a day
+        raise RuntimeError(f"No forecast data; kept the previous {FORECAST_FILE}")
+    hourly = create_forecast_df(data)
+    hourly.to_csv(FORECAST_HOURLY_FILE, index=False)
+    daily_summary(hourly).to_csv(FORECAST_FILE, index=False)
+    print(f"Forecast saved to {FORECAST_FILE} and {FORECAST_HOURLY_FILE}")
 
 if __name__ == "__main__":
     main()
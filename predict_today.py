@@ -1,102 +1,82 @@
 import os
-import requests
-import joblib
 import pandas as pd
-import numpy as np
 from datetime import datetime
 from dotenv import load_dotenv
-
-load_dotenv()
-WAQI_API_TOKEN = os.getenv("AQI_API_TOKEN")
-if not WAQI_API_TOKEN:
-    raise Exception("AQI_API_TOKEN environment variable is not set!")
-
-
-MODEL_PATH = "karachi_aqi_model.pkl"
-if not os.path.exists(MODEL_PATH):
-    raise FileNotFoundError(f"{MODEL_PATH} not found!")
-model = joblib.load(MODEL_PATH)
-
-
-API_URL = f"https://api.waqi.info/feed/karachi/?token={WAQI_API_TOKEN}"
-response = requests.get(API_URL)
-data = response.json()
-if data.get("status") != "ok":
-    raise Exception("Failed to fetch AQI data!")
-
-iaqi = data["data"].get("iaqi", {})
-forecast = data["data"].get("forecast", {}).get("daily", {})
-actual_aqi = data["data"].get("aqi", 0)
-today_str = datetime.now().strftime("%Y-%m-%d")
-
-
-def get_pollutant(name):
-    value = iaqi.get(name, {}).get("v")
-    if value is None and name in forecast:
-        for f in forecast[name]:
-            if f["day"] == today_str:
-                value = f["avg"]
-                break
-    return value if value is not None else 0
-
-features = {
-    "pm25": get_pollutant("pm25"),
-    "pm10": get_pollutant("pm10"),
-    "o3": get_pollutant("o3"),
-    "co": get_pollutant("co"),
-    "no2": get_pollutant("no2"),
-    "so2": get_pollutant("so2"),
-    "hour": datetime.now().hour,
-    "day": datetime.now().day,
-    "month": datetime.now().month,
-}
-
-X_new = pd.DataFrame([features])
-for col in model.feature_names_in_:
-    if col not in X_new.columns:
-        X_new[col] = 0
-X_new = X_new[model.feature_names_in_]
-
-
-aqi_predicted = model.predict(X_new)[0]
-
-# Add small random noise (±2%)
-noise = np.random.uniform(-0.02, 0.02) * aqi_predicted
-aqi_predicted += noise
-
-print(f"Predicted AQI (with noise): {aqi_predicted:.2f} at {datetime.now()}")
-
-df_new = pd.DataFrame([{
-    "prediction_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-    "aqi_predicted": round(aqi_predicted, 2),
-    **features,
-    "aqi": actual_aqi,
-    "aqi_change": round(aqi_predicted - actual_aqi, 2)
-}])
-
-csv_file = os.path.join("data", "daily_predictions.csv")
-os.makedirs(os.path.dirname(csv_file), exist_ok=True)
-
-if os.path.exists(csv_file):
-    df_existing = pd.read_csv(csv_file)
-    
-    
-    df_existing['prediction_time'] = pd.to_datetime(
-        df_existing['prediction_time'], errors='coerce'
-    )
-   
-    df_existing = df_existing.dropna(subset=['prediction_time'])
-    
-   
-    df_existing = df_existing.drop_duplicates(subset=['prediction_time'], keep='last')
-    
-   
-    today_date = datetime.today().date()
-    df_existing = df_existing[df_existing['prediction_time'].dt.date != today_date]
-    
-    df_all = pd.concat([df_existing, df_new], ignore_index=True)
-else:
-    df_all = df_new
-
-df_all.to_csv(csv_file, index=False)
-print("Prediction saved successfully (with noise)!")
+from src import fetcher, prediction_service, history_store, metrics
+
+
+def fetch_current(token):
+    data = fetcher.fetch_feed("karachi", token)
+    if data is None:
+        raise Exception("Failed to fetch AQI data!")
+    return data
+
+
+def build_features(data, now):
+    iaqi = data.get("iaqi", {})
+    forecast = data.get("forecast", {}).get("daily", {})
+    today_str = now.strftime("%Y-%m-%d")
+
+    def get_pollutant(name):
+        value = iaqi.get(name, {}).get("v")
+        if value is None and name in forecast:
+            for f in forecast[name]:
+                if f["day"] == today_str:
+                    value = f["avg"]
+                    break
+        return value if value is not None else 0
+
+    features = {
+        "pm25": get_pollutant("pm25"),
+        "pm10": get_pollutant("pm10"),
+        "o3": get_pollutant("o3"),
+        "co": get_pollutant("co"),
+        "no2": get_pollutant("no2"),
+        "so2": get_pollutant("so2"),
+        "hour": now.hour,
+        "day": now.day,
+        "month": now.month,
+    }
+    return features, data.get("aqi", 0)
+
+
+def save_prediction(df_new):
+    """Store today's prediction, replacing any earlier prediction for the same day."""
+    # First run against an old checkout: move the CSV history into the store
+    history_store.import_csv()
+    history_store.upsert(df_new)
+
+
+@metrics.timer("job", job="predict_today")
+def main():
+    load_dotenv()
+    token = os.getenv("AQI_API_TOKEN")
+    if not token:
+        raise Exception("AQI_API_TOKEN environment variable is not set!")
+
+    now = datetime.now()
+    features, actual_aqi = build_features(fetch_current(token), now)
+
+    # Served by a resident model when PREDICTION_SERVICE_URL is set
+    interval = prediction_service.predict_intervals(pd.DataFrame([features])).iloc[0]
+    aqi_predicted = float(interval["aqi_predicted"])
+    level = prediction_service.INTERVAL
+
+    print(f"Predicted AQI: {aqi_predicted:.2f} ({level:.0%} interval "
+          f"{interval['aqi_lower']:.2f}-{interval['aqi_upper']:.2f}) at {now}")
+
+    df_new = pd.DataFrame([{
+        "prediction_time": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "aqi_predicted": round(aqi_predicted, 2),
+        "aqi_lower": round(float(interval["aqi_lower"]), 2),
+        "aqi_upper": round(float(interval["aqi_upper"]), 2),
+        **features,
+        "aqi": actual_aqi,
+        "aqi_change": round(aqi_predicted - actual_aqi, 2)
+    }])
+    save_prediction(df_new)
+    print("Prediction saved successfully!")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,117 +1,261 @@
 import os
+import json
 import smtplib
+from datetime import datetime, timedelta
 from email.message import EmailMessage
+import numpy as np
 import requests
 import pandas as pd
+from src import history_store, metrics, schema
 
 # File paths
-DAILY_PRED = "data/daily_predictions.csv"
 FORECAST_FILE = "data/forecast_3day.csv"
+# Which (source, day) pairs were already alerted, and at which band
+ALERT_STATE_FILE = os.getenv("ALERT_STATE_FILE", "data/alert_state.json")
 
-def load_latest(file_path):
-    """Load the latest row with valid AQI from CSV. Uses last row to ensure latest entry is picked."""
-    if not os.path.exists(file_path):
-        print(f"{file_path} not found.")
-        return None
+# Severity bands as "name:lower_bound,...". ALERT_THRESHOLD moves the lowest bound.
+DEFAULT_BANDS = "high:{threshold},hazardous:300"
+# Re-send an alert for the same day only after this long, unless it escalates
+COOLDOWN_HOURS = float(os.getenv("ALERT_COOLDOWN_HOURS", 24))
 
-    df = pd.read_csv(file_path)
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 465))
+SMTP_SSL = os.getenv("SMTP_SSL", "1") != "0"
+
+# Pooled connections for webhook calls
+_session = requests.Session()
+
+
+def alert_bands():
+    """Severity bands as [(name, lower_bound)], sorted by bound."""
+    threshold = float(os.getenv("ALERT_THRESHOLD", 200))
+    spec = os.getenv("ALERT_BANDS") or DEFAULT_BANDS.format(threshold=threshold)
+    bands = []
+    for item in spec.split(","):
+        name, lower = item.split(":")
+        bands.append((name.strip(), float(lower)))
+    return sorted(bands, key=lambda b: b[1])
 
-    # Determine AQI column
-    aqi_col = "aqi_predicted" if "aqi_predicted" in df.columns else "predicted_aqi"
-    if aqi_col not in df.columns:
-        print(f"No AQI column found in {file_path}")
-        return None
 
-    # Keep only rows with valid AQI
-    df_valid = df[df[aqi_col].notna()]
+def load_latest_prediction():
+    """Latest prediction with a valid AQI, from the history store's latest-value index."""
+    df = history_store.latest(history_store.LATEST_ROWS)
+    if df["aqi_predicted"].isna().all():
+        df = history_store.read_range()
+    df_valid = df[df["aqi_predicted"].notna()]
     if df_valid.empty:
-        print("No valid AQI found in CSV")
+        print("No valid AQI found in prediction history")
         return None
+    return df_valid.iloc[-1]
 
-    # Take the last row of the CSV (append-only assumption)
-    latest_row = df_valid.tail(1).iloc[0]
 
-    # Flexible datetime parsing
-    try:
-        latest_row["prediction_time"] = pd.to_datetime(latest_row["prediction_time"], errors="coerce")
-    except:
-        pass
-
-    return latest_row
-
-def send_email(subject, body, to_addr):
-    user = os.getenv("SMTP_USER")
-    pwd = os.getenv("SMTP_PASS")
-    if not user or not pwd:
-        print("SMTP creds not set. Skipping email.")
-        return
-    msg = EmailMessage()
-    msg["Subject"] = subject
-    msg["From"] = user
-    msg["To"] = to_addr
-    msg.set_content(body)
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as s:
-            s.login(user, pwd)
-            s.send_message(msg)
-        print("Email sent to", to_addr)
-    except Exception as e:
-        print("Email sending failed:", e)
-
-def send_webhook(url, payload):
-    try:
-        r = requests.post(url, json=payload, timeout=10)
-        print("Webhook status", r.status_code)
-    except Exception as e:
-        print("Webhook error:", e)
+def evaluate(df, source, bands=None):
+    """Classify every row of df against the severity bands in one pass.
 
-def check_threshold(aqi, time, source):
-    threshold = float(os.getenv("ALERT_THRESHOLD", 200))
-    if pd.isna(aqi):
-        print(f"AQI value missing for {source} at {time}")
-        return
-    if aqi >= threshold:
-        subject = f"[ALERT] High AQI {aqi:.0f} ({source})"
-        body = f"Predicted AQI: {aqi:.0f}\nTime: {time}\nSource: {source}\nPlease take action."
+    Returns one row per breach with source, prediction_time, aqi, band and
+    band_rank (index into bands, higher is more severe).
+    """
+    bands = bands or alert_bands()
+    aqi = df["aqi_predicted"].astype(float) if "aqi_predicted" in df.columns else pd.Series(np.nan, index=df.index)
+    missing = int(aqi.isna().sum())
+    if missing:
+        print(f"AQI value missing for {missing} rows of {source}")
+
+    lowers = np.array([lower for _, lower in bands])
+    rank = np.searchsorted(lowers, aqi.to_numpy(dtype=float), side="right") - 1
+    breach = (rank >= 0) & aqi.notna().to_numpy()
+
+    names = np.array([name for name, _ in bands], dtype=object)
+    out = pd.DataFrame({
+        "source": source,
+        "prediction_time": pd.to_datetime(df["prediction_time"], errors="coerce")[breach].to_numpy(),
+        "aqi": aqi[breach].to_numpy(),
+        "band_rank": rank[breach],
+        "band": names[rank[breach]],
+    })
+    print(f"{source}: {len(out)} of {len(df)} rows at or above {bands[0][1]:.0f}")
+    return out
+
+
+def load_state(path=ALERT_STATE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path=ALERT_STATE_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _state_key(source, ts):
+    day = ts.strftime("%Y-%m-%d") if not pd.isna(ts) else "unknown"
+    return f"{source}|{day}"
+
+
+def filter_new(breaches, state, now=None, cooldown_hours=COOLDOWN_HOURS):
+    """Drop breaches already alerted for the same source and day.
+
+    A breach is sent again if it escalated to a more severe band or the
+    cooldown for that day has passed.
+    """
+    if breaches.empty:
+        return breaches
+    now = now or datetime.now()
+    keys = [_state_key(s, t) for s, t in zip(breaches["source"], breaches["prediction_time"])]
+    prev_rank = np.array([state.get(k, {}).get("band_rank", -1) for k in keys])
+    prev_sent = pd.to_datetime(pd.Series([state.get(k, {}).get("sent_at") for k in keys]), errors="coerce")
+    cooled = (prev_sent.isna() | (now - prev_sent >= timedelta(hours=cooldown_hours))).to_numpy()
+    keep = cooled | (breaches["band_rank"].to_numpy() > prev_rank)
+    return breaches[keep].reset_index(drop=True)
+
+
+def record_sent(breaches, state, now=None, retention_days=14):
+    now = now or datetime.now()
+    for source, ts, rank, band in breaches[["source", "prediction_time", "band_rank", "band"]].itertuples(index=False):
+        state[_state_key(source, ts)] = {"band_rank": int(rank), "band": band, "sent_at": now.isoformat()}
+    cutoff = now - timedelta(days=retention_days)
+    return {k: v for k, v in state.items() if pd.Timestamp(v["sent_at"]) >= cutoff}
+
+
+def format_digest(breaches):
+    top = breaches.loc[breaches["aqi"].idxmax()]
+    subject = f"[ALERT] High AQI {top['aqi']:.0f} ({top['band']}, {len(breaches)} alert{'s' if len(breaches) > 1 else ''})"
+    lines = [f"{row.source} | {row.prediction_time} | AQI {row.aqi:.0f} | {row.band}"
+             for row in breaches.sort_values(["band_rank", "aqi"], ascending=False).itertuples()]
+    body = "\n".join(lines) + "\n\nPlease take action."
+    return subject, body
+
+
+class Notifier:
+    """Sends digests over one SMTP connection and a pooled HTTP session."""
+
+    def __init__(self, session=None):
+        self.session = session or _session
+        self._smtp = None
+
+    def _smtp_connection(self, user, pwd):
+        if self._smtp is not None:
+            try:
+                self._smtp.noop()
+                return self._smtp
+            except smtplib.SMTPException:
+                self._smtp = None
+        smtp_cls = smtplib.SMTP_SSL if SMTP_SSL else smtplib.SMTP
+        self._smtp = smtp_cls(SMTP_HOST, SMTP_PORT, timeout=30)
+        if pwd:
+            self._smtp.login(user, pwd)
+        return self._smtp
+
+    def send_email(self, subject, body, to_addrs):
+        user = os.getenv("SMTP_USER")
+        pwd = os.getenv("SMTP_PASS")
+        if not user:
+            print("SMTP creds not set. Skipping email.")
+            return False
+        msg = EmailMessage()
+        msg["Subject"] = subject
+        msg["From"] = user
+        msg["To"] = ", ".join(to_addrs)
+        msg.set_content(body)
+        try:
+            with metrics.timer("alert_dispatch", channel="email"):
+                self._smtp_connection(user, pwd).send_message(msg)
+            print("Email sent to", msg["To"])
+            metrics.inc("alerts_sent", channel="email")
+            return True
+        except Exception as e:
+            print("Email sending failed:", e)
+            metrics.inc("alerts_failed", channel="email")
+            self.close()
+            return False
+
+    def send_webhook(self, url, payload):
+        try:
+            with metrics.timer("alert_dispatch", channel="webhook"):
+                r = self.session.post(url, json=payload, timeout=10)
+            print("Webhook status", r.status_code)
+            metrics.inc("alerts_sent" if r.ok else "alerts_failed", channel="webhook")
+            return r.ok
+        except Exception as e:
+            print("Webhook error:", e)
+            metrics.inc("alerts_failed", channel="webhook")
+            return False
+
+    def send_digest(self, breaches):
+        """One email and one webhook call for all breaches. Returns True if any channel delivered it."""
+        subject, body = format_digest(breaches)
+        sent = []
         to = os.getenv("ALERT_EMAIL_TO")
         if to:
-            send_email(subject, body, to)
+            sent.append(self.send_email(subject, body, [a.strip() for a in to.split(",")]))
         webhook = os.getenv("ALERT_WEBHOOK_URL")
         if webhook:
-            send_webhook(webhook, {"text": subject, "aqi": aqi, "time": str(time), "source": source})
-        print(f"Alert triggered from {source}: {aqi}")
-    else:
-        print(f"AQI OK from {source}: {aqi}")
+            alerts = [{"aqi": float(r.aqi), "time": str(r.prediction_time), "source": r.source, "band": r.band}
+                      for r in breaches.itertuples()]
+            sent.append(self.send_webhook(webhook, {"text": subject, "aqi": float(breaches["aqi"].max()),
+                                                    "alerts": alerts}))
+        if not sent:
+            print("No alert channel set (ALERT_EMAIL_TO, ALERT_WEBHOOK_URL). Alerts not sent.")
+        return any(sent)
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+
+def check_and_alert(notifier=None, state_file=ALERT_STATE_FILE, now=None):
+    bands = alert_bands()
+    frames = []
 
-def check_and_alert():
     # --- Daily Prediction ---
-    latest_daily = load_latest(DAILY_PRED)
+    latest_daily = load_latest_prediction()
     if latest_daily is not None:
-        aqi_value = latest_daily.get("aqi_predicted", latest_daily.get("predicted_aqi", None))
-        if pd.isna(aqi_value):
-            print(f"AQI value missing for Daily Prediction at {latest_daily['prediction_time']}")
-        else:
-            check_threshold(float(aqi_value), latest_daily["prediction_time"], "Daily Prediction")
+        frames.append(evaluate(latest_daily.to_frame().T, "Daily Prediction", bands))
 
     # --- 3-Day Forecast ---
     if os.path.exists(FORECAST_FILE):
-        forecast_df = pd.read_csv(FORECAST_FILE)
+        forecast_df = schema.load("forecast_daily", FORECAST_FILE)
         if not forecast_df.empty:
-            for _, row in forecast_df.iterrows():
-                aqi_forecast = row.get("aqi_predicted", row.get("predicted_aqi", None))
-                if pd.isna(aqi_forecast):
-                    print(f"AQI value missing for 3-Day Forecast at {row['prediction_time']}")
-                    continue
-                # Flexible datetime parse
-                try:
-                    pred_time = pd.to_datetime(row["prediction_time"], errors="coerce")
-                except:
-                    pred_time = row["prediction_time"]
-                check_threshold(float(aqi_forecast), pred_time, "3-Day Forecast")
+            frames.append(evaluate(forecast_df, "3-Day Forecast", bands))
         else:
             print(f"{FORECAST_FILE} is empty.")
     else:
         print(f"{FORECAST_FILE} not found.")
 
+    if not frames:
+        return 0
+    breaches = pd.concat(frames, ignore_index=True)
+    state = load_state(state_file)
+    new = filter_new(breaches, state, now)
+    if len(new) < len(breaches):
+        print(f"{len(breaches) - len(new)} alerts suppressed (already sent)")
+    if new.empty:
+        print("AQI OK, no new alerts.")
+        return 0
+
+    own_notifier = notifier is None
+    notifier = notifier or Notifier()
+    try:
+        delivered = notifier.send_digest(new)
+    finally:
+        if own_notifier:
+            notifier.close()
+    if delivered:
+        save_state(record_sent(new, state, now), state_file)
+        print(f"Alert triggered: {len(new)} breaches")
+    else:
+        print(f"{len(new)} breaches not delivered; they will be retried on the next run")
+    return len(new) if delivered else 0
+
+
 if __name__ == "__main__":
     check_and_alert()
@@ -0,0 +1,174 @@
+"""AQI from pollutant concentrations, vectorized over whole columns.
+
+A standard is a breakpoint table per pollutant: concentration ranges
+[lo, hi] and the index range they map to. A concentration is truncated to
+the table's precision, its range is found with np.searchsorted on the
+range tops, and the sub-index is interpolated linearly inside the range and
+rounded. The AQI of a row is its highest sub-index; that pollutant is the
+dominant one. Concentrations above the top of a table are capped at its
+highest index: 500 for most tables, 300 for 8-hour O3, whose table ends at
+0.200 ppm (higher ozone is indexed from 1-hour averages, not covered here).
+
+Concentrations are in the units of the tables (UNITS): µg/m³ for PM, ppm
+for O3 and CO, ppb for NO2 and SO2. convert() turns µg/m³ (or mg/m³, ppb,
+ppm) readings into them. The tables apply to averages over AVERAGING
+windows (8 h O3 and CO, 24 h PM); averaged() computes those from hourly
+readings.
+
+Standards: "epa" (US EPA, 2024 PM2.5 update), "epa-2012" (the table WAQI
+and older EPA data use) and "pakistan", which follows the EPA table.
+AQI_STANDARD selects the default.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+POLLUTANTS = ["pm25", "pm10", "o3", "co", "no2", "so2"]
+UNITS = {"pm25": "µg/m³", "pm10": "µg/m³", "o3": "ppm", "co": "ppm", "no2": "ppb", "so2": "ppb"}
+# Averaging window each table assumes
+AVERAGING = {"pm25": "24h", "pm10": "24h", "o3": "8h", "co": "8h", "no2": "1h", "so2": "1h"}
+# Decimals concentrations are truncated to before the lookup
+DECIMALS = {"pm25": 1, "pm10": 0, "o3": 3, "co": 1, "no2": 0, "so2": 0}
+# g/mol, for µg/m³ <-> ppb at 25 °C and 1 atm (24.45 l/mol)
+MOLAR_MASS = {"o3": 48.00, "co": 28.01, "no2": 46.01, "so2": 64.07}
+MOLAR_VOLUME = 24.45
+
+_INDEX_6 = [(0, 50), (51, 100), (101, 150), (151, 200), (201, 300), (301, 500)]
+_INDEX_7 = [(0, 50), (51, 100), (101, 150), (151, 200), (201, 300), (301, 400), (401, 500)]
+
+# {pollutant: [(conc lo, conc hi, index lo, index hi), ...]}
+_EPA_GASES = {
+    "o3": [(0.000, 0.054), (0.055, 0.070), (0.071, 0.085), (0.086, 0.105), (0.106, 0.200)],
+    "co": [(0.0, 4.4), (4.5, 9.4), (9.5, 12.4), (12.5, 15.4), (15.5, 30.4), (30.5, 50.4)],
+    "no2": [(0, 53), (54, 100), (101, 360), (361, 649), (650, 1249), (1250, 2049)],
+    "so2": [(0, 35), (36, 75), (76, 185), (186, 304), (305, 604), (605, 1004)],
+}
+_EPA_2024 = {
+    "pm25": [(0.0, 9.0), (9.1, 35.4), (35.5, 55.4), (55.5, 125.4), (125.5, 225.4), (225.5, 325.4)],
+    "pm10": [(0, 54), (55, 154), (155, 254), (255, 354), (355, 424), (425, 604)],
+    **_EPA_GASES,
+}
+_EPA_2012 = {
+    "pm25": [(0.0, 12.0), (12.1, 35.4), (35.5, 55.4), (55.5, 150.4), (150.5, 250.4), (250.5, 350.4),
+             (350.5, 500.4)],
+    "pm10": [(0, 54), (55, 154), (155, 254), (255, 354), (355, 424), (425, 504), (505, 604)],
+    "o3": _EPA_GASES["o3"],
+    "co": [(0.0, 4.4), (4.5, 9.4), (9.5, 12.4), (12.5, 15.4), (15.5, 30.4), (30.5, 40.4), (40.5, 50.4)],
+    "no2": [(0, 53), (54, 100), (101, 360), (361, 649), (650, 1249), (1250, 1649), (1650, 2049)],
+    "so2": [(0, 35), (36, 75), (76, 185), (186, 304), (305, 604), (605, 804), (805, 1004)],
+}
+
+
+def _table(ranges):
+    index = _INDEX_7 if len(ranges) == 7 else _INDEX_6
+    return [(lo, hi, ilo, ihi) for (lo, hi), (ilo, ihi) in zip(ranges, index)]
+
+
+STANDARDS = {
+    "epa": {name: _table(r) for name, r in _EPA_2024.items()},
+    "epa-2012": {name: _table(r) for name, r in _EPA_2012.items()},
+}
+# Pakistan's provincial EPAs report the US EPA index
+ALIASES = {"pakistan": "epa", "us": "epa"}
+STANDARD = os.getenv("AQI_STANDARD", "epa")
+
+_arrays = {}
+
+
+def breakpoints(pollutant, standard=STANDARD):
+    """(conc lo, conc hi, index lo, index hi) arrays of a pollutant's table."""
+    key = (ALIASES.get(standard, standard), pollutant)
+    if key not in _arrays:
+        if key[0] not in STANDARDS:
+            raise ValueError(f"Unknown AQI standard {standard!r}; known: {sorted(STANDARDS) + sorted(ALIASES)}")
+        rows = STANDARDS[key[0]].get(pollutant)
+        if rows is None:
+            raise ValueError(f"No {pollutant!r} breakpoints in the {key[0]} standard")
+        _arrays[key] = tuple(np.array(col, dtype=np.float64) for col in zip(*rows))
+    return _arrays[key]
+
+
+def sub_index(values, pollutant, standard=STANDARD):
+    """Sub-index of each concentration (NaN stays NaN), as float64."""
+    lo, hi, ilo, ihi = breakpoints(pollutant, standard)
+    c = np.asarray(values, dtype=np.float64)
+    scale = 10.0 ** DECIMALS[pollutant]
+    # Truncate like the EPA does, so 9.05 falls in 0.0-9.0 and not in the gap before 9.1
+    c = np.clip(np.floor(c * scale + 1e-9) / scale, 0, hi[-1])
+    i = np.searchsorted(hi, c, side="left")
+    # NaN sorts past the end; any valid index works, the result stays NaN
+    i = np.minimum(i, len(hi) - 1)
+    # Rounded half up, as the EPA does (np.rint would round 125.5 to 126 but 124.5 to 124)
+    return np.floor(ilo[i] + (ihi[i] - ilo[i]) / (hi[i] - lo[i]) * (c - lo[i]) + 0.5)
+
+
+def sub_indices(concentrations, standard=STANDARD, pollutants=None):
+    """DataFrame of the sub-indices of every pollutant present in `concentrations` (a frame or dict)."""
+    names = [p for p in (pollutants or POLLUTANTS) if p in concentrations]
+    index = concentrations.index if isinstance(concentrations, pd.DataFrame) else None
+    return pd.DataFrame({p: sub_index(concentrations[p], p, standard) for p in names}, index=index)
+
+
+def combine(indices):
+    """(aqi, dominant pollutant) per row from a frame of sub-indices; NaN/None where all are missing."""
+    values = indices.to_numpy(dtype=np.float64)
+    if values.shape[1] == 0:
+        return np.full(len(values), np.nan), np.full(len(values), None, dtype=object)
+    filled = np.where(np.isnan(values), -np.inf, values)
+    best = filled.argmax(axis=1)
+    aqi = filled[np.arange(len(values)), best]
+    missing = np.isneginf(aqi)
+    aqi[missing] = np.nan
+    dominant = np.asarray(indices.columns, dtype=object)[best]
+    dominant[missing] = None
+    return aqi, dominant
+
+
+def compute(concentrations, standard=STANDARD):
+    """Sub-indices of the pollutants present plus the aqi and dominant columns."""
+    out = sub_indices(concentrations, standard)
+    out["aqi"], out["dominant"] = combine(out)
+    return out
+
+
+def convert(values, pollutant, unit):
+    """Concentrations in `unit` (µg/m³, ug/m3, mg/m³, ppm, ppb) in the table unit of the pollutant."""
+    unit = str(unit).strip().lower().replace("µ", "u").replace("μ", "u").replace("³", "3")
+    target = UNITS[pollutant].replace("µ", "u").replace("³", "3")
+    values = np.asarray(values, dtype=np.float64)
+    if unit == target:
+        return values
+    if unit in ("mg/m3", "ug/m3"):
+        ug = values * (1000.0 if unit == "mg/m3" else 1.0)
+        if target == "ug/m3":
+            return ug
+        ppb = ug * MOLAR_VOLUME / MOLAR_MASS[pollutant]
+        return ppb / 1000.0 if target == "ppm" else ppb
+    if unit in ("ppm", "ppb") and target in ("ppm", "ppb"):
+        return values * (1000.0 if unit == "ppm" else 0.001)
+    raise ValueError(f"Cannot convert {pollutant} from {unit!r} to {UNITS[pollutant]}")
+
+
+def averaged(df, time_col, by=None, windows=AVERAGING):
+    """Trailing means of each pollutant over its window, per `by` group, in the rows' original order.
+
+    A window holds the readings in (t - window, t]; as long as it holds one,
+    the mean is defined (the EPA's 75 % completeness rule is not applied).
+    """
+    out = df.copy()
+    names = [p for p in windows if p in df and pd.Timedelta(windows[p]) > pd.Timedelta("1h")]
+    if not names or df.empty:
+        return out
+    times = df[time_col].to_numpy()
+    timed = np.flatnonzero(df[time_col].notna().to_numpy())
+    groups = [timed] if by is None else \
+        [timed[i] for i in df.iloc[timed].groupby(by, sort=False, observed=True).indices.values()]
+    columns = {p: out[p].to_numpy(copy=True) for p in names}
+    for rows in groups:
+        rows = rows[np.argsort(times[rows], kind="stable")]
+        for p, col in columns.items():
+            series = pd.Series(col[rows], index=pd.DatetimeIndex(times[rows]))
+            col[rows] = series.rolling(windows[p], min_periods=1).mean().to_numpy()
+    for p, col in columns.items():
+        out[p] = col
+    return out
@@ -0,0 +1,304 @@
+"""Walk-forward backtest of candidate AQI models.
+
+Folds are cut at evenly spaced points in time. Each model is trained on the
+rows up to the cutoff (all of them for "expanding" folds, the last
+--window-hours for "sliding" ones) and scored on the rows of the next
+HORIZON_HOURS, with RMSE/MAE reported per horizon bucket (hours after the
+cutoff). Every (model, fold) pair runs as a separate task in a process pool
+and records its fit and predict wall time and peak traced memory
+(tracemalloc, i.e. Python and NumPy allocations).
+
+The report (reports/backtest.json) holds the per-fold records and a
+per-model summary; pass --baseline with an earlier report to print the
+change in error and cost.
+
+Usage: python -m src.backtest [--models random_forest persistence] [--folds 5]
+"""
+import os
+import json
+import math
+import time
+import argparse
+import warnings
+import tracemalloc
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import train_model
+
+REPORT_PATH = "reports/backtest.json"
+N_FOLDS = 5
+HORIZON_HOURS = 72
+# Upper edges (hours after the cutoff) of the buckets errors are reported in
+HORIZON_BINS = (1, 3, 6, 12, 24, 48, 72)
+MIN_TRAIN_ROWS = 12
+MAX_WORKERS = int(os.getenv("BACKTEST_WORKERS", os.cpu_count() or 1))
+# Univariate baselines only see this much (hourly) history
+UNIVARIATE_HISTORY_HOURS = 24 * 28
+
+
+class FeatureModel:
+    """sklearn regressor on train_model.FEATURES."""
+
+    def __init__(self, estimator):
+        self.estimator = estimator
+
+    def fit(self, train):
+        self.estimator.fit(train[train_model.FEATURES], train["aqi"])
+
+    def predict(self, test, cutoff):
+        return self.estimator.predict(test[train_model.FEATURES])
+
+
+class UnivariateModel:
+    """AQI-only forecaster over the hourly resampled series ("persistence", "ets" or "arima")."""
+
+    def __init__(self, kind):
+        self.kind = kind
+
+    def fit(self, train):
+        series = train.set_index(train_model.TIME_COL)["aqi"].resample("h").mean().interpolate()
+        self.series = series.iloc[-UNIVARIATE_HISTORY_HOURS:].reset_index(drop=True)
+        self.last_hour = series.index[-1]
+        self.result = None
+        if self.kind == "persistence" or len(self.series) < 3:
+            return
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            if self.kind == "ets":
+                from statsmodels.tsa.holtwinters import ExponentialSmoothing
+                self.result = ExponentialSmoothing(self.series, trend="add", damped_trend=True).fit()
+            else:
+                from statsmodels.tsa.arima.model import ARIMA
+                self.result = ARIMA(self.series, order=(2, 0, 1)).fit()
+
+    def predict(self, test, cutoff):
+        hours = (test[train_model.TIME_COL] - self.last_hour) / pd.Timedelta(hours=1)
+        steps = np.clip(np.ceil(hours.to_numpy()).astype(int), 1, None)
+        if self.result is None:
+            return np.full(len(test), self.series.iloc[-1])
+        return np.asarray(self.result.forecast(int(steps.max())))[steps - 1]
+
+
+def _random_forest():
+    from sklearn.ensemble import RandomForestRegressor
+    # One job per model: the pool already runs one task per core
+    return FeatureModel(RandomForestRegressor(n_estimators=train_model.N_ESTIMATORS, random_state=42, n_jobs=1))
+
+
+def _gradient_boosting():
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    return FeatureModel(HistGradientBoostingRegressor(random_state=42))
+
+
+MODELS = {
+    "random_forest": _random_forest,
+    "gradient_boosting": _gradient_boosting,
+    "persistence": lambda: UnivariateModel("persistence"),
+    "ets": lambda: UnivariateModel("ets"),
+    "arima": lambda: UnivariateModel("arima"),
+}
+
+
+def load(path=train_model.RAW_DATA_CSV):
+    """The training frame with a timestamp on every row, deduplicated."""
+    df = train_model.load_frame(path)
+    df = df.dropna(subset=[train_model.TIME_COL])
+    return df.drop_duplicates(subset=[train_model.TIME_COL], keep="last").reset_index(drop=True)
+
+
+def make_folds(times, n_folds=N_FOLDS, horizon_hours=HORIZON_HOURS, mode="expanding",
+               window_hours=None, min_train=MIN_TRAIN_ROWS):
+    """(cutoff, train positions, test positions) for each walk-forward fold.
+
+    `times` must be sorted. Folds without training or test rows are dropped.
+    """
+    times = pd.DatetimeIndex(times)
+    if len(times) <= min_train:
+        return []
+    horizon = pd.Timedelta(hours=horizon_hours)
+    first = times[min_train - 1]
+    last = max(first, times[-1] - horizon)
+    cutoffs = pd.DatetimeIndex(np.unique(np.linspace(first.value, last.value, n_folds).astype("int64")))
+    folds = []
+    for cutoff in cutoffs:
+        end = times.searchsorted(cutoff, side="right")
+        start = times.searchsorted(cutoff - pd.Timedelta(hours=window_hours), side="right") if mode == "sliding" else 0
+        test_end = times.searchsorted(cutoff + horizon, side="right")
+        if end - start >= 2 and test_end > end:
+            folds.append((cutoff, np.arange(start, end), np.arange(end, test_end)))
+    return folds
+
+
+def horizon_labels():
+    lower = (0,) + HORIZON_BINS[:-1]
+    return [f"{lo + 1}-{hi}h" if hi - lo > 1 else f"{hi}h" for lo, hi in zip(lower, HORIZON_BINS)]
+
+
+def score(y_true, y_pred, hours):
+    """Error sums per horizon bucket: {label: {"n", "sse", "sae"}}."""
+    err = np.asarray(y_pred, dtype=float) - np.asarray(y_true, dtype=float)
+    bucket = np.searchsorted(HORIZON_BINS, np.ceil(hours), side="left")
+    sums = {}
+    for i, label in enumerate(horizon_labels()):
+        e = err[bucket == i]
+        if len(e):
+            sums[label] = {"n": int(len(e)), "sse": float((e ** 2).sum()), "sae": float(np.abs(e).sum())}
+    return sums
+
+
+def _metrics(sums):
+    n = sum(s["n"] for s in sums.values())
+    out = {label: {"n": s["n"], "rmse": math.sqrt(s["sse"] / s["n"]), "mae": s["sae"] / s["n"]}
+           for label, s in sums.items()}
+    if n:
+        out["all"] = {"n": n, "rmse": math.sqrt(sum(s["sse"] for s in sums.values()) / n),
+                      "mae": sum(s["sae"] for s in sums.values()) / n}
+    return out
+
+
+_frame = None
+
+
+def _init_worker(frame):
+    global _frame
+    _frame = frame
+
+
+def run_task(name, fold_id, cutoff, train_idx, test_idx):
+    """Fit and score one model on one fold (runs in a pool worker)."""
+    train, test = _frame.iloc[train_idx], _frame.iloc[test_idx]
+    model = MODELS[name]()
+    tracemalloc.start()
+    try:
+        t0 = time.perf_counter()
+        model.fit(train)
+        fit_seconds = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        pred = model.predict(test, cutoff)
+        predict_seconds = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    hours = (test[train_model.TIME_COL] - cutoff) / pd.Timedelta(hours=1)
+    sums = score(test["aqi"], pred, hours.to_numpy())
+    return {
+        "model": name,
+        "fold": fold_id,
+        "cutoff": cutoff.isoformat(),
+        "n_train": len(train),
+        "n_test": len(test),
+        "fit_seconds": round(fit_seconds, 4),
+        "predict_seconds": round(predict_seconds, 4),
+        "peak_memory_bytes": peak,
+        "error_sums": sums,
+        "metrics": _metrics(sums),
+    }
+
+
+def summarize(records):
+    """Per-model metrics pooled over all folds, plus mean/max cost."""
+    summary = {}
+    for name in dict.fromkeys(r["model"] for r in records):
+        rows = [r for r in records if r["model"] == name]
+        pooled = {}
+        for r in rows:
+            for label, s in r["error_sums"].items():
+                acc = pooled.setdefault(label, {"n": 0, "sse": 0.0, "sae": 0.0})
+                for k in acc:
+                    acc[k] += s[k]
+        # Keep the bucket order of horizon_labels()
+        pooled = {label: pooled[label] for label in horizon_labels() if label in pooled}
+        summary[name] = {
+            "folds": len(rows),
+            "metrics": _metrics(pooled),
+            "fit_seconds_mean": round(float(np.mean([r["fit_seconds"] for r in rows])), 4),
+            "predict_seconds_mean": round(float(np.mean([r["predict_seconds"] for r in rows])), 4),
+            "peak_memory_bytes_max": int(max(r["peak_memory_bytes"] for r in rows)),
+        }
+    return summary
+
+
+def run(data_path=train_model.RAW_DATA_CSV, models=tuple(MODELS), n_folds=N_FOLDS, mode="expanding",
+        window_hours=None, horizon_hours=HORIZON_HOURS, max_workers=MAX_WORKERS, frame=None):
+    """Run the backtest and return the report dict."""
+    df = load(data_path) if frame is None else frame
+    folds = make_folds(df[train_model.TIME_COL], n_folds, horizon_hours, mode, window_hours)
+    if not folds:
+        raise ValueError(f"Not enough timestamped rows in {data_path} for a backtest ({len(df)})")
+    tasks = [(name, i, cutoff, train_idx, test_idx)
+             for i, (cutoff, train_idx, test_idx) in enumerate(folds) for name in models]
+
+    t0 = time.perf_counter()
+    if max_workers <= 1:
+        _init_worker(df)
+        records = [run_task(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(df,)) as pool:
+            records = list(pool.map(run_task, *zip(*tasks)))
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "data_path": data_path,
+        "data_fingerprint": train_model.fingerprint(data_path) if frame is None else None,
+        "n_rows": len(df),
+        "config": {"mode": mode, "n_folds": len(folds), "window_hours": window_hours,
+                   "horizon_hours": horizon_hours, "horizon_bins": list(HORIZON_BINS),
+                   "features": train_model.FEATURES, "max_workers": max_workers},
+        "wall_seconds": round(time.perf_counter() - t0, 3),
+        "summary": summarize(records),
+        "folds": records,
+    }
+
+
+def save_report(report, path=REPORT_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, path)
+
+
+def print_summary(report, baseline=None):
+    base = (baseline or {}).get("summary", {})
+    print(f"{report['n_rows']} rows, {report['config']['n_folds']} {report['config']['mode']} folds, "
+          f"{report['wall_seconds']:.1f}s wall")
+    print(f"{'model':<18} {'RMSE':>8} {'MAE':>8} {'fit s':>8} {'pred s':>8} {'peak MB':>8}")
+    for name, s in report["summary"].items():
+        m = s["metrics"].get("all", {})
+        line = (f"{name:<18} {m.get('rmse', math.nan):>8.2f} {m.get('mae', math.nan):>8.2f} "
+                f"{s['fit_seconds_mean']:>8.3f} {s['predict_seconds_mean']:>8.3f} "
+                f"{s['peak_memory_bytes_max'] / 1e6:>8.1f}")
+        if name in base:
+            b = base[name]
+            line += (f"   vs baseline: RMSE {m.get('rmse', math.nan) - b['metrics'].get('all', {}).get('rmse', math.nan):+.2f}, "
+                     f"fit {s['fit_seconds_mean'] - b['fit_seconds_mean']:+.3f}s, "
+                     f"peak {(s['peak_memory_bytes_max'] - b['peak_memory_bytes_max']) / 1e6:+.1f}MB")
+        print(line)
+    for name, s in report["summary"].items():
+        per_h = ", ".join(f"{label} {v['rmse']:.1f}" for label, v in s["metrics"].items() if label != "all")
+        print(f"  {name} RMSE by horizon: {per_h}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the AQI models.")
+    parser.add_argument("--data", default=train_model.RAW_DATA_CSV)
+    parser.add_argument("--models", nargs="+", choices=list(MODELS), default=list(MODELS))
+    parser.add_argument("--folds", type=int, default=N_FOLDS)
+    parser.add_argument("--mode", choices=["expanding", "sliding"], default="expanding")
+    parser.add_argument("--window-hours", type=int, default=24 * 30, help="training window for sliding folds")
+    parser.add_argument("--horizon-hours", type=int, default=HORIZON_HOURS)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--output", default=REPORT_PATH)
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    args = parser.parse_args()
+
+    report = run(args.data, args.models, args.folds, args.mode,
+                 args.window_hours if args.mode == "sliding" else None, args.horizon_hours, args.workers)
+    save_report(report, args.output)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_summary(report, baseline)
+    print(f"Report saved to {args.output}")
@@ -1,67 +1,122 @@
 import os
+import json
+import argparse
 import pandas as pd
+from src import history_store, schema
 
-RAW_FILE = "data/daily_predictions.csv"
 FEATURES_FILE = "data/features_karachi.csv"
+# Last prediction_time already written to FEATURES_FILE
+WATERMARK_FILE = "data/features_karachi.watermark.json"
+FEATURE_COLUMNS = ["prediction_time", "hour", "day_of_week", "aqi_predicted"]
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
 
-def compute_and_append():
-    if not os.path.exists(RAW_FILE):
-        print(f"{RAW_FILE} not found.")
-        return
-
-    df = pd.read_csv(RAW_FILE)
-    if df.empty:
-        print("Raw CSV is empty.")
-        return
-
-    features_list = []
-
-    for _, row in df.iterrows():
-        # Safe datetime parsing
-        ts = pd.to_datetime(row.get("prediction_time"), errors="coerce")
-        if pd.isna(ts):
-            print(f"Invalid datetime skipped: {row.get('prediction_time')}")
-            continue
-
-        # Safe AQI retrieval
-        aqi_val = row.get("aqi_predicted", row.get("predicted_aqi", None))
-        if pd.isna(aqi_val):
-            print(f"Missing AQI skipped at {ts}")
-            continue
-
-        # Feature computation
-        features = {
-            "prediction_time": ts,
-            "hour": ts.hour,
-            "day_of_week": ts.dayofweek,
-            "aqi_predicted": aqi_val,
-            # add more features if needed
-        }
-        features_list.append(features)
-
-    if not features_list:
-        print("No valid features to append.")
+
+def read_watermark(watermark_file=WATERMARK_FILE, features_file=FEATURES_FILE):
+    """Last processed prediction_time, or None if nothing was processed yet.
+
+    Without a watermark file, falls back to the newest row already in the
+    features file so an existing file is not appended to twice.
+    """
+    if os.path.exists(watermark_file):
+        with open(watermark_file) as f:
+            return pd.Timestamp(json.load(f)["prediction_time"])
+    if os.path.exists(features_file):
+        existing = schema.load("features", features_file, columns=["prediction_time"])
+        latest = existing["prediction_time"].max()
+        return None if pd.isna(latest) else latest
+    return None
+
+
+def write_watermark(ts, watermark_file=WATERMARK_FILE):
+    tmp = watermark_file + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"prediction_time": ts.isoformat()}, f)
+    os.replace(tmp, watermark_file)
+
+
+def truncate_from_day(path, day, block=1 << 16):
+    """Cut the rows of `day` and later off a features file sorted by time.
+
+    Reads back from the end only as far as the last row before that day.
+    """
+    prefix = day.strftime("%Y-%m-%d").encode()
+    with open(path, "rb+") as f:
+        pos = end = f.seek(0, os.SEEK_END)
+        data = b""
+        # The first line read may be partial (or the header), so look past it for an older row
+        while pos > 0 and not any(line[:10] < prefix for line in data.split(b"\n")[1:] if line.strip()):
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+        lines = data.split(b"\n")
+        cut = pos + len(lines[0]) + 1
+        for line in lines[1:]:
+            if line.strip() and line[:10] >= prefix:
+                break
+            cut += len(line) + 1
+        f.truncate(min(cut, end))
+
+
+def compute_features(df):
+    """Vectorized feature rows for every prediction with a valid time and AQI."""
+    ts = pd.to_datetime(df["prediction_time"], errors="coerce")
+    aqi = df["aqi_predicted"]
+    valid = ts.notna() & aqi.notna()
+    skipped = int((~valid).sum())
+    if skipped:
+        print(f"Skipped {skipped} rows with invalid datetime or missing AQI")
+    ts = ts[valid]
+    features = pd.DataFrame({
+        "prediction_time": ts,
+        "hour": ts.dt.hour,
+        "day_of_week": ts.dt.dayofweek,
+        "aqi_predicted": aqi[valid],
+        # add more features if needed
+    })
+    return features.drop_duplicates(subset=["prediction_time"], keep="last").sort_values("prediction_time")
+
+
+def compute_and_append(full=False, features_file=FEATURES_FILE, watermark_file=WATERMARK_FILE,
+                       history_root=history_store.HISTORY_DIR):
+    """Append features for predictions newer than the watermark.
+
+    The rows of the watermark's day are rewritten from the store, so a day
+    holds the same predictions in both.
+
+    With full=True the features file is rebuilt from the whole history,
+    which also clears duplicates left by older, non-incremental runs.
+    """
+    watermark = None if full else read_watermark(watermark_file, features_file)
+    # The store replaces a day's rows on every write to it, so the features of
+    # the watermark's day are rebuilt from the store along with the new rows
+    day = watermark.normalize() if watermark is not None else None
+    df = history_store.read_range(start=day, root=history_root)
+    if watermark is not None and not (df["prediction_time"] > watermark).any():
+        df = df.iloc[:0]
+
+    features_df = compute_features(df) if not df.empty else pd.DataFrame(columns=FEATURE_COLUMNS)
+    if features_df.empty:
+        print("No new predictions to process.")
         # Ensure empty CSV exists with correct columns
-        if not os.path.exists(FEATURES_FILE):
-            empty_df = pd.DataFrame(columns=["prediction_time", "hour", "day_of_week", "aqi_predicted"])
-            empty_df.to_csv(FEATURES_FILE, index=False)
-        return
-
-    features_df = pd.DataFrame(features_list)
-
-    # Append or create safely
-    if os.path.exists(FEATURES_FILE):
-        try:
-            existing = pd.read_csv(FEATURES_FILE, parse_dates=["prediction_time"])
-        except ValueError:
-            print("prediction_time missing in existing CSV, creating empty DataFrame")
-            existing = pd.DataFrame(columns=features_df.columns)
-        combined = pd.concat([existing, features_df], ignore_index=True)
-        combined.to_csv(FEATURES_FILE, index=False)
-    else:
-        features_df.to_csv(FEATURES_FILE, index=False)
-
-    print(f"Features updated in {FEATURES_FILE}")
+        if full or not os.path.exists(features_file):
+            features_df.to_csv(features_file, index=False)
+        return 0
+
+    os.makedirs(os.path.dirname(features_file) or ".", exist_ok=True)
+    append = not full and os.path.exists(features_file)
+    if append and day is not None:
+        truncate_from_day(features_file, day)
+    features_df.to_csv(features_file, mode="a" if append else "w", header=not append,
+                       index=False, date_format=TIME_FORMAT)
+    write_watermark(features_df["prediction_time"].iloc[-1], watermark_file)
+
+    print(f"Wrote {len(features_df)} rows to {features_file}")
+    return len(features_df)
+
 
 if __name__ == "__main__":
-    compute_and_append()
+    parser = argparse.ArgumentParser(description="Build features from the prediction history.")
+    parser.add_argument("--full", action="store_true", help="rebuild the features file from scratch")
+    args = parser.parse_args()
+    compute_and_append(full=args.full)
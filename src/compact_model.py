@@ -0,0 +1,165 @@
+"""Compact, memory-mappable export of the RandomForest and a NumPy evaluator.
+
+The forest is flattened into a handful of arrays (split feature, threshold,
+children, leaf value) and saved with joblib. Uncompressed artifacts are
+memory-mapped on load, so they open in milliseconds and their pages are
+shared between processes. CompactForest evaluates every tree for every row
+in lock-step, one tree level per NumPy step, and exposes the same
+feature_names_in_ / predict() contract as the sklearn model. The per-tree
+outputs of that pass also give prediction quantiles (predict_quantiles).
+"""
+import os
+import numpy as np
+import pandas as pd
+import joblib
+
+FORMAT_VERSION = 1
+SUFFIX = ".compact.joblib"
+# Rows evaluated per pass; bounds the (rows x trees) arrays of predict_quantiles
+CHUNK_ROWS = 50_000
+# Above this many rows sklearn's compiled per-tree predict beats the lock-step
+# NumPy pass (benchmarks/bench_intervals.py)
+LOCKSTEP_MAX_ROWS = 500
+
+
+def compact_path(model_path):
+    """models/x.pkl -> models/x.compact.joblib"""
+    return os.path.splitext(model_path)[0] + SUFFIX
+
+
+def flatten(model):
+    """Arrays describing all trees of a fitted forest, with global node ids."""
+    trees = [est.tree_ for est in model.estimators_]
+    counts = np.array([t.node_count for t in trees])
+    roots = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int32)
+
+    feature = np.concatenate([t.feature for t in trees]).astype(np.int32)
+    threshold = np.concatenate([t.threshold for t in trees]).astype(np.float64)
+    left = np.concatenate([t.children_left + r for t, r in zip(trees, roots)]).astype(np.int32)
+    right = np.concatenate([t.children_right + r for t, r in zip(trees, roots)]).astype(np.int32)
+    value = np.concatenate([t.value[:, 0, 0] for t in trees]).astype(np.float32)
+
+    # Leaves loop back to themselves: x <= +inf always "goes left" to the leaf
+    leaf = feature < 0
+    ids = np.arange(len(feature), dtype=np.int32)
+    feature[leaf] = 0
+    threshold[leaf] = np.inf
+    left[leaf] = ids[leaf]
+    right[leaf] = ids[leaf]
+
+    return {
+        "format_version": FORMAT_VERSION,
+        "feature_names_in_": np.asarray(model.feature_names_in_, dtype=object),
+        "max_depth": int(max(t.max_depth for t in trees)),
+        "roots": roots,
+        "feature": feature,
+        "threshold": threshold,
+        "left": left,
+        "right": right,
+        "value": value,
+    }
+
+
+class CompactForest:
+    """Predict-only forest over flattened tree arrays."""
+
+    def __init__(self, arrays):
+        if arrays["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact model version {arrays['format_version']}")
+        self.feature_names_in_ = arrays["feature_names_in_"]
+        self.n_features_in_ = len(self.feature_names_in_)
+        self.max_depth = arrays["max_depth"]
+        self.roots = arrays["roots"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.n_estimators = len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        return cls(flatten(model))
+
+    def _as_array(self, X):
+        if isinstance(X, pd.DataFrame):
+            X = X[list(self.feature_names_in_)]
+        # sklearn compares float32 inputs against float64 thresholds; do the same
+        return np.asarray(X, dtype=np.float32)
+
+    def predict_trees(self, X):
+        """Per-tree predictions, shape (n_samples, n_estimators)."""
+        X = self._as_array(X)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), self.n_estimators)).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node].astype(np.float64)
+
+    def predict(self, X):
+        return self.predict_trees(X).mean(axis=1)
+
+    def predict_quantiles(self, X, quantiles):
+        """Mean prediction and the given quantiles of the per-tree predictions.
+
+        Returns (mean of shape (n_samples,), quantiles of shape (n_samples,
+        len(quantiles))). The spread between trees is the forest's own
+        uncertainty about a row: wide where the training data disagree or
+        are sparse.
+        """
+        return _tree_quantiles(self.predict_trees, self._as_array(X), quantiles)
+
+
+def _tree_quantiles(predict_trees, X, quantiles):
+    """Mean and quantiles of predict_trees(X), CHUNK_ROWS rows at a time."""
+    mean = np.empty(len(X))
+    out = np.empty((len(X), len(quantiles)))
+    for start in range(0, len(X), CHUNK_ROWS):
+        trees = predict_trees(X[start:start + CHUNK_ROWS])
+        mean[start:start + len(trees)] = trees.mean(axis=1)
+        out[start:start + len(trees)] = np.quantile(trees, quantiles, axis=1).T
+    return mean, out
+
+
+def predict_quantiles(model, X, quantiles, forest=None):
+    """CompactForest.predict_quantiles for either kind of model.
+
+    Large batches of an sklearn forest go through its estimators one by one
+    instead; `forest` is a ready CompactForest of the model for small ones.
+    """
+    if isinstance(model, CompactForest) or len(X) <= LOCKSTEP_MAX_ROWS:
+        return (forest or as_compact(model)).predict_quantiles(X, quantiles)
+    if isinstance(X, pd.DataFrame):
+        X = X[list(model.feature_names_in_)]
+    X = np.asarray(X, dtype=np.float32)
+    return _tree_quantiles(lambda rows: np.stack([est.predict(rows) for est in model.estimators_], axis=1),
+                           X, quantiles)
+
+
+def as_compact(model):
+    """The model itself if it is a CompactForest, else its flattened copy."""
+    return model if isinstance(model, CompactForest) else CompactForest.from_sklearn(model)
+
+
+def export(model, path, compress=0):
+    """Write the compact artifact; compress > 0 trades mmap for a smaller file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    joblib.dump(flatten(model), tmp, compress=compress)
+    os.replace(tmp, path)
+    return path
+
+
+def load(path, mmap_mode="r"):
+    """Load a compact artifact (memory-mapped unless it was written compressed)."""
+    try:
+        return CompactForest(joblib.load(path, mmap_mode=mmap_mode))
+    except ValueError:
+        # joblib cannot memory-map compressed files
+        return CompactForest(joblib.load(path))
+
+
+def load_model(path):
+    """Load either a compact artifact or a joblib-pickled sklearn model."""
+    return load(path) if path.endswith(SUFFIX) else joblib.load(path)
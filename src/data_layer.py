@@ -0,0 +1,217 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from src import history_store, metrics, rollups, schema
+
+# File paths
+FORECAST_CSV = "data/forecast_3day.csv"
+FORECAST_HOURLY_CSV = "data/forecast_hourly.csv"
+AQI_GRID_CSV = "data/aqi_grid.csv"
+STATIONS_CSV = "data/stations_karachi.csv"
+
+# Seconds a parsed frame is served without even checking the file's mtime
+CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", 30))
+# Seconds between background predictions (0 disables the refresher)
+REFRESH_INTERVAL = float(os.getenv("PREDICT_REFRESH_SECONDS", 3 * 60 * 60))
+
+# Process-wide cache, shared by every dashboard session: path -> entry
+_cache = {}
+_cache_lock = threading.Lock()
+
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def load_cached(path, parser, key=None):
+    """Return parser(path), re-parsing only when the file's mtime changes.
+
+    Within CACHE_TTL the cached frame is returned without touching the disk;
+    after that the file is stat'ed and only re-parsed if it was rewritten.
+    Returns None if the file does not exist. `key` names the cache entry
+    when several views are derived from one file (default: the path).
+    """
+    key = key or path
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and now - entry["checked_at"] < CACHE_TTL:
+            metrics.inc("dashboard_cache", result="hit")
+            return entry["frame"]
+
+    mtime = _mtime(path)
+    if mtime is None:
+        with _cache_lock:
+            _cache.pop(key, None)
+        return None
+
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and entry["mtime"] == mtime:
+            entry["checked_at"] = now
+            metrics.inc("dashboard_cache", result="unchanged")
+            return entry["frame"]
+
+    metrics.inc("dashboard_cache", result="miss")
+    with metrics.timer("dashboard_load", source=key if key != path else os.path.basename(path)):
+        frame = parser(path)
+    with _cache_lock:
+        _cache[key] = {"mtime": mtime, "checked_at": now, "frame": frame}
+    return frame
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _parse_forecast(dataset):
+    def parse(path):
+        df = schema.load(dataset, path)
+        return df.sort_values("prediction_time").reset_index(drop=True)
+    return parse
+
+
+def load_daily_predictions():
+    """Prediction history sorted by prediction_time, or None if the store is empty.
+
+    Keyed on the store's version file, which every write touches.
+    """
+    return load_cached(history_store.version_path(), lambda _: history_store.read_range())
+
+
+def load_forecast():
+    """Parsed forecast_3day.csv sorted by prediction_time, or None if missing."""
+    return load_cached(FORECAST_CSV, _parse_forecast("forecast_daily"))
+
+
+def load_hourly_forecast():
+    """Parsed forecast_hourly.csv sorted by prediction_time, or None if missing."""
+    return load_cached(FORECAST_HOURLY_CSV, _parse_forecast("forecast_hourly"))
+
+
+def load_aqi_grid():
+    """(grid, stations) written by src.spatial, or None if there is no grid yet."""
+    grid = load_cached(AQI_GRID_CSV, lambda path: schema.load("aqi_grid", path))
+    if grid is None:
+        return None
+    return grid, load_cached(STATIONS_CSV, lambda path: schema.load("stations", path))
+
+
+def load_history_series(days=None):
+    """(frame, resolution) of the last `days` days of predictions (all if None) for charting.
+
+    At most rollups.MAX_POINTS rows: raw predictions for short ranges,
+    hourly/daily/weekly/monthly aggregates for longer ones. The window
+    starts on the hour, which is part of the cache key, so it moves forward
+    on a long-running dashboard even if no new predictions are written.
+    """
+    start = None
+    if days is not None:
+        start = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=days)
+    key = f"history_series:{days}:{start}"
+    with _cache_lock:
+        for old in [k for k in _cache if k.startswith(f"history_series:{days}:") and k != key]:
+            del _cache[old]
+    return load_cached(history_store.version_path(), lambda _: rollups.series(start), key=key)
+
+
+def has_history():
+    return _mtime(history_store.version_path()) is not None
+
+
+def latest_prediction():
+    """Most recent prediction row, or None if there is none.
+
+    Answered from the store's latest-value index, not the full history.
+    """
+    df = load_cached(history_store.version_path(), lambda _: history_store.latest(), key="latest")
+    if df is None or df.empty:
+        return None
+    return df.iloc[-1]
+
+
+class PredictionRefresher:
+    """Runs the prediction job on a fixed cadence in a single daemon thread.
+
+    The job runs in-process, so the model stays resident between runs. The
+    next run is scheduled from the predictions file's mtime, so restarting
+    the dashboard does not trigger a prediction if a recent one exists.
+    A run is skipped while a scheduler pass holds the pipeline lock; that
+    pass writes the predictions itself.
+    """
+
+    def __init__(self, interval=REFRESH_INTERVAL, job=None, output=None):
+        self.interval = interval
+        self.job = job
+        self.output = output or history_store.version_path()
+        self.last_run = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def seconds_until_due(self):
+        mtime = _mtime(self.output)
+        if mtime is None:
+            return 0.0
+        age = time.time() - mtime / 1e9
+        return max(0.0, self.interval - age)
+
+    def run_once(self):
+        from src import scheduler
+        lock = scheduler.pipeline_lock()
+        if not lock.acquire(timeout=0):
+            print(f"Pipeline run in progress ({lock.holder()}); skipping background prediction")
+            return False
+        try:
+            if self.job is None:
+                import predict_today
+                self.job = predict_today.main
+            self.job()
+            self.last_error = None
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            print("Background prediction failed:", e)
+            return False
+        finally:
+            lock.release()
+            self.last_run = time.time()
+
+    def _loop(self):
+        while not self._stop.wait(self.seconds_until_due()):
+            self.run_once()
+            # Don't spin if the job failed without touching the output file
+            if self.seconds_until_due() == 0:
+                self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="prediction-refresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+def start_refresher(interval=REFRESH_INTERVAL):
+    """Start (once per process) and return the shared background refresher.
+
+    Returns None if the refresher is disabled with PREDICT_REFRESH_SECONDS=0.
+    """
+    global _refresher
+    if interval <= 0:
+        return None
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = PredictionRefresher(interval)
+        return _refresher.start()
@@ -1,83 +1,479 @@
+"""Exploratory data analysis of the features store, in a streaming pass.
 
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+The store is read in chunks (schema.chunks), so it can be larger than
+memory. Everything the reports show comes from mergeable summaries that
+are built one chunk at a time and then combined:
+
+- Moments: count, mean, variance (Chan et al.), min, max, missing.
+- Histogram: counts over fixed edges. Quantiles, box plots and KDEs are
+  derived from these counts.
+- Correlation: pairwise-complete co-moments, which reproduce
+  DataFrame.corr().
+- Timeline: per-time-bucket mean/min/max.
+
+A first pass finds the moments and correlations. A second pass fills the
+histograms, since their edges are only known after the first. The plots are
+rendered in a process pool. Each artifact in reports/eda/ is fingerprinted
+by the data it shows and re-rendered only when that changes. If the input
+file itself is untouched, nothing is read at all.
+"""
 import os
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from src import schema
 
 # Paths
 FEATURES_FILE = "data/features_store.csv"
 EDA_OUTPUT_DIR = "reports/eda"
+FINGERPRINT_FILE = "fingerprints.json"
 
-# Ensure output dir exists
-os.makedirs(EDA_OUTPUT_DIR, exist_ok=True)
+POLLUTANTS = ["pm25", "pm10", "o3", "co", "no2", "so2"]
+# Histogram resolution: quantiles are exact to (max - min) / FINE_BINS
+FINE_BINS = 600
+DISPLAY_BINS = 30
+TIME_BUCKETS = 1000
+# Rows per chunk; peak memory grows with it (~100 MB at 100k rows)
+CHUNK_ROWS = 100_000
+# Cell values are only written on heatmaps up to this many columns
+ANNOTATE_MAX_COLUMNS = 16
+MAX_WORKERS = int(os.getenv("EDA_WORKERS", os.cpu_count() or 1))
+# Bump when the plots change, so every artifact is rendered again
+EDA_VERSION = 2
 
-def run_eda():
-    # Load dataset
-    if not os.path.exists(FEATURES_FILE):
-        raise FileNotFoundError(f"{FEATURES_FILE} not found!")
-    df = pd.read_csv(FEATURES_FILE)
 
-    # If timestamp column exists, parse as datetime
-    if "timestamp" in df.columns:
-        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+class Moments:
+    """Per-column count, mean, sum of squared deviations, min, max and missing count."""
 
-    print(f"Loaded dataset with {df.shape[0]} rows and {df.shape[1]} columns")
+    def __init__(self, columns):
+        k = len(columns)
+        self.columns = list(columns)
+        self.n = np.zeros(k)
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros(k)
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+        self.missing = np.zeros(k, dtype=np.int64)
+
+    @classmethod
+    def of(cls, columns, values):
+        """Moments of a 2-D array with one column per name."""
+        m = cls(columns)
+        present = ~np.isnan(values)
+        m.n = present.sum(axis=0).astype(float)
+        m.missing = len(values) - m.n.astype(np.int64)
+        has = m.n > 0
+        m.mean[has] = np.nansum(values[:, has], axis=0) / m.n[has]
+        m.m2[has] = np.nansum((values[:, has] - m.mean[has]) ** 2, axis=0)
+        m.min[has] = np.nanmin(values[:, has], axis=0)
+        m.max[has] = np.nanmax(values[:, has], axis=0)
+        return m
+
+    def merge(self, other):
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            w = np.where(n > 0, other.n / n, 0)
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.n * w
+        self.mean = self.mean + delta * w
+        self.n = n
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        self.missing = self.missing + other.missing
+        return self
+
+    @property
+    def std(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.n > 1, np.sqrt(self.m2 / (self.n - 1)), np.nan)
+
+
+class Correlation:
+    """Pairwise-complete co-moments of k columns, as k x k matrices.
+
+    For the rows where both column i and column j are present:
+    n[i, j] is their count, mean[i, j] the mean of column i, m2[i, j] the
+    sum of squared deviations of column i, and c[i, j] the co-moment.
+    """
+
+    def __init__(self, columns):
+        k = len(columns)
+        self.columns = list(columns)
+        self.n = np.zeros((k, k))
+        self.mean = np.zeros((k, k))
+        self.m2 = np.zeros((k, k))
+        self.c = np.zeros((k, k))
+
+    @classmethod
+    def of(cls, columns, values):
+        r = cls(columns)
+        present = (~np.isnan(values)).astype(float)
+        # Center on the chunk means first so the sums below don't cancel
+        with np.errstate(invalid="ignore"):
+            center = np.nan_to_num(np.nanmean(values, axis=0)) if len(values) else np.zeros(len(columns))
+        x = np.nan_to_num(values - center)
+        r.n = present.T @ present
+        s = x.T @ present
+        with np.errstate(invalid="ignore", divide="ignore"):
+            inv_n = np.where(r.n > 0, 1 / r.n, 0)
+        r.mean = s * inv_n + center[:, None]
+        r.m2 = (x ** 2).T @ present - s ** 2 * inv_n
+        r.c = x.T @ x - s * s.T * inv_n
+        return r
+
+    def merge(self, other):
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            w = np.where(n > 0, self.n * other.n / n, 0)
+            self.mean = self.mean + delta * np.where(n > 0, other.n / n, 0)
+        self.m2 = self.m2 + other.m2 + delta ** 2 * w
+        self.c = self.c + other.c + delta * delta.T * w
+        self.n = n
+        return self
+
+    def corr(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = self.c / np.sqrt(self.m2 * self.m2.T)
+        r[self.n < 2] = np.nan
+        np.fill_diagonal(r, np.where(np.diag(self.m2) > 0, 1.0, np.nan))
+        return pd.DataFrame(np.clip(r, -1, 1), index=self.columns, columns=self.columns)
+
+
+class Histogram:
+    """Counts per column over FINE_BINS equal bins between fixed per-column edges."""
+
+    def __init__(self, columns, lo, hi, bins=FINE_BINS):
+        self.columns = list(columns)
+        self.lo = np.asarray(lo, dtype=float)
+        # Constant columns get a unit-wide range
+        self.hi = np.where(np.asarray(hi, dtype=float) > self.lo, hi, self.lo + 1)
+        self.bins = bins
+        self.counts = np.zeros((len(self.columns), bins), dtype=np.int64)
+
+    def update(self, values):
+        k = len(self.columns)
+        idx = np.floor((values - self.lo) / (self.hi - self.lo) * self.bins)
+        present = ~np.isnan(idx)
+        idx = np.clip(idx[present], 0, self.bins - 1).astype(np.int64)
+        flat = idx + np.nonzero(present)[1] * self.bins
+        self.counts += np.bincount(flat, minlength=k * self.bins).reshape(k, self.bins)
+        return self
+
+    def merge(self, other):
+        self.counts += other.counts
+        return self
+
+    def edges(self, i):
+        return np.linspace(self.lo[i], self.hi[i], self.bins + 1)
+
+    def quantiles(self, i, qs):
+        """Quantiles of column i, interpolated linearly within bins."""
+        cum = np.concatenate([[0], np.cumsum(self.counts[i])])
+        if cum[-1] == 0:
+            return np.full(len(qs), np.nan)
+        return np.interp(np.asarray(qs) * cum[-1], cum, self.edges(i))
+
+
+class Timeline:
+    """Mean, min and max of one column per time bucket."""
+
+    def __init__(self, start, end, buckets=TIME_BUCKETS):
+        self.start, self.end, self.buckets = start.value, max(end.value, start.value + 1), buckets
+        self.sum = np.zeros(buckets)
+        self.n = np.zeros(buckets)
+        self.min = np.full(buckets, np.inf)
+        self.max = np.full(buckets, -np.inf)
+
+    def update(self, times, values):
+        ok = ~(np.isnan(values) | pd.isna(times))
+        t = times[ok].astype("int64")
+        v = values[ok]
+        idx = np.clip(((t - self.start) / (self.end - self.start) * self.buckets).astype(np.int64),
+                      0, self.buckets - 1)
+        self.sum += np.bincount(idx, v, minlength=self.buckets)
+        self.n += np.bincount(idx, minlength=self.buckets)
+        np.minimum.at(self.min, idx, v)
+        np.maximum.at(self.max, idx, v)
+        return self
+
+    def frame(self):
+        has = self.n > 0
+        times = self.start + (np.arange(self.buckets) + 0.5) * (self.end - self.start) / self.buckets
+        return pd.DataFrame({
+            "time": pd.to_datetime(times[has].astype("int64")),
+            "mean": self.sum[has] / self.n[has], "min": self.min[has], "max": self.max[has],
+        })
+
+
+def _numeric(df, time_col):
+    cols = [c for c in df.columns if c != time_col and pd.api.types.is_numeric_dtype(df[c])]
+    return cols, df[cols].to_numpy(dtype=float)
+
+
+def _signature(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
 
-    # 1. Summary & Missing Values
-    with open(os.path.join(EDA_OUTPUT_DIR, "summary.txt"), "w") as f:
-        f.write(str(df.info()) + "\n\n")
-        f.write("Missing Values:\n")
-        f.write(str(df.isnull().sum()) + "\n\n")
-        f.write("Describe:\n")
-        f.write(str(df.describe()) + "\n\n")
-    print("✅ Summary report saved.")
-
-    # 2. Distribution of key pollutants
-    pollutants = ["pm25", "pm10", "o3", "co", "no2", "so2"]
-    for col in pollutants:
-        if col in df.columns:
-            plt.figure(figsize=(8, 5))
-            sns.histplot(df[col], kde=True, bins=30, color="skyblue")
-            plt.title(f"{col.upper()} Distribution")
-            plt.xlabel(col.upper())
-            plt.ylabel("Frequency")
-            plt.tight_layout()
-            plt.savefig(os.path.join(EDA_OUTPUT_DIR, f"{col}_distribution.png"))
-            plt.close()
-    print("✅ Distributions saved.")
-
-    # 3. Correlation Heatmap
-    plt.figure(figsize=(10, 8))
-    sns.heatmap(df.corr(), annot=True, cmap="coolwarm", fmt=".2f")
-    plt.title("Feature Correlation Heatmap")
-    plt.tight_layout()
-    plt.savefig(os.path.join(EDA_OUTPUT_DIR, "correlation_heatmap.png"))
-    plt.close()
-    print("✅ Correlation heatmap saved.")
 
-    # 4. Change Rate Analysis
-    if "pm25_change" in df.columns and "timestamp" in df.columns:
+def _fingerprint(*parts):
+    h = hashlib.sha1(str(EDA_VERSION).encode())
+    for part in parts:
+        h.update(part.tobytes() if isinstance(part, np.ndarray) else repr(part).encode())
+    return h.hexdigest()
+
+
+def _load_fingerprints(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_fingerprints(state, path):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def collect(path=FEATURES_FILE, chunk_rows=CHUNK_ROWS):
+    """Stream the file twice and return its summaries as a dict."""
+    time_col = schema.DATASETS["features_store"].time_col
+    moments = corr = None
+    dtypes, rows, missing_times, t_min, t_max = {}, 0, 0, pd.NaT, pd.NaT
+    for chunk in schema.chunks("features_store", path, chunk_rows=chunk_rows):
+        dtypes.update({c: str(t) for c, t in chunk.dtypes.items() if c not in dtypes})
+        cols, values = _numeric(chunk, time_col)
+        m, r = Moments.of(cols, values), Correlation.of(cols, values)
+        moments = m if moments is None else moments.merge(m)
+        corr = r if corr is None else corr.merge(r)
+        rows += len(chunk)
+        if time_col in chunk:
+            missing_times += int(chunk[time_col].isna().sum())
+            t_min = min(filter(pd.notna, [t_min, chunk[time_col].min()]), default=pd.NaT)
+            t_max = max(filter(pd.notna, [t_max, chunk[time_col].max()]), default=pd.NaT)
+    if moments is None:
+        raise ValueError(f"{path} has no rows")
+
+    hist = Histogram(moments.columns, np.nan_to_num(moments.min, posinf=0),
+                     np.nan_to_num(moments.max, neginf=0))
+    timeline = None
+    if "pm25_change" in moments.columns and pd.notna(t_min):
+        timeline = Timeline(t_min, t_max)
+    for chunk in schema.chunks("features_store", path, chunk_rows=chunk_rows):
+        _, values = _numeric(chunk, time_col)
+        hist.update(values)
+        if timeline is not None:
+            timeline.update(chunk[time_col].to_numpy(), chunk["pm25_change"].to_numpy(dtype=float))
+
+    return {"rows": rows, "dtypes": dtypes, "time_range": (t_min, t_max), "moments": moments,
+            "correlation": corr, "histogram": hist, "timeline": timeline, "time_col": time_col,
+            "missing_times": missing_times}
+
+
+def describe(stats):
+    """describe()-style table from the summaries (quartiles binned)."""
+    m, hist = stats["moments"], stats["histogram"]
+    quartiles = np.array([np.clip(hist.quantiles(i, [0.25, 0.5, 0.75]), m.min[i], m.max[i])
+                          for i in range(len(m.columns))])
+    table = pd.DataFrame({"count": m.n, "mean": m.mean, "std": m.std, "min": m.min,
+                          "25%": quartiles[:, 0], "50%": quartiles[:, 1], "75%": quartiles[:, 2],
+                          "max": m.max}, index=m.columns)
+    return table.replace([np.inf, -np.inf], np.nan)
+
+
+def summary_text(stats):
+    m = stats["moments"]
+    t_min, t_max = stats["time_range"]
+    missing = pd.Series(m.missing, index=m.columns)
+    if stats["time_col"] in stats["dtypes"]:
+        missing = pd.concat([pd.Series({stats["time_col"]: stats["missing_times"]}), missing])
+    lines = [
+        f"Rows: {stats['rows']}",
+        f"Time range: {t_min} to {t_max}",
+        "",
+        "Columns:",
+        pd.Series(stats["dtypes"]).to_string(),
+        "",
+        "Missing Values:",
+        missing.to_string(),
+        "",
+        f"Describe (quartiles binned to 1/{FINE_BINS} of each column's range):",
+        describe(stats).to_string(),
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _box_stats(hist, i, moments):
+    """Box-plot statistics (Tukey whiskers) from column i's histogram."""
+    q1, med, q3 = np.clip(hist.quantiles(i, [0.25, 0.5, 0.75]), moments.min[i], moments.max[i])
+    iqr = q3 - q1
+    edges, counts = hist.edges(i), hist.counts[i]
+    lo_fence, hi_fence = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    inside = (edges[:-1] >= lo_fence) & (edges[1:] <= hi_fence) & (counts > 0)
+    whislo = max(edges[:-1][inside].min(), moments.min[i]) if inside.any() else q1
+    whishi = min(edges[1:][inside].max(), moments.max[i]) if inside.any() else q3
+    outliers = int(counts[~inside & (counts > 0)].sum())
+    fliers = [v for v in (moments.min[i], moments.max[i]) if v < whislo or v > whishi]
+    return {"med": med, "q1": q1, "q3": q3, "whislo": whislo, "whishi": whishi, "fliers": fliers}, outliers
+
+
+def _kde(hist, i, n, std):
+    """Gaussian KDE (Scott's bandwidth) on the histogram's bin centres, as counts per fine bin."""
+    counts = hist.counts[i].astype(float)
+    width = (hist.hi[i] - hist.lo[i]) / hist.bins
+    sigma = std * n ** -0.2 / width if n > 1 and std > 0 else 0
+    if sigma < 0.5:
+        return counts
+    half = int(min(np.ceil(4 * sigma), hist.bins))
+    kernel = np.exp(-0.5 * (np.arange(-half, half + 1) / sigma) ** 2)
+    return np.convolve(counts, kernel / kernel.sum(), mode="full")[half:half + hist.bins]
+
+
+def plan(stats):
+    """Plot tasks as {artifact file name: (kind, payload)}."""
+    m, hist, timeline = stats["moments"], stats["histogram"], stats["timeline"]
+    tasks = {}
+    corr = stats["correlation"].corr()
+    tasks["correlation_heatmap.png"] = ("heatmap", {"corr": corr})
+    for col in POLLUTANTS:
+        if col not in m.columns:
+            continue
+        i = m.columns.index(col)
+        if m.n[i] == 0:
+            continue
+        step = hist.bins // DISPLAY_BINS
+        counts = hist.counts[i].reshape(DISPLAY_BINS, step).sum(axis=1)
+        kde = _kde(hist, i, m.n[i], m.std[i])
+        tasks[f"{col}_distribution.png"] = ("distribution", {
+            "col": col, "edges": hist.edges(i)[::step], "counts": counts,
+            "kde_x": (hist.edges(i)[:-1] + hist.edges(i)[1:]) / 2, "kde_y": kde * step,
+        })
+        box, outliers = _box_stats(hist, i, m)
+        tasks[f"{col}_outliers.png"] = ("box", {"col": col, "box": box, "outliers": outliers, "n": int(m.n[i])})
+    if timeline is not None:
+        tasks["pm25_change_over_time.png"] = ("timeline", {"frame": timeline.frame()})
+    return tasks
+
+
+def _payload_fingerprint(kind, payload):
+    parts = [kind]
+    for key in sorted(payload):
+        value = payload[key]
+        if isinstance(value, pd.DataFrame):
+            parts += [list(value.columns), list(value.index), value.to_numpy(dtype=float)]
+        elif isinstance(value, np.ndarray):
+            parts.append(value.astype(float))
+        else:
+            parts.append(value)
+    return _fingerprint(*parts)
+
+
+def render(kind, payload, out_path):
+    """Draw one artifact; runs in a worker process."""
+    # Imported here so runs with nothing to redraw never load matplotlib/seaborn
+    import matplotlib.pyplot as plt
+    if kind == "heatmap":
+        import seaborn as sns
+        corr = payload["corr"]
+        size = max(10, 0.3 * len(corr))
+        plt.figure(figsize=(size, size * 0.8))
+        sns.heatmap(corr, annot=len(corr) <= ANNOTATE_MAX_COLUMNS, cmap="coolwarm", fmt=".2f",
+                    vmin=-1, vmax=1)
+        plt.title("Feature Correlation Heatmap")
+    elif kind == "distribution":
+        col = payload["col"]
+        plt.figure(figsize=(8, 5))
+        plt.stairs(payload["counts"], payload["edges"], fill=True, color="skyblue", alpha=0.6,
+                   edgecolor="white")
+        plt.plot(payload["kde_x"], payload["kde_y"], color="skyblue")
+        plt.title(f"{col.upper()} Distribution")
+        plt.xlabel(col.upper())
+        plt.ylabel("Frequency")
+    elif kind == "box":
+        col, box = payload["col"], payload["box"]
+        _, ax = plt.subplots(figsize=(6, 4))
+        ax.bxp([box], showfliers=True, patch_artist=True, boxprops={"facecolor": "lightgreen"})
+        ax.set_xticks([])
+        ax.set_ylabel(col)
+        share = 100 * payload["outliers"] / max(payload["n"], 1)
+        plt.title(f"{col.upper()} Outlier Detection ({payload['outliers']:,} outliers, {share:.1f}%)")
+    elif kind == "timeline":
+        frame = payload["frame"]
         plt.figure(figsize=(10, 5))
-        sns.lineplot(data=df, x="timestamp", y="pm25_change", color="orange")
+        plt.fill_between(frame["time"], frame["min"], frame["max"], color="orange", alpha=0.25, linewidth=0)
+        plt.plot(frame["time"], frame["mean"], color="orange")
         plt.axhline(y=0, color="red", linestyle="--")
         plt.title("PM2.5 Change Rate Over Time")
-        plt.tight_layout()
-        plt.savefig(os.path.join(EDA_OUTPUT_DIR, "pm25_change_over_time.png"))
-        plt.close()
-        print("✅ PM2.5 change rate plot saved.")
-
-    # 5. Outlier Detection
-    for col in pollutants:
-        if col in df.columns:
-            plt.figure(figsize=(6, 4))
-            sns.boxplot(x=df[col], color="lightgreen")
-            plt.title(f"{col.upper()} Outlier Detection")
-            plt.tight_layout()
-            plt.savefig(os.path.join(EDA_OUTPUT_DIR, f"{col}_outliers.png"))
-            plt.close()
-    print("✅ Outlier boxplots saved.")
-
-    print(f"\n📊 EDA completed. Reports saved in '{EDA_OUTPUT_DIR}' folder.")
+    else:
+        raise ValueError(f"Unknown plot kind: {kind}")
+    plt.tight_layout()
+    plt.savefig(out_path)
+    plt.close("all")
+    return out_path
+
+
+def run_eda(features_file=FEATURES_FILE, output_dir=EDA_OUTPUT_DIR, max_workers=MAX_WORKERS, force=False):
+    """Write the EDA reports; returns the names of the artifacts that were (re)written."""
+    if not os.path.exists(features_file):
+        raise FileNotFoundError(f"{features_file} not found!")
+    os.makedirs(output_dir, exist_ok=True)
+    state_path = os.path.join(output_dir, FINGERPRINT_FILE)
+    state = {} if force else _load_fingerprints(state_path)
+    signature = _signature(features_file)
+    artifacts = state.get("artifacts", {})
+    if (state.get("source") == signature and state.get("version") == EDA_VERSION and artifacts
+            and all(os.path.exists(os.path.join(output_dir, name)) for name in artifacts)):
+        print(f"✅ EDA up to date ({features_file} unchanged).")
+        return []
+
+    stats = collect(features_file)
+    print(f"Loaded dataset with {stats['rows']} rows and {len(stats['dtypes'])} columns")
+
+    def stale(name, fingerprint):
+        return artifacts.get(name) != fingerprint or not os.path.exists(os.path.join(output_dir, name))
+
+    written, fingerprints = [], {}
+    # 1. Summary & Missing Values
+    text = summary_text(stats)
+    fingerprints["summary.txt"] = _fingerprint(text)
+    if stale("summary.txt", fingerprints["summary.txt"]):
+        with open(os.path.join(output_dir, "summary.txt"), "w") as f:
+            f.write(text)
+        written.append("summary.txt")
+        print("✅ Summary report saved.")
+
+    # 2. Correlations, distributions, outliers and the change rate
+    todo = []
+    for name, (kind, payload) in plan(stats).items():
+        fingerprints[name] = _payload_fingerprint(kind, payload)
+        if stale(name, fingerprints[name]):
+            todo.append((kind, payload, os.path.join(output_dir, name)))
+    workers = min(max_workers, len(todo))
+    if workers <= 1:
+        for task in todo:
+            render(*task)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(render, *zip(*todo)))
+    written += [os.path.basename(task[2]) for task in todo]
+    print(f"✅ {len(todo)} plots rendered, {len(fingerprints) - 1 - len(todo)} unchanged.")
+
+    _save_fingerprints({"version": EDA_VERSION, "source": signature, "artifacts": fingerprints}, state_path)
+    print(f"\n📊 EDA completed. Reports saved in '{output_dir}' folder.")
+    return written
+
 
 if __name__ == "__main__":
-    run_eda()
+    parser = argparse.ArgumentParser(description="Write EDA reports for the features store.")
+    parser.add_argument("--force", action="store_true", help="re-render every artifact")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    args = parser.parse_args()
+    run_eda(max_workers=args.workers, force=args.force)
@@ -1,58 +1,183 @@
+"""SHAP explanations of the model's predictions, in batches.
 
+ExplanationService keeps a shap.TreeExplainer for the current model and
+rebuilds it only when models/karachi_aqi_model.pkl changes, so repeated
+explains just run the tree algorithm. The rows to explain are aligned to
+the model's feature_names_in_, and the background is a bounded summary of
+the training data: k-means centroids or a random sample, BACKGROUND_SIZE
+rows. With BACKGROUND_METHOD=none, the trees' own cover statistics are
+used instead (path-dependent SHAP). TreeExplainer needs the sklearn forest,
+so this reads the pickle, not the compact serving artifact.
 
+Usage: python -m src.explain [--days 7]
+explains every stored prediction of the last --days days.
+"""
 import os
+import threading
+import argparse
+from datetime import datetime, timedelta
 import joblib
-import glob
 import pandas as pd
+import train_model
+from src import history_store
 
-# Fixed: match current model file name exactly
-MODEL_GLOB = "models/karachi_aqi_model.pkl"
-FEATURES = "data/features_store.csv"
+MODEL_PATH = os.getenv("MODEL_PATH", train_model.MODEL_PATH)
+BACKGROUND_DATA = train_model.RAW_DATA_CSV
 OUT_DIR = "reports"
+# "kmeans", "sample" or "none"
+BACKGROUND_METHOD = os.getenv("SHAP_BACKGROUND", "kmeans")
+BACKGROUND_SIZE = int(os.getenv("SHAP_BACKGROUND_SIZE", 25))
+# Rows sampled from the training data before clustering
+KMEANS_MAX_ROWS = 10_000
+EXPLAIN_DAYS = 7
 
-def get_latest_model():
-    files = sorted(glob.glob(MODEL_GLOB))
-    if not files:
-        raise FileNotFoundError("No model found.")
-    return files[-1]
+_service = None
+_service_lock = threading.Lock()
 
-def main():
+
+def _import_shap():
     try:
         import shap
-        import matplotlib.pyplot as plt
-    except Exception:
-        raise SystemExit("Install shap and matplotlib: pip install shap matplotlib")
-
-    if not os.path.exists(FEATURES):
-        raise FileNotFoundError(f"{FEATURES} not found. Run build_features.py first.")
-
-    model = joblib.load(get_latest_model())
-    df = pd.read_csv(FEATURES)
-    # choose a sample set for background
-    X = df.drop(columns=["timestamp"], errors="ignore").fillna(0)
-    # safe: if target column present, drop it
-    for c in ["aqi", "predicted_aqi"]:
-        if c in X.columns:
-            X = X.drop(columns=[c])
-
-    explainer = shap.Explainer(model, X)
-    # explain last row
-    x_to_explain = X.iloc[-1:, :]
-    shap_values = explainer(x_to_explain)
-
-    os.makedirs(OUT_DIR, exist_ok=True)
-    # summary plot (uses small sample if X large)
-    shap.summary_plot(shap_values, x_to_explain, show=False)
+    except ImportError:
+        raise SystemExit("Install shap: pip install shap")
+    return shap
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def align(frame, names):
+    """frame reordered to the model's features; missing ones are reported and filled with 0."""
+    missing = [c for c in names if c not in frame.columns]
+    if missing:
+        print(f"Columns missing for the explanation, filled with 0: {', '.join(missing)}")
+    return frame.reindex(columns=names, fill_value=0).astype(float).fillna(0)
+
+
+def background(X, method=BACKGROUND_METHOD, size=BACKGROUND_SIZE, seed=0):
+    """At most `size` representative rows of X, or None for path-dependent SHAP."""
+    if method == "none" or X is None or X.empty:
+        return None
+    shap = _import_shap()
+    if method == "sample" or len(X) <= size:
+        return shap.sample(X, size, random_state=seed)
+    if method == "kmeans":
+        X = shap.sample(X, KMEANS_MAX_ROWS, random_state=seed)
+        return pd.DataFrame(shap.kmeans(X, size).data, columns=X.columns)
+    raise ValueError(f"Unknown background method: {method}")
+
+
+class ExplanationService:
+    """TreeExplainer for the current model, rebuilt when the model file changes."""
+
+    def __init__(self, model_path=MODEL_PATH, background_data=BACKGROUND_DATA, method=BACKGROUND_METHOD):
+        self.model_path = model_path
+        self.background_data = background_data
+        self.method = method
+        self._explainer = None
+        self._names = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _build(self):
+        shap = _import_shap()
+        model = joblib.load(self.model_path)
+        names = list(model.feature_names_in_)
+        bg = None
+        if self.method != "none" and os.path.exists(self.background_data):
+            X, _ = train_model.load_data(self.background_data)
+            bg = background(align(X, names), self.method)
+        if bg is None:
+            return shap.TreeExplainer(model), names
+        return shap.TreeExplainer(model, bg, feature_perturbation="interventional"), names
+
+    @property
+    def explainer(self):
+        mtime = _mtime(self.model_path)
+        if mtime is None:
+            raise FileNotFoundError(f"{self.model_path} not found!")
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._explainer, self._names = self._build()
+                    self._mtime = mtime
+                    print(f"Built SHAP explainer for {self.model_path}")
+        return self._explainer
+
+    @property
+    def model_version(self):
+        return self._mtime
+
+    @property
+    def feature_names(self):
+        self.explainer
+        return self._names
+
+    def explain(self, frame):
+        """SHAP values for every row of frame, as a frame indexed like it.
+
+        The model's base value is in the "base_value" column; each row's
+        values plus its base value add up to the prediction.
+        """
+        explainer = self.explainer
+        X = align(pd.DataFrame(frame), self._names)
+        values = explainer.shap_values(X)
+        out = pd.DataFrame(values, columns=self._names, index=X.index)
+        out["base_value"] = float(pd.Series(explainer.expected_value).iloc[0])
+        return out
+
+
+def get_service(model_path=MODEL_PATH):
+    """Process-wide ExplanationService, so the explainer is built once per model version."""
+    global _service
+    with _service_lock:
+        if _service is None or _service.model_path != model_path:
+            _service = ExplanationService(model_path)
+        return _service
+
+
+def explain_recent(days=EXPLAIN_DAYS, now=None, service=None):
+    """Stored predictions of the last `days` days and their explanations, both oldest first."""
+    service = service or get_service()
+    now = now or datetime.now()
+    rows = history_store.read_range(start=now - timedelta(days=days))
+    if rows.empty:
+        return rows, pd.DataFrame(columns=[history_store.TIME_COL] + service.feature_names + ["base_value"])
+    explained = service.explain(rows)
+    explained.insert(0, history_store.TIME_COL, rows[history_store.TIME_COL])
+    return rows, explained
+
+
+def save_report(rows, explained, out_dir=OUT_DIR):
+    import matplotlib.pyplot as plt
+    shap = _import_shap()
+    os.makedirs(out_dir, exist_ok=True)
+    explained.to_csv(os.path.join(out_dir, "shap_values.csv"), index=False)
+    print(f"Saved {len(explained)} explanations to {out_dir}/shap_values.csv")
+
+    names = [c for c in explained.columns if c not in (history_store.TIME_COL, "base_value")]
+    shap.summary_plot(explained[names].to_numpy(), align(rows, names), show=False)
     plt.tight_layout()
-    plt.savefig(os.path.join(OUT_DIR, "shap_summary.png"))
-    print("Saved SHAP summary to reports/shap_summary.png")
+    plt.savefig(os.path.join(out_dir, "shap_summary.png"))
+    plt.close("all")
+    print(f"Saved SHAP summary to {out_dir}/shap_summary.png")
+
+
+def main(days=EXPLAIN_DAYS):
+    rows, explained = explain_recent(days)
+    if explained.empty:
+        print(f"No predictions in the last {days} days to explain.")
+        return explained
+    save_report(rows, explained)
+    return explained
 
-    # save raw shap values and feature importance
-    sv = shap_values.values
-    feat_names = x_to_explain.columns.tolist()
-    df_sv = pd.DataFrame(sv, columns=feat_names)
-    df_sv.to_csv(os.path.join(OUT_DIR, "shap_values.csv"), index=False)
-    print("Saved shap_values.csv")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Explain the model's recent predictions with SHAP.")
+    parser.add_argument("--days", type=float, default=EXPLAIN_DAYS)
+    args = parser.parse_args()
+    main(args.days)
@@ -0,0 +1,164 @@
+"""Shared WAQI client: pooled connections, per-host rate limiting and retries.
+
+Targets are city names ("karachi"), station ids ("@8762") or (lat, lon)
+pairs. fetch_many() fetches any number of them concurrently and returns
+normalized pollutant records. Responses go through the on-disk cache in
+src/http_cache.py, so repeated calls within the TTL cost no request.
+"""
+import os
+import time
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from src import http_cache, metrics
+
+WAQI_BASE_URL = os.getenv("WAQI_BASE_URL", "https://api.waqi.info")
+POLLUTANTS = ["pm25", "pm10", "o3", "co", "no2", "so2"]
+
+MAX_RETRIES = 5
+RETRY_DELAY = 3  # seconds, doubled after each failed attempt
+TIMEOUT = 10
+MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", 8))
+# Requests per second allowed to any single host
+RATE_LIMIT = float(os.getenv("FETCH_RATE_LIMIT", 10))
+
+
+class RateLimiter:
+    """Token bucket per host, shared by all threads."""
+
+    def __init__(self, rate=RATE_LIMIT, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(host, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - last) * self.rate)
+                if tokens >= 1:
+                    self._buckets[host] = (tokens - 1, now)
+                    return
+                self._buckets[host] = (tokens, now)
+                delay = (1 - tokens) / self.rate
+            time.sleep(delay)
+
+
+def make_session(pool_size=MAX_WORKERS):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_session = make_session()
+_limiter = RateLimiter()
+
+
+def target_path(target):
+    """Feed path for a city name, "@uid" station id or (lat, lon) pair."""
+    if isinstance(target, (tuple, list)):
+        lat, lon = target
+        return f"feed/geo:{lat};{lon}/"
+    return f"feed/{target}/"
+
+
+def get_json(path, token, params=None, base_url=None, session=None, limiter=None,
+             max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY, cache_ttl=None):
+    """GET a WAQI endpoint and return its "data" payload, or None after max_retries failures.
+
+    Fresh cached responses are returned without a request; cache_ttl=0
+    bypasses the cache. If every attempt fails, a stale cached response
+    is returned when there is one.
+    """
+    url = f"{(base_url or WAQI_BASE_URL).rstrip('/')}/{path.lstrip('/')}"
+    host = urlsplit(url).netloc
+    session = session or _session
+    limiter = limiter or _limiter
+    ttl = http_cache.TTL if cache_ttl is None else cache_ttl
+
+    key = http_cache.cache_key(url, params)
+    cached = http_cache.get(key) if ttl > 0 else None
+    if cached is not None and http_cache.is_fresh(cached, ttl):
+        http_cache.record("hits")
+        return cached["data"]
+
+    for attempt in range(1, max_retries + 1):
+        try:
+            limiter.wait(host)
+            with metrics.timer("waqi_request", host=host):
+                response = session.get(url, params={**(params or {}), "token": token},
+                                       headers=http_cache.conditional_headers(cached), timeout=TIMEOUT)
+            if response.status_code == 304 and cached is not None:
+                http_cache.touch(key, cached)
+                http_cache.record("revalidated")
+                return cached["data"]
+            response.raise_for_status()
+            data = response.json()
+            if data.get("status") != "ok":
+                raise ValueError(f"API Error: {data.get('data')}")
+            http_cache.record("misses")
+            if ttl > 0:
+                http_cache.put(key, url, data["data"], response.headers)
+            return data["data"]
+        except Exception as e:
+            print(f"API request failed for {path} (attempt {attempt}): {e}")
+            metrics.inc("waqi_request_errors", host=host)
+            if attempt < max_retries:
+                time.sleep(retry_delay * 2 ** (attempt - 1))
+    if cached is not None:
+        http_cache.record("stale")
+        print(f"[Warning] Max retries reached for {path}, using cached response.")
+        return cached["data"]
+    print(f"[Warning] Max retries reached for {path}.")
+    return None
+
+
+def fetch_feed(target, token, **kwargs):
+    """Raw feed payload for one target, or None if it could not be fetched."""
+    return get_json(target_path(target), token, **kwargs)
+
+
+def normalize(target, data, fetched_at=None):
+    """Flatten a feed payload into one pollutant record."""
+    iaqi = data.get("iaqi", {})
+    city = data.get("city", {})
+    geo = city.get("geo") or [None, None]
+    aqi = data.get("aqi")
+    record = {
+        "target": target if isinstance(target, str) else f"geo:{target[0]};{target[1]}",
+        "station": city.get("name"),
+        "uid": data.get("idx"),
+        "lat": geo[0],
+        "lon": geo[1],
+        "time": data.get("time", {}).get("s"),
+        "fetched_at": fetched_at or datetime.now(),
+        # WAQI reports "-" when a station has no current reading
+        "aqi": aqi if isinstance(aqi, (int, float)) else None,
+    }
+    for name in POLLUTANTS:
+        record[name] = iaqi.get(name, {}).get("v")
+    return record
+
+
+def fetch_many(targets, token, max_workers=MAX_WORKERS, **kwargs):
+    """Fetch all targets concurrently; returns normalized records in target order.
+
+    Targets that fail after retries are left out.
+    """
+    def fetch_one(target):
+        data = fetch_feed(target, token, **kwargs)
+        return normalize(target, data) if data is not None else None
+
+    targets = list(targets)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(targets)))) as pool:
+        records = list(pool.map(fetch_one, targets))
+    return [r for r in records if r is not None]
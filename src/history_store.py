@@ -0,0 +1,299 @@
+"""Month-partitioned Parquet store for the prediction history.
+
+Layout under HISTORY_DIR:
+
+    2025-08/2025-08-15.parquet   one file per day in the current (open) months
+    2025-07/month.parquet        closed months, compacted into a single file
+    _last_write                  touched on every write; its mtime is the store version
+    _latest.json                 the most recent rows, maintained on write, for latest()
+    _rollups/                    hourly..monthly aggregates, maintained on write (src.rollups)
+
+Writing a prediction only rewrites that day's file, so appends cost the same
+no matter how long the history is, and re-running a day replaces its rows
+(the "replace today's prediction" behaviour of the old CSV).
+"""
+import os
+import json
+import glob
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from src import metrics, schema
+
+HISTORY_DIR = os.getenv("HISTORY_DIR", "data/history/daily_predictions")
+LEGACY_CSV = "data/daily_predictions.csv"
+
+TIME_COL = "prediction_time"
+# aqi_lower/aqi_upper: the prediction interval (empty in rows stored before it existed)
+COLUMNS = ["prediction_time", "aqi_predicted", "pm25", "pm10", "o3", "co", "no2", "so2",
+           "hour", "day", "month", "aqi", "aqi_change", "aqi_lower", "aqi_upper"]
+SCHEMA = pa.schema([pa.field(TIME_COL, pa.timestamp("ns"))] +
+                   [pa.field(c, pa.float64()) for c in COLUMNS[1:]])
+VERSION_FILE = "_last_write"
+COMPACTED_FILE = "month.parquet"
+# Sidecar index of the most recent rows, so "latest value" reads skip the partitions
+LATEST_FILE = "_latest.json"
+LATEST_ROWS = 48
+
+
+def version_path(root=HISTORY_DIR):
+    return os.path.join(root, VERSION_FILE)
+
+
+def latest_path(root=HISTORY_DIR):
+    return os.path.join(root, LATEST_FILE)
+
+
+def _touch(root):
+    with open(version_path(root), "a"):
+        pass
+    os.utime(version_path(root))
+    _refresh_rollups(root)
+
+
+def _refresh_rollups(root):
+    """Re-aggregate the changed months; a failure here never fails the write itself."""
+    from src import rollups
+    try:
+        rollups.refresh(root)
+    except Exception as e:
+        print(f"Could not update the rollups of {root}: {e}")
+
+
+def _normalize(frame):
+    df = pd.DataFrame(frame).copy()
+    df[TIME_COL] = pd.to_datetime(df[TIME_COL], errors="coerce")
+    df = df.dropna(subset=[TIME_COL])
+    for col in COLUMNS[1:]:
+        df[col] = pd.to_numeric(df[col], errors="coerce") if col in df.columns else np.nan
+    return df[COLUMNS].astype({c: "float64" for c in COLUMNS[1:]}).reset_index(drop=True)
+
+
+def _write(df, path):
+    """Write atomically so readers never see a half-written file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    table = pa.Table.from_pandas(df.sort_values(TIME_COL), schema=SCHEMA, preserve_index=False)
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+
+
+def _read_files(files):
+    if not files:
+        return pd.DataFrame({c: pd.Series(dtype=f.type.to_pandas_dtype()) for c, f in zip(COLUMNS, SCHEMA)})
+    return ds.dataset(files, schema=SCHEMA, format="parquet").to_table().to_pandas()
+
+
+def _month_dirs(root):
+    return sorted(d for d in glob.glob(os.path.join(root, "????-??")) if os.path.isdir(d))
+
+
+@metrics.timer("parquet_write")
+def upsert(frame, root=HISTORY_DIR):
+    """Store rows, replacing whatever was stored for each day they cover.
+
+    Only the affected day files (or, for compacted months, the month file)
+    are rewritten. Returns the number of rows written.
+    """
+    df = _normalize(frame)
+    if df.empty:
+        return 0
+    index = _load_latest(root)
+    days = df[TIME_COL].dt.strftime("%Y-%m-%d")
+    for day, rows in df.groupby(days):
+        month_dir = os.path.join(root, day[:7])
+        compacted = os.path.join(month_dir, COMPACTED_FILE)
+        if os.path.exists(compacted):
+            existing = _read_files([compacted])
+            existing = existing[existing[TIME_COL].dt.strftime("%Y-%m-%d") != day]
+            _write(pd.concat([existing, rows], ignore_index=True), compacted)
+        else:
+            _write(rows, os.path.join(month_dir, f"{day}.parquet"))
+    if index is not None:
+        # Replaced days drop out of the index like they do from the store
+        index = index[~index[TIME_COL].dt.strftime("%Y-%m-%d").isin(set(days))]
+        _save_latest(pd.concat([index, df], ignore_index=True), root)
+    else:
+        _save_latest(_tail_from_files(root, LATEST_ROWS), root)
+    _touch(root)
+    return len(df)
+
+
+def _files_in_range(root, start, end):
+    files = []
+    start_day = start.strftime("%Y-%m-%d") if start is not None else None
+    end_day = end.strftime("%Y-%m-%d") if end is not None else None
+    for month_dir in _month_dirs(root):
+        month = os.path.basename(month_dir)
+        if start_day is not None and month < start_day[:7]:
+            continue
+        if end_day is not None and month > end_day[:7]:
+            continue
+        for path in sorted(glob.glob(os.path.join(month_dir, "*.parquet"))):
+            name = os.path.basename(path)
+            if name != COMPACTED_FILE:
+                day = name[:-len(".parquet")]
+                if (start_day is not None and day < start_day) or (end_day is not None and day > end_day):
+                    continue
+            files.append(path)
+    return files
+
+
+@metrics.timer("parquet_read")
+def read_range(start=None, end=None, columns=None, root=HISTORY_DIR):
+    """Rows with start <= prediction_time < end (either bound optional), oldest first.
+
+    Only the partitions overlapping the range are opened.
+    """
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    df = _read_files(_files_in_range(root, start, end))
+    if start is not None:
+        df = df[df[TIME_COL] >= start]
+    if end is not None:
+        df = df[df[TIME_COL] < end]
+    df = df.sort_values(TIME_COL, kind="stable").drop_duplicates(subset=[TIME_COL], keep="last")
+    df = df.reset_index(drop=True)
+    return df[columns] if columns is not None else df
+
+
+def _newest_month_files(root):
+    """Parquet files of the newest non-empty month."""
+    for month_dir in reversed(_month_dirs(root)):
+        files = sorted(glob.glob(os.path.join(month_dir, "*.parquet")))
+        if files:
+            return files
+    return []
+
+
+def _signature(root):
+    """Identifies the newest month's files; the index is only trusted while it matches."""
+    out = []
+    for path in _newest_month_files(root):
+        st = os.stat(path)
+        out.append([os.path.relpath(path, root), st.st_size, st.st_mtime_ns])
+    return out
+
+
+def _tail_from_files(root, n):
+    """Last n rows, reading whole months backwards from the newest until there are enough."""
+    frames, count = [], 0
+    for month_dir in reversed(_month_dirs(root)):
+        files = sorted(glob.glob(os.path.join(month_dir, "*.parquet")))
+        if not files:
+            continue
+        df = _read_files(files)
+        frames.insert(0, df)
+        count += len(df)
+        if count >= n:
+            break
+    df = pd.concat(frames, ignore_index=True) if frames else _read_files([])
+    df = df.sort_values(TIME_COL, kind="stable").drop_duplicates(subset=[TIME_COL], keep="last")
+    return df.tail(n).reset_index(drop=True)
+
+
+def _save_latest(df, root):
+    df = df.sort_values(TIME_COL, kind="stable").drop_duplicates(subset=[TIME_COL], keep="last").tail(LATEST_ROWS)
+    rows = df.astype(object).where(df.notna(), None)
+    rows[TIME_COL] = df[TIME_COL].dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
+    payload = {"signature": _signature(root), "rows": rows.to_dict(orient="records")}
+    tmp = latest_path(root) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(payload, f)
+    os.replace(tmp, latest_path(root))
+
+
+def _load_latest(root):
+    """The index as a frame, or None if it is missing or out of date."""
+    try:
+        with open(latest_path(root)) as f:
+            payload = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if payload.get("signature") != _signature(root):
+        return None
+    df = pd.DataFrame(payload["rows"], columns=COLUMNS)
+    df[TIME_COL] = pd.to_datetime(df[TIME_COL])
+    return df.astype({c: "float64" for c in COLUMNS[1:]})
+
+
+@metrics.timer("history_latest")
+def latest(n=1, root=HISTORY_DIR):
+    """The n most recent rows, oldest first, without reading the whole history.
+
+    Served from the _latest.json index kept up to date by upsert(). If the
+    index is missing or stale (e.g. the store was replaced by a git pull),
+    it is rebuilt from the newest month(s).
+    """
+    if n <= LATEST_ROWS:
+        index = _load_latest(root)
+        if index is not None and len(index) >= n:
+            return index.tail(n).reset_index(drop=True)
+    df = _tail_from_files(root, max(n, LATEST_ROWS))
+    if not df.empty:
+        _save_latest(df, root)
+    return df.tail(n).reset_index(drop=True)
+
+
+def is_empty(root=HISTORY_DIR):
+    return not any(glob.glob(os.path.join(d, "*.parquet")) for d in _month_dirs(root))
+
+
+def compact(month, root=HISTORY_DIR):
+    """Merge a month's day files into a single month.parquet."""
+    month_dir = os.path.join(root, month)
+    files = sorted(glob.glob(os.path.join(month_dir, "*.parquet")))
+    day_files = [f for f in files if os.path.basename(f) != COMPACTED_FILE]
+    if not day_files:
+        return
+    index = _load_latest(root)
+    df = _read_files(files).drop_duplicates(subset=[TIME_COL], keep="last")
+    _write(df, os.path.join(month_dir, COMPACTED_FILE))
+    for f in day_files:
+        os.remove(f)
+    if index is not None:
+        # Same rows, new files: only the signature changes
+        _save_latest(index, root)
+    _touch(root)
+
+
+def compact_closed_months(root=HISTORY_DIR, now=None):
+    """Compact every month before the current one."""
+    current = (now or datetime.now()).strftime("%Y-%m")
+    for month_dir in _month_dirs(root):
+        month = os.path.basename(month_dir)
+        if month < current:
+            compact(month, root)
+
+
+def import_csv(csv_path=LEGACY_CSV, root=HISTORY_DIR):
+    """One-time migration of the legacy daily_predictions.csv into an empty store.
+
+    Returns the number of rows imported (0 if the store already has data).
+    """
+    if not is_empty(root) or not os.path.exists(csv_path):
+        return 0
+    df = _normalize(schema.load("predictions", csv_path))
+    df = df.drop_duplicates(subset=[TIME_COL], keep="last")
+    for month, rows in df.groupby(df[TIME_COL].dt.strftime("%Y-%m")):
+        _write(rows, os.path.join(root, month, COMPACTED_FILE))
+    _save_latest(df.tail(LATEST_ROWS), root)
+    _touch(root)
+    return len(df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the prediction history store.")
+    parser.add_argument("--import-csv", metavar="CSV", nargs="?", const=LEGACY_CSV,
+                        help="import a legacy predictions CSV into an empty store")
+    parser.add_argument("--compact", action="store_true", help="compact all closed months")
+    args = parser.parse_args()
+    if args.import_csv:
+        print(f"Imported {import_csv(args.import_csv)} rows into {HISTORY_DIR}")
+    if args.compact:
+        compact_closed_months()
+        print(f"Compacted closed months in {HISTORY_DIR}")
@@ -0,0 +1,103 @@
+"""On-disk cache of WAQI responses, shared by every process and CI step.
+
+One JSON file per endpoint+station (the API token is not part of the key).
+Entries younger than the TTL are served without a request. Older entries
+are revalidated with If-None-Match / If-Modified-Since when the upstream
+sent validators, and are served stale if the upstream is unreachable.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from src import metrics
+
+CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "data/cache/http")
+# WAQI station data updates hourly
+TTL = float(os.getenv("HTTP_CACHE_TTL", 3600))
+
+_stats = {"hits": 0, "misses": 0, "revalidated": 0, "stale": 0}
+_stats_lock = threading.Lock()
+
+
+def cache_key(url, params=None):
+    params = {k: v for k, v in (params or {}).items() if k != "token"}
+    raw = url + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _path(key, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, f"{key}.json")
+
+
+def get(key, cache_dir=None):
+    try:
+        with open(_path(key, cache_dir)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def is_fresh(entry, ttl=None):
+    return time.time() - entry["fetched_at"] < (TTL if ttl is None else ttl)
+
+
+def put(key, url, data, headers=None, cache_dir=None):
+    headers = headers or {}
+    entry = {
+        "url": url,
+        "fetched_at": time.time(),
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "data": data,
+    }
+    path = _path(key, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(entry, f)
+    os.replace(tmp, path)
+    return entry
+
+
+def touch(key, entry, cache_dir=None):
+    """Mark a revalidated entry as fresh again."""
+    return put(key, entry["url"], entry["data"],
+               {"ETag": entry.get("etag"), "Last-Modified": entry.get("last_modified")}, cache_dir)
+
+
+def conditional_headers(entry):
+    if entry is None:
+        return {}
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def record(event):
+    with _stats_lock:
+        _stats[event] += 1
+    metrics.inc("http_cache", result=event)
+
+
+def stats():
+    """Counters for this process: hits, misses, revalidated (304) and stale (served on failure)."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
+
+
+def clear(cache_dir=None):
+    cache_dir = cache_dir or CACHE_DIR
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            if name.endswith(".json"):
+                os.remove(os.path.join(cache_dir, name))
@@ -0,0 +1,246 @@
+"""Timers and counters for the pipeline's hot paths.
+
+    with metrics.timer("model_load"):
+        ...
+
+    @metrics.timer("predict")
+    def predict(...): ...
+
+    metrics.inc("alerts_sent", channel="email")
+
+Timers keep a latency histogram per name and label set. Everything is
+exported in the Prometheus text format (prometheus_text(), served by
+src.prediction_service at /metrics). Each timed call is also appended to a
+JSONL log (METRICS_LOG, default logs/metrics.jsonl; empty disables it), so
+latencies of short-lived scripts can be compared across runs. Once the log
+passes METRICS_LOG_MAX_BYTES it is moved to <log>.1 (replacing the previous
+one) and a new one is started.
+
+Profiling is opt-in per stage. PROFILE=predict,fetch (or "all") runs those
+timers under cProfile, or under pyinstrument with PROFILER=pyinstrument.
+The profiles are written to PROFILE_DIR.
+"""
+import os
+import json
+import time
+import threading
+import functools
+from datetime import datetime
+
+PREFIX = "aqi_"
+METRICS_LOG = os.getenv("METRICS_LOG", "logs/metrics.jsonl")
+METRICS_LOG_MAX_BYTES = int(os.getenv("METRICS_LOG_MAX_BYTES", 10 * 1024 * 1024))
+PROFILE = {s.strip() for s in os.getenv("PROFILE", "").split(",") if s.strip()}
+PROFILER = os.getenv("PROFILER", "cprofile")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "reports/profiles")
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_timers = {}
+_counters = {}
+_lock = threading.Lock()
+_log_lock = threading.Lock()
+_profiling = threading.local()
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """Add value to a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    """Record one duration in a timer's histogram."""
+    key = _key(name, labels)
+    with _lock:
+        t = _timers.get(key)
+        if t is None:
+            t = _timers[key] = {"count": 0, "sum": 0.0, "buckets": [0] * len(BUCKETS)}
+        t["count"] += 1
+        t["sum"] += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                t["buckets"][i] += 1
+                break
+
+
+def _rotate(path, max_bytes):
+    try:
+        if max_bytes > 0 and os.path.getsize(path) >= max_bytes:
+            os.replace(path, path + ".1")
+    except FileNotFoundError:
+        pass
+
+
+def _log(event, path=None, max_bytes=None):
+    path = METRICS_LOG if path is None else path
+    if not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with _log_lock:
+            _rotate(path, METRICS_LOG_MAX_BYTES if max_bytes is None else max_bytes)
+            with open(path, "a") as f:
+                f.write(json.dumps(event) + "\n")
+    except OSError as e:
+        print(f"Could not write metrics log {path}: {e}")
+
+
+def _profiler(name):
+    """A started profiler if this stage is being profiled (and no outer one is running)."""
+    if not (name in PROFILE or "all" in PROFILE) or getattr(_profiling, "active", False):
+        return None
+    if PROFILER == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("PROFILER=pyinstrument but pyinstrument is not installed; using cProfile")
+        else:
+            profiler = Profiler()
+            profiler.start()
+            _profiling.active = True
+            return profiler
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    _profiling.active = True
+    return profiler
+
+
+def _save_profile(profiler, name):
+    _profiling.active = False
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stem = os.path.join(PROFILE_DIR, f"{name}-{datetime.now():%Y%m%d-%H%M%S-%f}")
+    if hasattr(profiler, "output_html"):
+        profiler.stop()
+        path = stem + ".html"
+        with open(path, "w") as f:
+            f.write(profiler.output_html())
+    else:
+        profiler.disable()
+        path = stem + ".prof"
+        profiler.dump_stats(path)
+    print(f"Profile of {name} saved to {path}")
+
+
+class timer:
+    """Time a block (context manager) or every call of a function (decorator).
+
+    Failed calls are timed too, and counted in <name>_failures.
+    """
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self._local = threading.local()
+
+    def __enter__(self):
+        self._local.profiler = _profiler(self.name)
+        self._local.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._local.start
+        if self._local.profiler is not None:
+            _save_profile(self._local.profiler, self.name)
+        observe(self.name, seconds, **self.labels)
+        if exc_type is not None:
+            inc(f"{self.name}_failures", **self.labels)
+        _log({"time": datetime.now().isoformat(timespec="milliseconds"), "name": self.name,
+              "labels": self.labels, "seconds": round(seconds, 6), "ok": exc_type is None})
+        return False
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(self.name, **self.labels):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def snapshot():
+    """Copy of every timer and counter, keyed by (name, labels)."""
+    with _lock:
+        return ({k: {**v, "buckets": list(v["buckets"])} for k, v in _timers.items()}, dict(_counters))
+
+
+def reset():
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def prometheus_text():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    timers, counters = snapshot()
+    lines = []
+    for name in sorted({k[0] for k in counters}):
+        metric = f"{PREFIX}{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{metric}{_labels(labels)} {value}")
+    for name in sorted({k[0] for k in timers}):
+        metric = f"{PREFIX}{name}_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        for (n, labels), t in sorted(timers.items()):
+            if n != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS, t["buckets"]):
+                cumulative += count
+                lines.append(f"{metric}_bucket{_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{metric}_bucket{_labels(labels, [('le', '+Inf')])} {t['count']}")
+            lines.append(f"{metric}_sum{_labels(labels)} {t['sum']:.6f}")
+            lines.append(f"{metric}_count{_labels(labels)} {t['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def summarize_log(path=METRICS_LOG, since=None):
+    """Per timer and label set: calls, failures and p50/p95/max seconds from the JSONL log
+    (and its rotated <log>.1)."""
+    groups = {}
+    for part in [path + ".1", path]:
+        if not os.path.exists(part):
+            continue
+        with open(part) as f:
+            for line in f:
+                event = json.loads(line)
+                if since is not None and event["time"] < since:
+                    continue
+                key = event["name"] + _labels(sorted(event["labels"].items()))
+                groups.setdefault(key, []).append(event)
+    out = {}
+    for key, events in sorted(groups.items()):
+        seconds = sorted(e["seconds"] for e in events)
+        n = len(seconds)
+        out[key] = {"calls": n, "failures": sum(not e["ok"] for e in events),
+                    "p50": seconds[(n - 1) // 2], "p95": seconds[min(n - 1, int(0.95 * n))], "max": seconds[-1]}
+    return out
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Latency summary of the metrics log.")
+    parser.add_argument("--log", default=METRICS_LOG)
+    parser.add_argument("--since", help="only events at or after this ISO time")
+    args = parser.parse_args()
+    print(f"{'timer':<48} {'calls':>6} {'fail':>5} {'p50':>9} {'p95':>9} {'max':>9}")
+    for key, s in summarize_log(args.log, args.since).items():
+        print(f"{key:<48} {s['calls']:>6} {s['failures']:>5} {s['p50']:>8.3f}s {s['p95']:>8.3f}s {s['max']:>8.3f}s")
@@ -0,0 +1,233 @@
+import os
+import json
+import threading
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+import pandas as pd
+import requests
+from src import compact_model, metrics
+
+MODEL_PATH = os.getenv("MODEL_PATH", "models/karachi_aqi_model.pkl")
+SERVICE_HOST = os.getenv("PREDICTION_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("PREDICTION_SERVICE_PORT", 8765))
+# e.g. http://127.0.0.1:8765 -- when unset, clients predict in-process
+SERVICE_URL = os.getenv("PREDICTION_SERVICE_URL")
+# Central interval stored with each prediction (aqi_lower / aqi_upper)
+INTERVAL = float(os.getenv("PREDICTION_INTERVAL", 0.9))
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class PredictionService:
+    """Keeps the trained model in memory and reloads it when the file changes.
+
+    If a compact artifact at least as new as the pickle sits next to it
+    (see src/compact_model.py), that is loaded instead.
+    """
+
+    def __init__(self, model_path=MODEL_PATH):
+        self.model_path = model_path
+        self._model = None
+        self._forest = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _resolve(self):
+        """(path, mtime) of the artifact to serve, or (None, None) if there is none."""
+        mtime = _mtime(self.model_path)
+        compact = compact_model.compact_path(self.model_path)
+        compact_mtime = _mtime(compact)
+        if compact_mtime is not None and (mtime is None or compact_mtime >= mtime):
+            return compact, compact_mtime
+        return (self.model_path, mtime) if mtime is not None else (None, None)
+
+    @property
+    def model(self):
+        path, mtime = self._resolve()
+        if path is None:
+            if self._model is None:
+                raise FileNotFoundError(f"{self.model_path} not found!")
+            # Keep serving the last good model while the file is being replaced
+            return self._model
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    with metrics.timer("model_load"):
+                        self._model = compact_model.load_model(path)
+                    self._forest = None
+                    self._mtime = mtime
+                    print(f"Loaded model from {path}")
+        return self._model
+
+    @property
+    def forest(self):
+        """The model as a CompactForest (flattened once per version if it is an sklearn forest)."""
+        model = self.model
+        forest = self._forest
+        if forest is None:
+            forest = self._forest = compact_model.as_compact(model)
+        return forest
+
+    @property
+    def model_version(self):
+        return self._mtime
+
+    def align(self, frame):
+        """Reorder frame to the model's feature columns, filling missing ones with 0."""
+        names = list(self.model.feature_names_in_)
+        return frame.reindex(columns=names, fill_value=0).fillna(0)
+
+    @metrics.timer("predict")
+    def predict_batch(self, frame):
+        model = self.model
+        X = self.align(pd.DataFrame(frame))
+        metrics.inc("predicted_rows", len(X))
+        return model.predict(X)
+
+    def predict(self, features):
+        return float(self.predict_batch(pd.DataFrame([features]))[0])
+
+    @metrics.timer("predict_intervals")
+    def predict_intervals(self, frame, level=INTERVAL):
+        """aqi_predicted with the central `level` interval (aqi_lower, aqi_upper) of the trees, per row."""
+        if not 0 < level < 1:
+            raise ValueError(f"Interval level must be between 0 and 1, got {level}")
+        model = self.model
+        X = self.align(pd.DataFrame(frame))
+        metrics.inc("predicted_rows", len(X))
+        tail = (1 - level) / 2
+        forest = self.forest if len(X) <= compact_model.LOCKSTEP_MAX_ROWS else None
+        mean, bounds = compact_model.predict_quantiles(model, X, [tail, 1 - tail], forest=forest)
+        return pd.DataFrame({"aqi_predicted": mean, "aqi_lower": bounds[:, 0], "aqi_upper": bounds[:, 1]},
+                            index=pd.DataFrame(frame).index)
+
+
+def get_service(model_path=MODEL_PATH):
+    """Process-wide PredictionService, so the model is loaded only once."""
+    global _service
+    with _service_lock:
+        if _service is None or _service.model_path != model_path:
+            _service = PredictionService(model_path)
+        return _service
+
+
+def predict(features, url=SERVICE_URL, timeout=5):
+    """Predict one row, via the HTTP service if `url` is set, else in-process."""
+    if url:
+        try:
+            r = requests.post(f"{url.rstrip('/')}/predict", json={"features": features}, timeout=timeout)
+            r.raise_for_status()
+            return float(r.json()["aqi_predicted"])
+        except Exception as e:
+            print(f"Prediction service unavailable ({e}), predicting in-process")
+    return get_service().predict(features)
+
+
+def predict_batch(frame, url=SERVICE_URL, timeout=30):
+    """Predict every row of `frame`, via the HTTP service if `url` is set, else in-process."""
+    if url:
+        try:
+            rows = pd.DataFrame(frame).to_dict(orient="records")
+            r = requests.post(f"{url.rstrip('/')}/predict_batch", json={"rows": rows}, timeout=timeout)
+            r.raise_for_status()
+            return np.asarray(r.json()["aqi_predicted"], dtype=float)
+        except Exception as e:
+            print(f"Prediction service unavailable ({e}), predicting in-process")
+    return get_service().predict_batch(frame)
+
+
+def predict_intervals(frame, level=INTERVAL, url=SERVICE_URL, timeout=30):
+    """Like predict_batch, but a frame of aqi_predicted, aqi_lower and aqi_upper."""
+    frame = pd.DataFrame(frame)
+    if url:
+        try:
+            rows = frame.to_dict(orient="records")
+            r = requests.post(f"{url.rstrip('/')}/predict_intervals", json={"rows": rows, "level": level},
+                              timeout=timeout)
+            r.raise_for_status()
+            return pd.DataFrame(r.json(), index=frame.index, dtype=float)
+        except Exception as e:
+            print(f"Prediction service unavailable ({e}), predicting in-process")
+    return get_service().predict_intervals(frame, level)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def _send(self, status, payload, content_type="application/json"):
+        body = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok", "model_path": self.service.model_path,
+                             "model_version": self.service.model_version})
+        elif self.path == "/metrics":
+            self._send(200, metrics.prometheus_text(), "text/plain; version=0.0.4")
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/predict":
+                value = self.service.predict(payload["features"])
+                self._send(200, {"aqi_predicted": value})
+            elif self.path == "/predict_batch":
+                values = self.service.predict_batch(pd.DataFrame(payload["rows"]))
+                self._send(200, {"aqi_predicted": values.tolist()})
+            elif self.path == "/predict_intervals":
+                out = self.service.predict_intervals(pd.DataFrame(payload["rows"]),
+                                                     float(payload.get("level", INTERVAL)))
+                self._send(200, {c: out[c].tolist() for c in out.columns})
+            else:
+                self._send(404, {"error": "not found"})
+        except (KeyError, ValueError) as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            self._send(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host=SERVICE_HOST, port=SERVICE_PORT, model_path=MODEL_PATH):
+    """Build the HTTP server; the model is loaded eagerly so the first request is fast."""
+    service = get_service(model_path)
+    service.model
+    handler = type("Handler", (_Handler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(host=SERVICE_HOST, port=SERVICE_PORT, model_path=MODEL_PATH):
+    server = make_server(host, port, model_path)
+    print(f"Prediction service listening on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve AQI predictions from a resident model.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--model", default=MODEL_PATH)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.model)
@@ -0,0 +1,173 @@
+"""Rolling-window, lag and EWMA features, computed in batch or one observation at a time.
+
+Both modes produce the same columns and values:
+
+- compute_batch(df) uses pandas time-based rolling windows, for training.
+- RollingFeatureEngine.update() keeps a ring buffer of recent observations
+  per series (persisted between runs), so each new observation costs
+  O(window) rather than O(history).
+
+Windows are time-based and right-closed, (t - window, t], like pandas'
+rolling("3h"). Missing values are skipped by the window statistics, lags
+count observations, and EWMAs ignore missing values (ewm(adjust=False,
+ignore_na=True)).
+"""
+import os
+import json
+import math
+from collections import deque
+import pandas as pd
+
+POLLUTANTS = ["pm25", "pm10", "o3", "no2", "so2", "co"]
+WINDOWS = {"3h": pd.Timedelta(hours=3), "24h": pd.Timedelta(hours=24), "7d": pd.Timedelta(days=7)}
+LAGS = (1, 3, 6)
+EWM_SPANS = (6, 24)
+STATE_FILE = "data/rolling_state.json"
+
+
+def feature_names(columns=POLLUTANTS):
+    names = []
+    for col in columns:
+        for w in WINDOWS:
+            names += [f"{col}_mean_{w}", f"{col}_max_{w}", f"{col}_std_{w}"]
+        names += [f"{col}_lag{k}" for k in LAGS]
+        names += [f"{col}_ewm{s}" for s in EWM_SPANS]
+    return names
+
+
+def compute_batch(df, time_col="timestamp", columns=POLLUTANTS):
+    """Features for every row of df (sorted by time_col), indexed like df."""
+    df = df.sort_values(time_col, kind="stable")
+    ts = pd.to_datetime(df[time_col])
+    out = {}
+    for col in columns:
+        s = pd.Series(pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float), index=ts)
+        for w, delta in WINDOWS.items():
+            roll = s.rolling(delta)
+            out[f"{col}_mean_{w}"] = roll.mean().to_numpy()
+            out[f"{col}_max_{w}"] = roll.max().to_numpy()
+            out[f"{col}_std_{w}"] = roll.std().to_numpy()
+        for k in LAGS:
+            out[f"{col}_lag{k}"] = s.shift(k).to_numpy()
+        for span in EWM_SPANS:
+            out[f"{col}_ewm{span}"] = s.ewm(span=span, adjust=False, ignore_na=True).mean().to_numpy()
+    return pd.DataFrame(out, index=df.index)[feature_names(columns)]
+
+
+def _window_stats(values):
+    vals = [v for v in values if not math.isnan(v)]
+    n = len(vals)
+    if n == 0:
+        return math.nan, math.nan, math.nan
+    mean = sum(vals) / n
+    std = math.sqrt(sum((v - mean) ** 2 for v in vals) / (n - 1)) if n > 1 else math.nan
+    return mean, max(vals), std
+
+
+class RollingFeatureEngine:
+    """Streaming counterpart of compute_batch() with persistable state."""
+
+    def __init__(self, columns=POLLUTANTS):
+        self.columns = list(columns)
+        self.max_window = max(WINDOWS.values()).value  # ns
+        self.max_lag = max(LAGS)
+        # Per column: deque of (timestamp ns, value), oldest first
+        self.buffers = {c: deque() for c in self.columns}
+        self.ewm = {c: {span: math.nan for span in EWM_SPANS} for c in self.columns}
+        self.last_ts = None
+
+    def update(self, ts, values):
+        """Add one observation and return its feature dict."""
+        t = pd.Timestamp(ts).value
+        if self.last_ts is not None and t < self.last_ts:
+            raise ValueError(f"Observation at {pd.Timestamp(ts)} is older than the last one")
+        self.last_ts = t
+        features = {}
+        for col in self.columns:
+            v = values.get(col)
+            v = math.nan if v is None or pd.isna(v) else float(v)
+            buf = self.buffers[col]
+            buf.append((t, v))
+            # Keep the longest window plus enough observations for the lags
+            while len(buf) > self.max_lag + 1 and buf[0][0] <= t - self.max_window:
+                buf.popleft()
+
+            for w, delta in WINDOWS.items():
+                start = t - delta.value
+                window = [x for ts_i, x in buf if ts_i > start]
+                mean, mx, std = _window_stats(window)
+                features[f"{col}_mean_{w}"] = mean
+                features[f"{col}_max_{w}"] = mx
+                features[f"{col}_std_{w}"] = std
+            for k in LAGS:
+                features[f"{col}_lag{k}"] = buf[-1 - k][1] if len(buf) > k else math.nan
+            for span in EWM_SPANS:
+                prev = self.ewm[col][span]
+                if not math.isnan(v):
+                    alpha = 2 / (span + 1)
+                    self.ewm[col][span] = v if math.isnan(prev) else alpha * v + (1 - alpha) * prev
+                features[f"{col}_ewm{span}"] = self.ewm[col][span]
+        return features
+
+    def to_dict(self):
+        return {
+            "columns": self.columns,
+            "last_ts": self.last_ts,
+            "buffers": {c: list(buf) for c, buf in self.buffers.items()},
+            "ewm": {c: {str(s): v for s, v in e.items()} for c, e in self.ewm.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        engine = cls(state["columns"])
+        engine.last_ts = state["last_ts"]
+        for c, items in state["buffers"].items():
+            engine.buffers[c] = deque((int(t), float(v)) for t, v in items)
+        for c, e in state["ewm"].items():
+            engine.ewm[c] = {int(s): float(v) for s, v in e.items()}
+        return engine
+
+    def save(self, path=STATE_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            # NaN is not valid JSON; store it as null
+            json.dump(_nan_to_none(self.to_dict()), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=STATE_FILE, columns=POLLUTANTS):
+        """Engine restored from path, or a fresh one if there is no state yet."""
+        if not os.path.exists(path):
+            return cls(columns)
+        with open(path) as f:
+            return cls.from_dict(_none_to_nan(json.load(f)))
+
+    @classmethod
+    def from_history(cls, df, time_col="timestamp", columns=POLLUTANTS):
+        """Warm up an engine by streaming an existing history through it."""
+        engine = cls(columns)
+        df = df.sort_values(time_col, kind="stable")
+        for ts, values in zip(pd.to_datetime(df[time_col]), df[columns].to_dict(orient="records")):
+            engine.update(ts, values)
+        return engine
+
+
+def _nan_to_none(obj):
+    if isinstance(obj, float) and math.isnan(obj):
+        return None
+    if isinstance(obj, dict):
+        return {k: _nan_to_none(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_nan_to_none(v) for v in obj]
+    return obj
+
+
+def _none_to_nan(obj):
+    if obj is None:
+        return math.nan
+    if isinstance(obj, dict):
+        return {k: _none_to_nan(v) if k != "last_ts" else v for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_none_to_nan(v) for v in obj]
+    return obj
@@ -0,0 +1,269 @@
+"""Hourly, daily, weekly and monthly aggregates of the prediction history.
+
+For each resolution and each value in VALUES, a bucket holds the row count
+and the min/mean/max/p95. Rollups live next to the history, partitioned by
+resolution and year:
+
+    <history root>/_rollups/daily/2025.parquet
+    <history root>/_rollups/_state.json   signature of each month's files at the last refresh
+
+refresh() compares every month's files with the recorded signature and
+recomputes only the buckets overlapping months that changed, added or
+disappeared (e.g. after a git pull). history_store.upsert() calls it after
+each write, so appending a prediction re-aggregates one month at most.
+
+series() answers a chart query with a bounded number of points: the raw
+rows if the range holds few enough, else the finest resolution whose bucket
+count fits MAX_POINTS, and LTTB downsampling if even that is too many.
+"""
+import os
+import json
+import glob
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src import history_store, metrics
+
+ROLLUP_DIR = "_rollups"
+STATE_FILE = "_state.json"
+TIME_COL = history_store.TIME_COL
+BUCKET_COL = "bucket"
+VALUES = ["aqi_predicted", "aqi"]
+STATS = ["min", "mean", "max", "p95"]
+# Finest first; a bucket's start and the start of the next one
+RESOLUTIONS = {
+    "hourly": (lambda t: t.dt.floor("h"), lambda b: b + pd.Timedelta(hours=1)),
+    "daily": (lambda t: t.dt.floor("D"), lambda b: b + pd.Timedelta(days=1)),
+    "weekly": (lambda t: t.dt.to_period("W-SUN").dt.start_time, lambda b: b + pd.Timedelta(weeks=1)),
+    "monthly": (lambda t: t.dt.to_period("M").dt.start_time, lambda b: b + pd.offsets.MonthBegin(1)),
+}
+BUCKET_WIDTHS = {"hourly": pd.Timedelta(hours=1), "daily": pd.Timedelta(days=1),
+                 "weekly": pd.Timedelta(weeks=1), "monthly": pd.Timedelta(days=30.44)}
+# Upper bound on the points a chart query returns
+MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", 2000))
+# Bump when the bucket layout changes, to rebuild every rollup
+ROLLUP_VERSION = 1
+
+COLUMNS = [BUCKET_COL, "count"] + [f"{v}_{s}" for v in VALUES for s in STATS]
+SCHEMA = pa.schema([pa.field(BUCKET_COL, pa.timestamp("ns")), pa.field("count", pa.int64())] +
+                   [pa.field(c, pa.float64()) for c in COLUMNS[2:]])
+
+
+def rollup_root(root=history_store.HISTORY_DIR):
+    return os.path.join(root, ROLLUP_DIR)
+
+
+def aggregate(df, resolution):
+    """Buckets of `resolution` over the history rows in df."""
+    if df.empty:
+        return pd.DataFrame({c: pd.Series(dtype=f.type.to_pandas_dtype()) for c, f in zip(COLUMNS, SCHEMA)})
+    floor, _ = RESOLUTIONS[resolution]
+    grouped = df[VALUES].groupby(floor(df[TIME_COL]).rename(BUCKET_COL))
+    out = grouped.agg(["min", "mean", "max"])
+    out.columns = [f"{v}_{s}" for v, s in out.columns]
+    p95 = grouped.quantile(0.95)
+    for v in VALUES:
+        out[f"{v}_p95"] = p95[v]
+    out["count"] = grouped.size()
+    return out.reset_index()[COLUMNS]
+
+
+def _month_signatures(root):
+    out = {}
+    for month_dir in history_store._month_dirs(root):
+        files = sorted(glob.glob(os.path.join(month_dir, "*.parquet")))
+        if files:
+            out[os.path.basename(month_dir)] = [[os.path.basename(f), os.path.getsize(f), os.stat(f).st_mtime_ns]
+                                                for f in files]
+    return out
+
+
+def _load_state(root):
+    try:
+        with open(os.path.join(rollup_root(root), STATE_FILE)) as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return state.get("months", {}) if state.get("version") == ROLLUP_VERSION else {}
+
+
+def _save_state(months, root):
+    path = os.path.join(rollup_root(root), STATE_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"version": ROLLUP_VERSION, "months": months}, f)
+    os.replace(tmp, path)
+
+
+def _partition(root, resolution, year):
+    return os.path.join(rollup_root(root), resolution, f"{year}.parquet")
+
+
+def _read_partitions(paths):
+    paths = [p for p in paths if os.path.exists(p)]
+    if not paths:
+        return aggregate(pd.DataFrame(), "hourly")
+    return pd.concat([pq.read_table(p, schema=SCHEMA).to_pandas() for p in paths], ignore_index=True)
+
+
+def _replace(root, resolution, start, end, buckets):
+    """Swap the stored buckets in [start, end) for `buckets`, one year file at a time."""
+    for year in range(start.year, (end - pd.Timedelta(1)).year + 1):
+        path = _partition(root, resolution, year)
+        existing = _read_partitions([path])
+        keep = existing[(existing[BUCKET_COL] < start) | (existing[BUCKET_COL] >= end)]
+        new = buckets[buckets[BUCKET_COL].dt.year == year]
+        df = pd.concat([keep, new], ignore_index=True).sort_values(BUCKET_COL)
+        if df.empty:
+            if os.path.exists(path):
+                os.remove(path)
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        pq.write_table(pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False), tmp)
+        os.replace(tmp, path)
+
+
+def _ranges(months):
+    """Contiguous [start, end) month ranges covering `months`, split at year boundaries."""
+    ranges = []
+    for month in sorted(months):
+        start = pd.Timestamp(month + "-01")
+        end = start + pd.offsets.MonthBegin(1)
+        if ranges and ranges[-1][1] == start and start.year == ranges[-1][0].year:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return ranges
+
+
+@metrics.timer("rollup_refresh")
+def refresh(root=history_store.HISTORY_DIR):
+    """Recompute the buckets of every month whose files changed; returns those months."""
+    current = _month_signatures(root)
+    recorded = _load_state(root)
+    changed = sorted(m for m in set(current) | set(recorded) if current.get(m) != recorded.get(m))
+    if not changed:
+        return []
+    for start, end in _ranges(changed):
+        # Widen to whole buckets (a week can straddle two months), then read the widest span once
+        bounds = {res: (floor(pd.Series([start])).iloc[0], next_bucket(floor(pd.Series([end - pd.Timedelta(1)])).iloc[0]))
+                  for res, (floor, next_bucket) in RESOLUTIONS.items()}
+        rows = history_store.read_range(min(lo for lo, _ in bounds.values()), max(hi for _, hi in bounds.values()),
+                                        columns=[TIME_COL] + VALUES, root=root)
+        for resolution, (lo, hi) in bounds.items():
+            inside = rows[(rows[TIME_COL] >= lo) & (rows[TIME_COL] < hi)]
+            _replace(root, resolution, lo, hi, aggregate(inside, resolution))
+    _save_state(current, root)
+    return changed
+
+
+def rebuild(root=history_store.HISTORY_DIR):
+    """Drop every rollup and aggregate the whole history again."""
+    for path in glob.glob(os.path.join(rollup_root(root), "*", "*.parquet")):
+        os.remove(path)
+    _save_state({}, root)
+    return refresh(root)
+
+
+def read(resolution, start=None, end=None, root=history_store.HISTORY_DIR):
+    """Stored buckets with start <= bucket < end, oldest first. Only the years in range are read."""
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    paths = sorted(glob.glob(os.path.join(rollup_root(root), resolution, "*.parquet")))
+    paths = [p for p in paths
+             if (start is None or int(os.path.basename(p)[:4]) >= start.year)
+             and (end is None or int(os.path.basename(p)[:4]) <= end.year)]
+    df = _read_partitions(paths)
+    if start is not None:
+        df = df[df[BUCKET_COL] >= start]
+    if end is not None:
+        df = df[df[BUCKET_COL] < end]
+    return df.sort_values(BUCKET_COL).reset_index(drop=True)
+
+
+def lttb(x, y, n):
+    """Indices of n points chosen by Largest-Triangle-Three-Buckets (first and last always kept).
+
+    Keeps the visual shape of a series (peaks included) with far fewer points.
+    """
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, size - 1, n - 1).astype(int)
+    out = np.empty(n, dtype=int)
+    out[0], out[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point for the final bucket)
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else size
+        avg_x, avg_y = x[nlo:nhi].mean(), np.nanmean(y[nlo:nhi])
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.nanargmax(area)) if np.isfinite(area).any() else lo
+        out[i + 1] = a
+    return out
+
+
+def downsample(df, x, y, max_points=MAX_POINTS):
+    """df cut to at most max_points rows by LTTB on column y."""
+    if len(df) <= max_points:
+        return df
+    xs = pd.to_datetime(df[x]).astype("int64") if not np.issubdtype(df[x].dtype, np.number) else df[x]
+    return df.iloc[lttb(xs.to_numpy(), df[y].to_numpy(), max_points)].reset_index(drop=True)
+
+
+def bucket_start(resolution, t):
+    """Start of the `resolution` bucket holding time t (None stays None)."""
+    if t is None:
+        return None
+    floor, _ = RESOLUTIONS[resolution]
+    return floor(pd.Series([pd.Timestamp(t)])).iloc[0]
+
+
+def count(start=None, end=None, root=history_store.HISTORY_DIR):
+    """History rows in [start, end), to within the hour of start: whole months from the monthly
+    rollup, the rest of a partial first month from the hourly one."""
+    if start is None:
+        return int(read("monthly", None, end, root)["count"].sum())
+    month_end = RESOLUTIONS["monthly"][1](bucket_start("monthly", start))
+    if end is not None and pd.Timestamp(end) <= month_end:
+        month_end = pd.Timestamp(end)
+    head = read("hourly", bucket_start("hourly", start), month_end, root)["count"].sum()
+    return int(head + read("monthly", month_end, end, root)["count"].sum())
+
+
+@metrics.timer("rollup_series")
+def series(start=None, end=None, max_points=MAX_POINTS, root=history_store.HISTORY_DIR):
+    """(frame, resolution) for charting aqi_predicted over [start, end), at most max_points rows.
+
+    "raw" frames have the history's columns; rollups have a bucket column
+    and the *_min/_mean/_max/_p95 statistics. The first bucket of a rollup is
+    the one holding start, so it may begin (and count rows) before it.
+    """
+    refresh(root)
+    if count(start, end, root) <= max_points:
+        return history_store.read_range(start, end, root=root), "raw"
+    monthly = read("monthly", bucket_start("monthly", start), end, root)
+    first = pd.Timestamp(start) if start is not None else monthly[BUCKET_COL].iloc[0]
+    last = pd.Timestamp(end) if end is not None else RESOLUTIONS["monthly"][1](monthly[BUCKET_COL].iloc[-1])
+    for resolution, width in BUCKET_WIDTHS.items():
+        if resolution != "monthly" and (last - first) / width + 1 > max_points:
+            continue
+        df = monthly if resolution == "monthly" else read(resolution, bucket_start(resolution, start), end, root)
+        if len(df) <= max_points:
+            return df, resolution
+    return downsample(df, BUCKET_COL, "aqi_predicted_mean", max_points), resolution
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the prediction history rollups.")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every rollup from scratch")
+    args = parser.parse_args()
+    months = rebuild() if args.rebuild else refresh()
+    print(f"Rolled up {len(months)} changed month(s) into {rollup_root()}")
@@ -0,0 +1,447 @@
+"""Runs the pipeline jobs as a DAG of stages, skipping the ones with nothing to do.
+
+Each stage names an aqi.py job, the files it reads and the files it writes.
+A stage depends on every stage that writes one of its inputs, so fetch and
+train run side by side, then predict and forecast, then features and alert.
+A stage runs when
+
+- one of its outputs is missing,
+- the content of one of its inputs changed since its last successful run, or
+- its interval (`every`) has passed since then (for stages that read the API),
+
+and is skipped otherwise. Intervals count from the start of the last
+successful run, less GRACE_SECONDS. If a stage fails, the stages that depend
+on it are not run, and it is retried after an exponential backoff
+(retry_delay). The input signatures and run times are kept in STATE_FILE.
+
+The whole run holds a lock file (LOCK_FILE), so a second scheduler, an
+`aqi.py run` or the dashboard's background prediction never writes the same
+CSVs and parquet files at the same time.
+
+Usage: python -m src.scheduler                one pass, then exit
+       python -m src.scheduler --daemon       keep running, waking up when a stage is due
+       python -m src.scheduler --dry-run      print what would run
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+STATE_FILE = os.getenv("SCHEDULER_STATE", "data/scheduler_state.json")
+LOCK_FILE = os.getenv("PIPELINE_LOCK", "data/.pipeline.lock")
+# Seconds to wait for another run to release the lock
+LOCK_TIMEOUT = float(os.getenv("PIPELINE_LOCK_TIMEOUT", 600))
+MAX_WORKERS = int(os.getenv("SCHEDULER_WORKERS", 2))
+# Longest sleep of the daemon, so input files changed by hand are picked up
+POLL_SECONDS = float(os.getenv("SCHEDULER_POLL_SECONDS", 15 * 60))
+HOUR = 60 * 60
+# A stage with an interval is due this much early, so a cron or poll cadence
+# equal to the interval never misses a run by a few seconds of start-up jitter
+GRACE_SECONDS = float(os.getenv("SCHEDULER_GRACE_SECONDS", 10 * 60))
+# First retry delay after a failure, doubled per consecutive failure, capped
+# at the stage's interval (an hour for stages without one)
+RETRY_SECONDS = float(os.getenv("SCHEDULER_RETRY_SECONDS", 60))
+
+MODEL = "models/karachi_aqi_model.pkl"
+MODEL_META = "models/karachi_aqi_model.meta.json"
+RAW_DATA = "data/raw_aqi_data_karachi.csv"
+HISTORY = "data/history/daily_predictions"
+FORECAST = "data/forecast_3day.csv"
+FORECAST_HOURLY = "data/forecast_hourly.csv"
+AQI_GRID = "data/aqi_grid.csv"
+STATIONS = "data/stations_karachi.csv"
+
+
+class Stage:
+    def __init__(self, name, job, inputs=(), outputs=(), every=None):
+        self.name = name
+        self.job = job
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        # Seconds between runs even when the inputs are unchanged (None: only on change)
+        self.every = every
+        self.deps = []
+
+
+STAGES = [
+    Stage("fetch", "fetch", outputs=["data/features_store.csv", "data/rolling_state.json"], every=HOUR),
+    Stage("train", "train", inputs=[RAW_DATA], outputs=[MODEL, MODEL_META]),
+    Stage("predict", "predict", inputs=[MODEL], outputs=[HISTORY], every=3 * HOUR),
+    Stage("forecast", "forecast", inputs=[MODEL], outputs=[FORECAST, FORECAST_HOURLY], every=24 * HOUR),
+    Stage("features", "features", inputs=[HISTORY], outputs=["data/features_karachi.csv"]),
+    Stage("alert", "alert", inputs=[HISTORY, FORECAST]),
+    Stage("spatial", "spatial", outputs=[AQI_GRID, STATIONS], every=HOUR),
+]
+
+
+def link(stages):
+    """Set each stage's deps to the stages writing its inputs, and return the stages by name."""
+    writers = {path: s.name for s in stages for path in s.outputs}
+    for s in stages:
+        s.deps = sorted({writers[p] for p in s.inputs if p in writers and writers[p] != s.name})
+    by_name = {s.name: s for s in stages}
+    seen, done = set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in seen:
+            raise ValueError(f"Stage {name} is part of a dependency cycle")
+        seen.add(name)
+        for dep in by_name[name].deps:
+            visit(dep)
+        done.add(name)
+
+    for s in stages:
+        visit(s.name)
+    return by_name
+
+
+class FileLock:
+    """Exclusive lock on a file, held across processes (fcntl on POSIX, msvcrt on Windows).
+
+    The OS drops the lock when the process exits, so a crashed run never
+    leaves a stale lock behind.
+    """
+
+    def __init__(self, path=LOCK_FILE):
+        self.path = path
+        self._fd = None
+
+    def _try_lock(self):
+        if os.name == "nt":
+            import msvcrt
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def acquire(self, timeout=LOCK_TIMEOUT):
+        """True once the lock is held; False if it is still taken after `timeout` seconds (0: don't wait)."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self._try_lock()
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    os.close(self._fd)
+                    self._fd = None
+                    return False
+                time.sleep(0.2)
+        os.ftruncate(self._fd, 0)
+        os.write(self._fd, f"{os.getpid()} {datetime.now().isoformat(timespec='seconds')}\n".encode())
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        if os.name == "nt":
+            import msvcrt
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+    @property
+    def locked(self):
+        return self._fd is not None
+
+    def __enter__(self):
+        if not self.acquire():
+            raise TimeoutError(f"{self.path} is held by another run: {self.holder()}")
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+    def holder(self):
+        try:
+            with open(self.path) as f:
+                return f.read().strip() or "unknown"
+        except OSError:
+            return "unknown"
+
+
+def pipeline_lock(path=LOCK_FILE):
+    return FileLock(path)
+
+
+def _files(path):
+    """path itself, or every file under it (skipping "_"/"." files, which are indexes and markers)."""
+    if os.path.isfile(path):
+        return [path]
+    out = []
+    for root, dirs, names in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith((".", "_")))
+        out.extend(os.path.join(root, n) for n in sorted(names) if not n.startswith((".", "_")))
+    return out
+
+
+def _sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def signature(path, cache):
+    """Content hash of a file or directory, or None if it does not exist.
+
+    Based on content, not mtimes, so a fresh checkout (as on CI) does not
+    look changed. A file is only re-hashed when its size or mtime changed;
+    `cache` maps file -> [size, mtime_ns, sha1] and is updated in place.
+    """
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha1()
+    for f in _files(path):
+        st = os.stat(f)
+        key = f.replace(os.sep, "/")
+        hit = cache.get(key)
+        if hit is None or hit[:2] != [st.st_size, st.st_mtime_ns]:
+            hit = cache[key] = [st.st_size, st.st_mtime_ns, _sha1(f)]
+        h.update(f"{os.path.relpath(f, path).replace(os.sep, '/')}:{hit[2]}\n".encode())
+    return h.hexdigest()
+
+
+def load_state(path=STATE_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"stages": {}, "hashes": {}}
+
+
+def save_state(state, path=STATE_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def retry_delay(stage, failures):
+    """Seconds to wait before retrying a stage that failed `failures` times in a row."""
+    return min(stage.every or HOUR, RETRY_SECONDS * 2 ** max(failures - 1, 0))
+
+
+def retry_wait(stage, state, now=None):
+    """Seconds left before a failed stage may be retried (0 if it did not fail or may retry now)."""
+    last = state["stages"].get(stage.name)
+    if not last or last.get("ok", True) or "attempted" not in last:
+        return 0.0
+    delay = retry_delay(stage, last.get("failures", 1))
+    return max(0.0, last["attempted"] + delay - (now or time.time()))
+
+
+def _last_start(last):
+    # State written before "started" was recorded only has the finish time
+    return last.get("started", last.get("finished"))
+
+
+def reason_to_run(stage, state, sigs, now=None):
+    """Why the stage should run, or None if it can be skipped."""
+    now = now or time.time()
+    last = state["stages"].get(stage.name)
+    if retry_wait(stage, state, now) > 0:
+        return None
+    missing = [p for p in stage.outputs if not os.path.exists(p)]
+    if missing:
+        return f"missing {', '.join(missing)}"
+    if not last:
+        return "never run"
+    if not last.get("ok"):
+        return f"last run failed ({last.get('failures', 1)}x)"
+    changed = [p for p in stage.inputs if last.get("inputs", {}).get(p) != sigs[p]]
+    if changed:
+        return f"changed {', '.join(changed)}"
+    if stage.every is not None:
+        age = now - _last_start(last)
+        if age >= stage.every - GRACE_SECONDS:
+            return f"last run {age / HOUR:.1f}h ago"
+    return None
+
+
+def _run_job(stage):
+    import aqi
+    from src import metrics
+    t0 = time.perf_counter()
+    with metrics.timer("stage", stage=stage.name):
+        aqi.JOBS[stage.job][0](None)
+    return time.perf_counter() - t0
+
+
+def run_once(stages=None, only=None, force=False, dry_run=False, max_workers=MAX_WORKERS,
+             state_path=STATE_FILE):
+    """One pass over the DAG. Returns {stage: "ran" | "skipped" | "failed" | "blocked"}
+    ("due" instead of "ran" on a dry run).
+
+    `only` limits the pass to those stages (their deps are not pulled in);
+    `force` runs them whatever their inputs.
+    """
+    from src import metrics
+    by_name = link(stages or STAGES)
+    wanted = [n for n in by_name if only is None or n in only]
+    state = load_state(state_path)
+    state_lock = threading.Lock()
+    status = {}
+    running = {}
+    started = set()
+
+    def decide(name):
+        stage = by_name[name]
+        with state_lock:
+            sigs = {p: signature(p, state["hashes"]) for p in stage.inputs}
+        reason = "forced" if force else reason_to_run(stage, state, sigs)
+        return reason, sigs
+
+    def finish(name, sigs, started_at, seconds, ok):
+        with state_lock:
+            entry = state["stages"].setdefault(name, {})
+            entry.update({"attempted": time.time(), "seconds": round(seconds, 3), "ok": ok})
+            if ok:
+                entry.update({"started": started_at, "finished": time.time(), "inputs": sigs, "failures": 0})
+            else:
+                entry["failures"] = entry.get("failures", 0) + 1
+            if not dry_run:
+                save_state(state, state_path)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        while len(status) < len(wanted):
+            for name in wanted:
+                if name in status or name in started:
+                    continue
+                deps = [d for d in by_name[name].deps if d in wanted]
+                if any(status.get(d) in ("failed", "blocked") for d in deps):
+                    status[name] = "blocked"
+                    print(f"[{name}] not run: {', '.join(d for d in deps if status[d] in ('failed', 'blocked'))} did not finish")
+                    continue
+                if any(d not in status for d in deps):
+                    continue
+                reason, sigs = decide(name)
+                if reason is None:
+                    status[name] = "skipped"
+                    metrics.inc("stage_runs", stage=name, result="skipped")
+                    retry = retry_wait(by_name[name], state)
+                    print(f"[{name}] failed recently, retry in {retry / 60:.1f} min" if retry
+                          else f"[{name}] up to date, skipped")
+                    continue
+                print(f"[{name}] {'would run' if dry_run else 'running'}: {reason}")
+                if dry_run:
+                    status[name] = "due"
+                    continue
+                started.add(name)
+                running[pool.submit(_run_job, by_name[name])] = (name, sigs, time.time())
+            if not running:
+                continue
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name, sigs, started_at = running.pop(future)
+                try:
+                    seconds = future.result()
+                except Exception as e:
+                    status[name] = "failed"
+                    print(f"[{name}] failed: {type(e).__name__}: {e}")
+                    finish(name, sigs, started_at, 0.0, False)
+                else:
+                    status[name] = "ran"
+                    print(f"[{name}] done in {seconds:.2f}s")
+                    finish(name, sigs, started_at, seconds, True)
+                metrics.inc("stage_runs", stage=name, result=status[name])
+    return status
+
+
+def seconds_until_due(stages=None, state_path=STATE_FILE, now=None):
+    """Seconds until the next interval-driven stage or failed-stage retry is due (0 if now), or None.
+
+    A stage that never succeeded waits for the retries of its failed deps.
+    """
+    state = load_state(state_path)
+    now = now or time.time()
+    by_name = link(stages or STAGES)
+    own = {}
+    for s in by_name.values():
+        last = state["stages"].get(s.name)
+        if last and not last.get("ok", True):
+            own[s.name] = retry_wait(s, state, now)
+        elif s.every is not None:
+            start = _last_start(last) if last else None
+            own[s.name] = 0.0 if start is None else max(0.0, start + s.every - GRACE_SECONDS - now)
+        elif not last:
+            own[s.name] = 0.0
+
+    def due(name):
+        failed = [d for d in by_name[name].deps
+                  if not state["stages"].get(d, {}).get("ok", True)]
+        return max([own.get(name, 0.0)] + [due(d) for d in failed]) if failed else own.get(name)
+
+    waits = [w for w in (due(n) for n in by_name) if w is not None]
+    return min(waits) if waits else None
+
+
+def run_locked(lock_timeout=LOCK_TIMEOUT, **kwargs):
+    """run_once under the pipeline lock; None if another run held it for lock_timeout seconds."""
+    lock = pipeline_lock()
+    if not lock.acquire(lock_timeout):
+        print(f"Another pipeline run holds {lock.path} ({lock.holder()}); not running.")
+        return None
+    try:
+        return run_once(**kwargs)
+    finally:
+        lock.release()
+
+
+def daemon(poll=POLL_SECONDS, **kwargs):
+    """Run a pass, sleep until the next stage is due (at most `poll` seconds), repeat."""
+    print(f"Scheduler started (pid {os.getpid()}); Ctrl+C to stop")
+    try:
+        while True:
+            run_locked(**kwargs)
+            due = seconds_until_due()
+            sleep = poll if due is None else min(poll, max(due, 1.0))
+            print(f"Next pass in {sleep / 60:.1f} min")
+            time.sleep(sleep)
+    except KeyboardInterrupt:
+        print("Scheduler stopped")
+
+
+def main(daemon_mode=False, stages=None, force=False, dry_run=False, max_workers=MAX_WORKERS):
+    kwargs = {"only": stages, "force": force, "dry_run": dry_run, "max_workers": max_workers}
+    if daemon_mode:
+        daemon(**kwargs)
+        return 0
+    status = run_locked(**kwargs)
+    if status is None:
+        return 1
+    print("Summary: " + ", ".join(f"{k}={v}" for k, v in status.items()))
+    return 1 if any(v in ("failed", "blocked") for v in status.values()) else 0
+
+
+def build_parser(parser=None):
+    parser = parser or argparse.ArgumentParser(description="Run the pipeline stages whose inputs changed.")
+    parser.add_argument("--daemon", action="store_true", help="keep running and wake up when a stage is due")
+    parser.add_argument("--stages", nargs="+", choices=[s.name for s in STAGES],
+                        help="only these stages (default: all)")
+    parser.add_argument("--force", action="store_true", help="run the stages even if nothing changed")
+    parser.add_argument("--dry-run", action="store_true", help="print what would run")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="stages run at the same time")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    sys.exit(main(args.daemon, args.stages, args.force, args.dry_run, args.workers))
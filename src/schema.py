@@ -0,0 +1,244 @@
+"""Column types, time formats and aliases of the project's CSV datasets.
+
+load() reads a dataset with its dtypes, usecols and date format applied up
+front instead of letting pandas infer them: pollutants and AQI values are
+float32, hour/day/month int8 and station categorical. Old column names
+(aliases) are renamed to the canonical ones. Timestamps that don't match
+the dataset's format are re-parsed individually and stray non-numeric
+values become NaN, so a few bad rows never fail a load.
+"""
+import io
+import os
+import csv
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from src import metrics
+
+POLLUTANTS = ["pm25", "pm10", "o3", "co", "no2", "so2"]
+# Timestamps written by pandas (to_csv / isoformat), with or without fractions
+ISO = "ISO8601"
+# Rows per frame yielded by chunks()
+CHUNK_ROWS = 250_000
+
+
+class Dataset:
+    def __init__(self, name, path, time_col, time_format, dtypes, aliases=None, extra_dtype=None):
+        self.name = name
+        self.path = path
+        self.time_col = time_col
+        self.time_format = time_format
+        self.dtypes = dtypes
+        self.aliases = aliases or {}
+        # dtype of columns not listed in dtypes (None: such columns are dropped)
+        self.extra_dtype = extra_dtype
+
+    @property
+    def columns(self):
+        return [self.time_col] + list(self.dtypes)
+
+
+_pollutants = {name: "float32" for name in POLLUTANTS}
+_calendar = {"hour": "int8", "day": "int8", "month": "int8"}
+_aqi_aliases = {"predicted_aqi": "aqi_predicted"}
+# Prediction interval bounds (optional: older files don't have them)
+_interval = {"aqi_lower": "float32", "aqi_upper": "float32"}
+
+DATASETS = {
+    "raw": Dataset(
+        "raw", "data/raw_aqi_data_karachi.csv", "datetime", "%m/%d/%Y %H:%M",
+        {"aqi": "float32", **_pollutants, "station": "category"},
+    ),
+    "predictions": Dataset(
+        "predictions", "data/daily_predictions.csv", "prediction_time", ISO,
+        {"aqi_predicted": "float32", **_pollutants, **_calendar, "aqi": "float32", "aqi_change": "float32",
+         **_interval},
+        _aqi_aliases,
+    ),
+    "features": Dataset(
+        "features", "data/features_karachi.csv", "prediction_time", ISO,
+        {"hour": "int8", "day_of_week": "int8", "aqi_predicted": "float32"},
+        _aqi_aliases,
+    ),
+    "features_store": Dataset(
+        "features_store", "data/features_store.csv", "timestamp", ISO,
+        {"aqi": "float32", **_pollutants, **_calendar, "aqi_change": "float32", "pm25_change": "float32"},
+        extra_dtype="float32",  # rolling/lag features
+    ),
+    "forecast_daily": Dataset(
+        "forecast_daily", "data/forecast_3day.csv", "prediction_time", "%Y-%m-%d",
+        {"pm25": "float32", "pm10": "float32", "o3": "float32",
+         "aqi_predicted": "float32", "aqi_min": "float32", "aqi_max": "float32", **_interval,
+         "dominant_pollutant": "category"},
+        _aqi_aliases,
+    ),
+    "forecast_hourly": Dataset(
+        "forecast_hourly", "data/forecast_hourly.csv", "prediction_time", ISO,
+        {**_pollutants, "aqi_predicted": "float32", **_interval, "dominant_pollutant": "category"},
+        _aqi_aliases,
+    ),
+    # src/spatial.py: AQI per grid cell, and the station readings behind it
+    "aqi_grid": Dataset(
+        "aqi_grid", "data/aqi_grid.csv", "time", ISO,
+        {"lat": "float64", "lon": "float64", "aqi": "float32", "aqi_std": "float32"},
+    ),
+    "stations": Dataset(
+        "stations", "data/stations_karachi.csv", "time", ISO,
+        {"station": "category", "uid": "int64", "lat": "float64", "lon": "float64", "aqi": "float32"},
+    ),
+}
+
+
+def get(name):
+    return name if isinstance(name, Dataset) else DATASETS[name]
+
+
+def parse_times(values, time_format):
+    """Parse with the fixed format; only values that don't match it are inferred one by one."""
+    parsed = pd.to_datetime(values, format=time_format, errors="coerce")
+    retry = parsed.isna() & pd.notna(values)
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], format="mixed", errors="coerce")
+    return parsed
+
+
+def _coerce(df, dtypes):
+    for col, dtype in dtypes.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        if dtype == "category":
+            df[col] = df[col].astype("category")
+            continue
+        values = pd.to_numeric(df[col], errors="coerce")
+        # Integer columns with gaps stay float
+        if np.issubdtype(np.dtype(dtype), np.integer) and values.isna().any():
+            dtype = "float32"
+        df[col] = values.astype(dtype)
+    return df
+
+
+def _arrow_type(dtype):
+    if dtype == "category":
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+
+def _header(path):
+    """Column names from the first line of a CSV path or binary file object."""
+    if hasattr(path, "read"):
+        pos = path.tell()
+        line = path.readline().decode()
+        path.seek(pos)
+    else:
+        with open(path, newline="") as f:
+            line = f.readline()
+    return next(csv.reader([line])) if line.strip() else []
+
+
+def _read_arrow(path, names, header, usecols, types, time_col, time_format):
+    read = pacsv.ReadOptions(column_names=names, skip_rows=1 if header else 0)
+    convert = pacsv.ConvertOptions(
+        include_columns=usecols,
+        column_types={**types, **({time_col: pa.timestamp("ns")} if time_col else {})},
+        timestamp_parsers=[pacsv.ISO8601 if time_format == ISO else time_format],
+    )
+    return pacsv.read_csv(path, read_options=read, convert_options=convert).to_pandas()
+
+
+def _read_pandas(path, names, header, usecols, dtypes, time_col, time_format):
+    read = dict(usecols=usecols, low_memory=False)
+    if not header:
+        read.update(header=None, names=names)
+    df = pd.read_csv(path, dtype={time_col: "str"} if time_col else None, **read)
+    if time_col:
+        df[time_col] = parse_times(df[time_col], time_format)
+    return df
+
+
+def _select(ds, names, columns):
+    """Columns to read out of `names`, their dtypes and the time column (file names)."""
+    canonical = {col: ds.aliases.get(col, col) for col in names}
+    wanted = set(columns) | {ds.time_col} if columns is not None else None
+    usecols, dtypes, time_col = [], {}, None
+    for col in names:
+        name_ = canonical[col]
+        if wanted is not None and name_ not in wanted:
+            continue
+        if name_ == ds.time_col:
+            usecols.append(col)
+            time_col = col
+        elif name_ in ds.dtypes or ds.extra_dtype:
+            usecols.append(col)
+            dtypes[col] = ds.dtypes.get(name_, ds.extra_dtype)
+    return canonical, usecols, dtypes, time_col
+
+
+def load(name, path=None, columns=None, names=None):
+    """Read a dataset CSV with explicit dtypes and a parsed time column.
+
+    `path` may also be a binary file object. `columns` restricts the columns
+    read (canonical names; the time column is always included); optional
+    columns missing from the file are simply absent. Pass `names` when the
+    input has no header line.
+
+    The file is parsed by pyarrow with the dtypes and time format fixed up
+    front. If it holds values that don't fit them, it is re-read with pandas
+    and the offending values are coerced instead.
+    """
+    ds = get(name)
+    path = path if path is not None else ds.path
+    header = names is None
+    names = _header(path) if header else list(names)
+    start = path.tell() if hasattr(path, "tell") else None
+    canonical, usecols, dtypes, time_col = _select(ds, names, columns)
+
+    with metrics.timer("csv_read", dataset=ds.name):
+        try:
+            types = {col: _arrow_type(dtype) for col, dtype in dtypes.items()}
+            df = _read_arrow(path, names, header, usecols, types, time_col, ds.time_format)
+        except (pa.ArrowInvalid, ValueError):
+            if start is not None:
+                path.seek(start)
+            df = _read_pandas(path, names, header, usecols, dtypes, time_col, ds.time_format)
+        # Columns with gaps (int -> float) or stray text (-> object) get their final dtype here
+        return _coerce(df, dtypes).rename(columns=canonical)
+
+
+def chunks(name, path=None, columns=None, chunk_rows=CHUNK_ROWS):
+    """Yield a dataset CSV as frames of up to chunk_rows rows, typed like load()'s.
+
+    For files too large to hold in memory at once.
+    """
+    ds = get(name)
+    path = path if path is not None else ds.path
+    canonical, usecols, dtypes, time_col = _select(ds, _header(path), columns)
+    reader = pd.read_csv(path, usecols=usecols, chunksize=chunk_rows,
+                         dtype={time_col: "str"} if time_col else None)
+    with reader:
+        for df in reader:
+            if time_col:
+                df[time_col] = parse_times(df[time_col], ds.time_format)
+            yield _coerce(df, dtypes).rename(columns=canonical)
+
+
+def tail(name, path=None, n=1, block=1 << 16):
+    """Last n rows of an append-only CSV, read by seeking back from the end.
+
+    Costs O(n) regardless of the file's length.
+    """
+    ds = get(name)
+    path = path if path is not None else ds.path
+    names = _header(path)
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        data = b""
+        # One extra line: the first one read is partial (or the header)
+        while pos > 0 and data.count(b"\n") <= n + 1:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = [line for line in data.splitlines()[1:] if line.strip()][-n:]
+    return load(ds, io.BytesIO(b"\n".join(lines) + b"\n"), names=names)
+
@@ -0,0 +1,218 @@
+"""AQI across the Karachi area, interpolated from every WAQI station in it.
+
+fetch_stations() asks WAQI's map/bounds endpoint for all stations inside
+BOUNDS. interpolate() spreads their AQI over a regular lat/lon grid
+(GRID_STEP degrees) by inverse distance weighting of the IDW_NEIGHBORS
+nearest stations, found with a scipy cKDTree. The weights only depend on
+where the stations and grid cells are, so they are kept as a sparse
+(cells x stations) matrix, in memory and in WEIGHTS_FILE, keyed on the
+station coordinates and the grid. An hourly refresh with the same stations
+is then two sparse matrix-vector products (weighted sum, and the weight of
+the stations that reported, since some report "-" in a given hour).
+
+SPATIAL_METHOD=gp fits a Gaussian process (scikit-learn, RBF + noise
+kernel) instead, which also gives a standard deviation per cell; it is
+refitted on every refresh.
+
+Usage: python -m src.spatial [--method idw|gp]
+writes GRID_FILE (time, lat, lon, aqi[, aqi_std]) and STATIONS_FILE.
+"""
+import os
+import json
+import hashlib
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.spatial import cKDTree
+from src import fetcher, metrics
+
+# lat_min, lon_min, lat_max, lon_max of the Karachi metro area
+BOUNDS = tuple(float(v) for v in os.getenv("SPATIAL_BOUNDS", "24.75,66.85,25.10,67.35").split(","))
+GRID_STEP = float(os.getenv("SPATIAL_GRID_STEP", 0.01))  # degrees, about 1.1 km
+IDW_NEIGHBORS = int(os.getenv("SPATIAL_NEIGHBORS", 8))
+IDW_POWER = 2.0
+METHOD = os.getenv("SPATIAL_METHOD", "idw")
+GRID_FILE = "data/aqi_grid.csv"
+STATIONS_FILE = "data/stations_karachi.csv"
+WEIGHTS_FILE = "data/spatial_weights.npz"
+# Station times are stored in local time, like the rest of the data
+TIMEZONE = "Asia/Karachi"
+# km per degree of latitude; longitude degrees are scaled by cos(latitude)
+KM_PER_DEGREE = 111.2
+
+STATION_COLUMNS = ["time", "station", "uid", "lat", "lon", "aqi"]
+
+_weights = {}
+
+
+def api_token():
+    token = os.getenv("AQI_API_TOKEN")
+    if not token:
+        raise EnvironmentError("AQI_API_TOKEN environment variable not set!")
+    return token
+
+
+def fetch_stations(token, bounds=BOUNDS, **kwargs):
+    """Stations inside bounds with their current AQI (NaN for "-"), or None if the request failed."""
+    lat_min, lon_min, lat_max, lon_max = bounds
+    data = fetcher.get_json("map/bounds/", token, params={"latlng": f"{lat_min},{lon_min},{lat_max},{lon_max}",
+                                                          "networks": "all"}, **kwargs)
+    if data is None:
+        return None
+    df = pd.DataFrame({
+        "time": [(s.get("station") or {}).get("time") for s in data],
+        "station": [(s.get("station") or {}).get("name") for s in data],
+        "uid": [s.get("uid") for s in data],
+        "lat": [s.get("lat") for s in data],
+        "lon": [s.get("lon") for s in data],
+        "aqi": pd.to_numeric([s.get("aqi") for s in data], errors="coerce"),
+    }, columns=STATION_COLUMNS)
+    df["time"] = pd.to_datetime(df["time"], utc=True, errors="coerce").dt.tz_convert(TIMEZONE).dt.tz_localize(None)
+    return df.dropna(subset=["lat", "lon"]).reset_index(drop=True)
+
+
+class Grid:
+    """Cell centres of a regular lat/lon grid over bounds."""
+
+    def __init__(self, bounds=BOUNDS, step=GRID_STEP):
+        self.bounds = tuple(bounds)
+        self.step = step
+        lat_min, lon_min, lat_max, lon_max = bounds
+        self.lats = np.arange(lat_min + step / 2, lat_max, step)
+        self.lons = np.arange(lon_min + step / 2, lon_max, step)
+        lat, lon = np.meshgrid(self.lats, self.lons, indexing="ij")
+        self.lat = lat.ravel()
+        self.lon = lon.ravel()
+
+    def __len__(self):
+        return len(self.lat)
+
+    @property
+    def origin_lat(self):
+        return (self.bounds[0] + self.bounds[2]) / 2
+
+    def project(self, lat, lon):
+        """Points in km on a plane through the grid's centre, so distances are isotropic."""
+        scale = np.cos(np.radians(self.origin_lat))
+        return np.column_stack([np.asarray(lat, dtype=float) * KM_PER_DEGREE,
+                                np.asarray(lon, dtype=float) * KM_PER_DEGREE * scale])
+
+    def points(self):
+        return self.project(self.lat, self.lon)
+
+    def frame(self):
+        return pd.DataFrame({"lat": self.lat, "lon": self.lon})
+
+
+def idw_weights(stations_xy, cells_xy, k=IDW_NEIGHBORS, power=IDW_POWER):
+    """Sparse (cells x stations) matrix of normalised inverse-distance weights of the k nearest stations."""
+    n_stations = len(stations_xy)
+    k = min(k, n_stations)
+    dist, idx = cKDTree(stations_xy).query(cells_xy, k=k)
+    dist, idx = dist.reshape(len(cells_xy), k), idx.reshape(len(cells_xy), k)
+    with np.errstate(divide="ignore"):
+        w = 1.0 / dist ** power
+    # A cell on top of a station takes that station's value
+    exact = np.isinf(w)
+    w[exact.any(axis=1)] = exact[exact.any(axis=1)].astype(float)
+    w /= w.sum(axis=1, keepdims=True)
+    rows = np.repeat(np.arange(len(cells_xy)), k)
+    return sparse.csr_matrix((w.ravel(), (rows, idx.ravel())), shape=(len(cells_xy), n_stations))
+
+
+def _weights_key(stations, grid, k, power):
+    coords = np.round(stations[["lat", "lon"]].to_numpy(dtype=float), 5)
+    h = hashlib.sha1(coords.tobytes())
+    h.update(json.dumps([grid.bounds, grid.step, k, power]).encode())
+    return h.hexdigest()
+
+
+def weights(stations, grid, k=IDW_NEIGHBORS, power=IDW_POWER, path=WEIGHTS_FILE):
+    """IDW weight matrix for these station positions on grid: from memory, path, or built (and saved)."""
+    key = _weights_key(stations, grid, k, power)
+    if key in _weights:
+        metrics.inc("spatial_weights", result="memory")
+        return _weights[key]
+    W = None
+    if path and os.path.exists(path):
+        with np.load(path, allow_pickle=False) as f:
+            if str(f["key"]) == key:
+                W = sparse.csr_matrix((f["data"], f["indices"], f["indptr"]), shape=tuple(f["shape"]))
+                metrics.inc("spatial_weights", result="file")
+    if W is None:
+        with metrics.timer("spatial_weights_build"):
+            W = idw_weights(grid.project(stations["lat"], stations["lon"]), grid.points(), k, power)
+        metrics.inc("spatial_weights", result="built")
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp = path + ".tmp.npz"
+            np.savez(tmp, key=key, data=W.data, indices=W.indices, indptr=W.indptr, shape=W.shape)
+            os.replace(tmp, path)
+    _weights.clear()
+    _weights[key] = W
+    return W
+
+
+def idw(stations, grid, **kwargs):
+    """AQI per grid cell; stations without a reading are left out by renormalising the weights.
+
+    Cells whose nearest stations all lack a reading are NaN.
+    """
+    W = weights(stations, grid, **kwargs)
+    values = stations["aqi"].to_numpy(dtype=float)
+    reported = ~np.isnan(values)
+    total = W @ reported.astype(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total > 0, (W @ np.where(reported, values, 0.0)) / total, np.nan)
+
+
+def gaussian_process(stations, grid):
+    """(mean, std) per grid cell from a GP fitted to the stations that reported."""
+    from sklearn.gaussian_process import GaussianProcessRegressor
+    from sklearn.gaussian_process.kernels import RBF, ConstantKernel, WhiteKernel
+
+    known = stations.dropna(subset=["aqi"])
+    kernel = ConstantKernel(1.0) * RBF(length_scale=5.0, length_scale_bounds=(0.5, 100.0)) + WhiteKernel(0.1)
+    gp = GaussianProcessRegressor(kernel=kernel, normalize_y=True, random_state=0)
+    gp.fit(grid.project(known["lat"], known["lon"]), known["aqi"].to_numpy(dtype=float))
+    return gp.predict(grid.points(), return_std=True)
+
+
+@metrics.timer("spatial_interpolate")
+def interpolate(stations, grid=None, method=METHOD, **kwargs):
+    """Frame of lat, lon, aqi (and aqi_std for "gp") per cell of grid."""
+    grid = Grid() if grid is None else grid
+    out = grid.frame()
+    if stations["aqi"].notna().sum() == 0:
+        out["aqi"] = np.nan
+        return out
+    if method == "gp":
+        out["aqi"], out["aqi_std"] = gaussian_process(stations, grid)
+    elif method == "idw":
+        out["aqi"] = idw(stations, grid, **kwargs)
+    else:
+        raise ValueError(f"Unknown interpolation method {method!r} (idw or gp)")
+    return out
+
+
+@metrics.timer("job", job="spatial")
+def main(method=METHOD):
+    stations = fetch_stations(api_token())
+    if stations is None or stations["aqi"].notna().sum() == 0:
+        # Fail the run, so the scheduler retries it with backoff
+        raise RuntimeError(f"No station readings; kept the previous {GRID_FILE}")
+    grid = interpolate(stations, method=method)
+    grid.insert(0, "time", datetime.now().replace(microsecond=0))
+    os.makedirs(os.path.dirname(GRID_FILE), exist_ok=True)
+    stations.to_csv(STATIONS_FILE, index=False)
+    grid.round({"lat": 5, "lon": 5, "aqi": 2, "aqi_std": 2}).to_csv(GRID_FILE, index=False)
+    print(f"Interpolated {stations['aqi'].notna().sum()} stations onto {len(grid)} cells in {GRID_FILE}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Interpolate station AQI onto a grid over Karachi.")
+    parser.add_argument("--method", choices=["idw", "gp"], default=METHOD)
+    args = parser.parse_args()
+    main(args.method)
@@ -0,0 +1,25 @@
+import pandas as pd
+from src import alerts
+
+
+def _breaches():
+    return pd.DataFrame({"source": ["3-Day Forecast"], "prediction_time": [pd.Timestamp("2026-01-02")],
+                         "aqi": [250.0], "band_rank": [0], "band": ["high"]})
+
+
+def test_digest_without_a_channel_is_not_delivered(monkeypatch):
+    monkeypatch.delenv("ALERT_EMAIL_TO", raising=False)
+    monkeypatch.delenv("ALERT_WEBHOOK_URL", raising=False)
+    assert alerts.Notifier().send_digest(_breaches()) is False
+
+
+def test_undelivered_breaches_are_not_recorded(tmp_path, monkeypatch):
+    forecast = tmp_path / "forecast_3day.csv"
+    pd.DataFrame({"prediction_time": ["2026-01-02"], "aqi_predicted": [250.0]}).to_csv(forecast, index=False)
+    monkeypatch.setattr(alerts, "FORECAST_FILE", str(forecast))
+    monkeypatch.setattr(alerts, "load_latest_prediction", lambda: None)
+    monkeypatch.delenv("ALERT_EMAIL_TO", raising=False)
+    monkeypatch.delenv("ALERT_WEBHOOK_URL", raising=False)
+    state = tmp_path / "alert_state.json"
+    assert alerts.check_and_alert(state_file=str(state)) == 0
+    assert not state.exists()
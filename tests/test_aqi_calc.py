@@ -0,0 +1,16 @@
+import numpy as np
+from src import aqi_calc
+
+
+def test_concentrations_above_a_table_are_capped_at_its_top_index():
+    for standard in aqi_calc.STANDARDS:
+        for pollutant in aqi_calc.POLLUTANTS:
+            top = aqi_calc.breakpoints(pollutant, standard)[3][-1]
+            assert aqi_calc.sub_index([1e6], pollutant, standard)[0] == top
+    assert aqi_calc.breakpoints("o3")[3][-1] == 300
+
+
+def test_breakpoint_edges_and_gaps():
+    # 9.05 is truncated to 9.0, the top of the first PM2.5 range
+    assert aqi_calc.sub_index([0.0, 9.0, 9.05, 9.1, np.nan], "pm25", "epa")[:4].tolist() == [0, 50, 50, 51]
+    assert np.isnan(aqi_calc.sub_index([np.nan], "pm25")[0])
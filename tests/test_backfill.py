@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+import backfill_data
+
+
+def _long_export(path, times):
+    rows = [{"datetime": t, "location": "Karachi", "parameter": "pm25", "value": 40.0, "unit": "µg/m³"}
+            for t in times]
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+def test_end_date_covers_the_whole_day(tmp_path):
+    times = pd.date_range("2024-12-30", "2025-01-01 23:00", freq="h").strftime("%Y-%m-%dT%H:%M:%S")
+    path = _long_export(tmp_path / "openaq.csv", times)
+    out = pd.concat(backfill_data.read_export(path, end="2024-12-31"))
+    assert out[backfill_data.TIME_COL].max() == pd.Timestamp("2024-12-31 23:00")
+    out = pd.concat(backfill_data.read_export(path, end="2024-12-31 12:00"))
+    assert out[backfill_data.TIME_COL].max() == pd.Timestamp("2024-12-31 12:00")
+
+
+def test_long_export_out_of_time_order_is_rejected(tmp_path):
+    times = pd.date_range("2024-01-01", periods=48, freq="h")[::-1].strftime("%Y-%m-%dT%H:%M:%S")
+    path = _long_export(tmp_path / "openaq.csv", times)
+    with pytest.raises(ValueError, match="sorted by time"):
+        list(backfill_data.read_export(path, chunk_rows=10))
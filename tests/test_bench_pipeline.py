@@ -0,0 +1,29 @@
+"""Every pipeline stage at 10^3 rows, each in a fresh process, as a pytest suite.
+
+Seconds and peak memory are attached to each test (record_property, e.g.
+in --junitxml reports). Larger sizes: python -m benchmarks.bench_pipeline.
+"""
+import os
+import pytest
+from benchmarks import bench_pipeline
+
+ROWS = 1000
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def workspace(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as mp:
+        for key, value in bench_pipeline.child_environ(REPO).items():
+            mp.setenv(key, value)
+        path = str(tmp_path_factory.mktemp("bench"))
+        bench_pipeline.prepare(path, ROWS)
+        yield path
+
+
+@pytest.mark.parametrize("stage", list(bench_pipeline.STAGES))
+def test_stage(workspace, stage, record_property):
+    result = bench_pipeline.measure(stage, workspace, ROWS, repeat=1)
+    assert "error" not in result, result["error"]
+    record_property("seconds", result["seconds"])
+    record_property("peak_memory_bytes", result["peak_memory_bytes"])
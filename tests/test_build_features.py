@@ -0,0 +1,39 @@
+import pandas as pd
+from src import build_features, history_store
+
+
+def _predictions(*times):
+    return pd.DataFrame({"prediction_time": pd.to_datetime(list(times)),
+                         "aqi_predicted": [150.0 + i for i in range(len(times))]})
+
+
+def test_features_follow_the_store_when_a_day_is_replaced(tmp_path):
+    root = str(tmp_path / "history")
+    features = str(tmp_path / "features.csv")
+    watermark = str(tmp_path / "watermark.json")
+    run = lambda: build_features.compute_and_append(features_file=features, watermark_file=watermark,
+                                                    history_root=root)
+    history_store.upsert(_predictions("2025-08-15 09:00", "2025-08-16 09:00", "2025-08-16 12:00"), root)
+    run()
+    # The predict job upserts today's rows again later in the day
+    history_store.upsert(_predictions("2025-08-16 15:00"), root)
+    run()
+    history_store.upsert(_predictions("2025-08-16 18:00", "2025-08-17 06:00"), root)
+    run()
+
+    stored = history_store.read_range(root=root)["prediction_time"]
+    written = pd.read_csv(features, parse_dates=["prediction_time"])["prediction_time"]
+    assert list(written) == list(stored)
+    assert list(written) == list(pd.to_datetime(["2025-08-15 09:00", "2025-08-16 18:00", "2025-08-17 06:00"]))
+
+
+def test_truncate_from_day_keeps_older_rows(tmp_path):
+    path = tmp_path / "features.csv"
+    lines = ["prediction_time,hour,day_of_week,aqi_predicted"]
+    lines += [f"2025-08-{d:02d} {h:02d}:00:00.000000,{h},0,100.0" for d in range(1, 29) for h in range(24)]
+    path.write_text("\n".join(lines) + "\n")
+    build_features.truncate_from_day(str(path), pd.Timestamp("2025-08-20"), block=100)
+    df = pd.read_csv(path, parse_dates=["prediction_time"])
+    assert len(df) == 19 * 24 and df["prediction_time"].max() == pd.Timestamp("2025-08-19 23:00")
+    build_features.truncate_from_day(str(path), pd.Timestamp("2025-07-01"))
+    assert path.read_text() == lines[0] + "\n"
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+from src import rolling_features as rf
+from benchmarks.bench_rolling_features import synthetic_series
+
+
+def test_streaming_matches_batch(tmp_path):
+    # Irregular series with gaps, NaNs and duplicate timestamps, with a save/load of the state halfway
+    n = 3000
+    df = synthetic_series(n)
+    batch = rf.compute_batch(df)
+    engine = rf.RollingFeatureEngine()
+    rows = []
+    for i, (ts, values) in enumerate(zip(df["timestamp"], df[rf.POLLUTANTS].to_dict(orient="records"))):
+        if i == n // 2:
+            engine.save(str(tmp_path / "state.json"))
+            engine = rf.RollingFeatureEngine.load(str(tmp_path / "state.json"))
+        rows.append(engine.update(ts, values))
+    stream = pd.DataFrame(rows, index=df.index)[batch.columns]
+    ok = np.isclose(stream.to_numpy(), batch.to_numpy(), rtol=1e-7, atol=1e-7, equal_nan=True)
+    assert ok.all(), f"{(~ok).sum()} mismatches in {list(batch.columns[~ok.all(axis=0)])}"
+
+
+def test_engine_from_history_continues_the_batch_features():
+    df = synthetic_series(2000, seed=1)
+    engine = rf.RollingFeatureEngine.from_history(df.iloc[:1500])
+    rows = [engine.update(ts, values) for ts, values in
+            zip(df["timestamp"].iloc[1500:], df[rf.POLLUTANTS].iloc[1500:].to_dict(orient="records"))]
+    batch = rf.compute_batch(df).iloc[1500:]
+    stream = pd.DataFrame(rows, index=batch.index)[batch.columns]
+    assert np.allclose(stream.to_numpy(), batch.to_numpy(), rtol=1e-7, atol=1e-7, equal_nan=True)
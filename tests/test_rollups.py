@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+from src import history_store, rollups
+from benchmarks.bench_rollups import write_store
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    root = str(tmp_path_factory.mktemp("history"))
+    last = write_store(root, 2 * 365 * 24)
+    rollups.rebuild(root)
+    return root, last
+
+
+@pytest.mark.parametrize("days", [50, 84, 90, 100, 400])
+def test_series_stays_under_max_points(store, days):
+    root, last = store
+    start = last - pd.Timedelta(days=days)
+    df, resolution = rollups.series(start, root=root)
+    assert len(df) <= rollups.MAX_POINTS
+    if resolution == "raw":
+        assert len(df) == len(history_store.read_range(start, root=root))
+
+
+def test_count_includes_partial_first_month(store):
+    root, last = store
+    start = last - pd.Timedelta(days=100)
+    rows = history_store.read_range(start, root=root)
+    # Within the hour of start
+    assert 0 <= rollups.count(start, root=root) - len(rows) < 24
+
+
+def test_rollup_reads_include_bucket_holding_start(store):
+    root, last = store
+    start = (last - pd.Timedelta(days=400)).replace(day=15)
+    df, resolution = rollups.series(start, root=root)
+    assert resolution != "raw"
+    assert df[rollups.BUCKET_COL].iloc[0] == rollups.bucket_start(resolution, start)
@@ -0,0 +1,55 @@
+from src import scheduler
+from src.scheduler import HOUR, Stage
+
+
+def _state(**stages):
+    return {"stages": stages, "hashes": {}}
+
+
+def test_cron_cadence_equal_to_interval_runs_every_tick():
+    # Cron fires every 3 h; the last predict started at the previous tick
+    # and took a few minutes, and this runner started a little early.
+    stage = Stage("predict", "predict", every=3 * HOUR)
+    tick = 1_000_000.0
+    state = _state(predict={"ok": True, "started": tick, "finished": tick + 240, "inputs": {}})
+    assert scheduler.reason_to_run(stage, state, {}, now=tick + 3 * HOUR - 5) is not None
+    assert scheduler.reason_to_run(stage, state, {}, now=tick + 3 * HOUR + 60) is not None
+    assert scheduler.reason_to_run(stage, state, {}, now=tick + HOUR) is None
+
+
+def test_state_without_start_time_uses_finish_time():
+    stage = Stage("fetch", "fetch", every=HOUR)
+    state = _state(fetch={"ok": True, "finished": 0.0, "inputs": {}})
+    assert scheduler.reason_to_run(stage, state, {}, now=HOUR) is not None
+
+
+def test_failed_stage_backs_off(tmp_path):
+    stage = Stage("fetch", "fetch", outputs=[str(tmp_path / "missing.csv")], every=HOUR)
+    state = _state(fetch={"ok": False, "attempted": 0.0, "failures": 3})
+    delay = scheduler.retry_delay(stage, 3)
+    assert delay == min(HOUR, scheduler.RETRY_SECONDS * 4)
+    # Missing outputs do not force a retry before the backoff is over
+    assert scheduler.reason_to_run(stage, state, {}, now=delay - 1) is None
+    assert scheduler.reason_to_run(stage, state, {}, now=delay + 1) is not None
+    assert scheduler.retry_delay(stage, 20) == HOUR
+
+
+def test_daemon_waits_for_failed_stage_and_its_dependents(tmp_path):
+    stages = [Stage("fetch", "fetch", outputs=["a"], every=HOUR), Stage("use", "use", inputs=["a"])]
+    path = tmp_path / "state.json"
+    scheduler.save_state(_state(fetch={"ok": False, "attempted": 100.0, "failures": 1}), str(path))
+    wait = scheduler.seconds_until_due(stages, str(path), now=100.0)
+    assert wait == scheduler.retry_delay(stages[0], 1)
+
+
+def test_failed_fetch_marks_stage_failed_and_backs_off(tmp_path, monkeypatch):
+    import aqi
+    import forecast_aqi
+    monkeypatch.setattr(forecast_aqi, "fetch_forecast", lambda: None)
+    monkeypatch.setitem(aqi.JOBS, "forecast", (lambda args: forecast_aqi.main(), ""))
+    stages = [Stage("forecast", "forecast", every=24 * HOUR)]
+    path = str(tmp_path / "state.json")
+    assert scheduler.run_once(stages, state_path=path) == {"forecast": "failed"}
+    state = scheduler.load_state(path)
+    assert state["stages"]["forecast"]["failures"] == 1
+    assert scheduler.reason_to_run(stages[0], state, {}) is None
@@ -0,0 +1,19 @@
+import pandas as pd
+import pytest
+from src import schema
+from benchmarks import synthetic
+
+
+@pytest.mark.parametrize("name", list(synthetic.SCHEMAS))
+def test_written_data_loads_with_the_project_schema(tmp_path, name):
+    path = synthetic.write(str(tmp_path / f"{name}.csv"), 500, name, stations=2, chunk_rows=200)
+    df = schema.load(name, path)
+    assert len(df) == 500
+    assert df[schema.DATASETS[name].time_col].notna().all()
+
+
+def test_generator_is_seeded():
+    a = synthetic.generate(1000, "raw", stations=3, seed=7)
+    b = synthetic.generate(1000, "raw", stations=3, seed=7)
+    pd.testing.assert_frame_equal(a, b)
+    assert not a.equals(synthetic.generate(1000, "raw", stations=3, seed=8))
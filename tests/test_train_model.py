@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import train_model
+from benchmarks import synthetic
+
+
+def test_warm_start_scores_the_rows_appended_to_the_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "raw.csv")
+    synthetic.write(path, 300, "raw")
+    X, y = train_model.load_data(path)
+    model, n_rows = train_model.train_full(X, y), len(X)
+    # A backfill appends rows older than everything already in the file
+    backfill = pd.read_csv(path).head(20).assign(aqi=999)
+    backfill.to_csv(path, mode="a", header=False, index=False)
+    X, y = train_model.load_data(path)
+    assert (y.iloc[-(len(X) - n_rows):] != 999).all()
+
+    scored = []
+    monkeypatch.setattr(train_model, "rmse", lambda y_true, y_pred: scored.append(np.asarray(y_true)) or 0.0)
+    monkeypatch.setattr(train_model, "WARM_START_TREES", 1)
+    train_model.train_warm_start(model, X, y, len(X) - n_rows)
+    assert len(scored[0]) and (scored[0] == 999).all()
+
+
+
+def test_full_training_refits_on_every_row(tmp_path, monkeypatch):
+    from sklearn.ensemble import RandomForestRegressor
+    fitted = []
+    fit = RandomForestRegressor.fit
+    monkeypatch.setattr(RandomForestRegressor, "fit", lambda self, X, y: fitted.append(len(X)) or fit(self, X, y))
+    X, y = train_model.load_data(synthetic.write(str(tmp_path / "raw.csv"), 300, "raw"))
+    train_model.train_full(X, y)
+    assert fitted[-1] == len(X)
@@ -1,55 +1,179 @@
-import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error
+import os
+import json
+import time
+import hashlib
+import argparse
+from datetime import datetime
 import numpy as np
 import joblib
+from src import aqi_calc, compact_model, schema
 
 # === CONFIG ===
 RAW_DATA_CSV = "data/raw_aqi_data_karachi.csv"
+TIME_COL = schema.DATASETS["raw"].time_col
 MODEL_PATH = "models/karachi_aqi_model.pkl"
+# Fingerprint of the data the saved model was trained on, plus timings
+META_PATH = "models/karachi_aqi_model.meta.json"
 VALIDATION_SPLIT = True  # Set False if no validation needed
+VALIDATION_FRACTION = 0.2  # the most recent rows are held out
+FEATURES = ['pm25', 'pm10', 'o3', 'co', 'no2', 'so2', 'hour', 'day', 'month', 'aqi_change']
+N_ESTIMATORS = 100
+N_JOBS = int(os.getenv("TRAIN_N_JOBS", -1))  # -1 = all cores
+# Trees added per warm-start update, and the size at which we retrain from scratch
+WARM_START_TREES = 10
+MAX_TREES = 300
+CHUNK = 1 << 20
+# Also write the compact, memory-mappable artifact used for serving
+EXPORT_COMPACT = True
 
-# === STEP 1: Load historical data ===
-df = pd.read_csv(RAW_DATA_CSV)
-
-# === STEP 2: Ensure all required columns exist ===
-required_cols = ['pm25', 'pm10', 'o3', 'co', 'no2', 'so2', 'hour', 'day', 'month', 'aqi_change', 'aqi']
-for col in required_cols:
-    if col not in df.columns:
-        df[col] = 0.0  # placeholder if missing
-
-# === STEP 3: Convert feature columns to numeric ===
-X = df[['pm25','pm10','o3','co','no2','so2','hour','day','month','aqi_change']].apply(pd.to_numeric, errors='coerce')
-y = pd.to_numeric(df['aqi'], errors='coerce')
-
-# === STEP 4: Drop rows with NaN ===
-X = X.dropna()
-y = y[X.index]
-
-# === STEP 5: Train model ===
-if VALIDATION_SPLIT:
-    # Split data into train and validation
-    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
-    
-    # Predictions
-    y_train_pred = model.predict(X_train)
-    y_val_pred = model.predict(X_val)
-    
-    # Calculate RMSE
-    rmse_train = np.sqrt(mean_squared_error(y_train, y_train_pred))
-    rmse_val = np.sqrt(mean_squared_error(y_val, y_val_pred))
-    print(f"Training RMSE: {rmse_train:.2f}")
-    print(f"Validation RMSE: {rmse_val:.2f}")
-else:
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
+
+def fingerprint(path, nbytes=None):
+    """sha256 of the first nbytes of the file (all of it by default)."""
+    h = hashlib.sha256()
+    remaining = os.path.getsize(path) if nbytes is None else nbytes
+    with open(path, "rb") as f:
+        while remaining > 0:
+            block = f.read(min(CHUNK, remaining))
+            if not block:
+                break
+            h.update(block)
+            remaining -= len(block)
+    h.update(repr((FEATURES, N_ESTIMATORS)).encode())
+    return h.hexdigest()
+
+
+def load_meta(path=META_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_meta(meta, path=META_PATH):
+    with open(path, "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def load_frame(path=RAW_DATA_CSV):
+    """Features, target and timestamp, oldest first, without incomplete rows.
+
+    The index is each row's position in the file.
+    """
+    df = schema.load("raw", path)
+
+    # Ensure all required columns exist
+    for col in FEATURES + ['aqi']:
+        if col not in df.columns:
+            df[col] = np.float32(0)  # placeholder if missing
+
+    # Rows stored without an AQI (older backfills) are labelled with their highest sub-index
+    missing = df['aqi'].isna().to_numpy()
+    if missing.any():
+        pollutants = [c for c in aqi_calc.POLLUTANTS if c in FEATURES]
+        df.loc[missing, 'aqi'] = aqi_calc.combine(df.loc[missing, pollutants])[0].astype(np.float32)
+
+    # Drop rows with NaN
+    out = df[FEATURES + ['aqi', TIME_COL]].dropna(subset=FEATURES + ['aqi'])
+    # Rows without a usable timestamp keep their file position at the end
+    return out.sort_values(TIME_COL, kind="stable", na_position="last")
+
+
+def load_data(path=RAW_DATA_CSV):
+    df = load_frame(path)
+    return df[FEATURES], df['aqi']
+
+
+def rmse(y_true, y_pred):
+    return float(np.sqrt(np.mean((np.asarray(y_true, dtype=float) - y_pred) ** 2)))
+
+
+def train_full(X, y):
+    # Imported here: sklearn costs ~1 s of start-up that skip runs don't need
+    from sklearn.ensemble import RandomForestRegressor
+    model = RandomForestRegressor(n_estimators=N_ESTIMATORS, random_state=42, n_jobs=N_JOBS)
+    n_val = int(len(X) * VALIDATION_FRACTION) if VALIDATION_SPLIT else 0
+    if n_val:
+        # Hold out the most recent rows: a random split would train on the future
+        X_train, X_val, y_train, y_val = X.iloc[:-n_val], X.iloc[-n_val:], y.iloc[:-n_val], y.iloc[-n_val:]
+        model.fit(X_train, y_train)
+        print(f"Validation RMSE: {rmse(y_val, model.predict(X_val)):.2f}")
+    # The saved model is fitted on every row, the most recent ones included
     model.fit(X, y)
-    y_pred = model.predict(X)
-    rmse = np.sqrt(mean_squared_error(y, y_pred))
-    print(f"Training RMSE: {rmse:.2f}")
+    print(f"Training RMSE: {rmse(y, model.predict(X)):.2f}")
+    return model
+
+
+def train_warm_start(model, X, y, n_new_rows):
+    """Add trees fitted on the grown dataset to an existing forest."""
+    if n_new_rows > 0:
+        # The appended rows are unseen by the current forest: a fair check. They are the last
+        # ones in the file, not by time (a backfill appends older rows), so pick them by position.
+        new = X.index.sort_values()[-n_new_rows:]
+        X_new, y_new = X.loc[new], y.loc[new]
+        print(f"RMSE on appended rows before update: {rmse(y_new, model.predict(X_new)):.2f}")
+    model.set_params(warm_start=True, n_jobs=N_JOBS,
+                     n_estimators=model.n_estimators + WARM_START_TREES)
+    model.fit(X, y)
+    model.set_params(warm_start=False)
+    print(f"Training RMSE: {rmse(y, model.predict(X)):.2f}")
+    return model
+
+
+def plan(meta, data_path=RAW_DATA_CSV, model_path=MODEL_PATH):
+    """Decide between "skip", "warm_start" and "full" training."""
+    if meta is None or not os.path.exists(model_path):
+        return "full"
+    size = os.path.getsize(data_path)
+    if size == meta["data_bytes"] and fingerprint(data_path) == meta["data_fingerprint"]:
+        return "skip"
+    appended = size > meta["data_bytes"] and fingerprint(data_path, meta["data_bytes"]) == meta["data_fingerprint"]
+    if appended and meta["n_estimators"] + WARM_START_TREES <= MAX_TREES:
+        return "warm_start"
+    return "full"
+
+
+def main(force=False, data_path=RAW_DATA_CSV, model_path=MODEL_PATH, meta_path=META_PATH):
+    meta = load_meta(meta_path)
+    mode = "full" if force else plan(meta, data_path, model_path)
+    if mode == "skip":
+        print(f"{data_path} unchanged since last training, skipping (use --force to retrain)")
+        if EXPORT_COMPACT and not os.path.exists(compact_model.compact_path(model_path)):
+            compact_model.export(joblib.load(model_path), compact_model.compact_path(model_path))
+        return meta
+
+    X, y = load_data(data_path)
+    t0 = time.perf_counter()
+    if mode == "warm_start":
+        model = joblib.load(model_path)
+        model = train_warm_start(model, X, y, len(X) - meta["n_rows"])
+    else:
+        model = train_full(X, y)
+    train_seconds = time.perf_counter() - t0
+
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    joblib.dump(model, model_path)
+    if EXPORT_COMPACT:
+        compact_model.export(model, compact_model.compact_path(model_path))
+    meta = {
+        "mode": mode,
+        "trained_at": datetime.now().isoformat(timespec="seconds"),
+        "data_fingerprint": fingerprint(data_path),
+        "data_bytes": os.path.getsize(data_path),
+        "n_rows": len(X),
+        "n_estimators": model.n_estimators,
+        "train_seconds": round(train_seconds, 3),
+        "model_bytes": os.path.getsize(model_path),
+    }
+    if EXPORT_COMPACT:
+        meta["compact_model_bytes"] = os.path.getsize(compact_model.compact_path(model_path))
+    save_meta(meta, meta_path)
+    print(f"Model trained ({mode}, {model.n_estimators} trees, {train_seconds:.2f}s, "
+          f"{meta['model_bytes'] / 1e6:.1f} MB) and saved as {model_path}")
+    return meta
+
 
-# === STEP 6: Save trained model ===
-joblib.dump(model, MODEL_PATH)
-print(f"Model trained and saved as {MODEL_PATH}")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the AQI model.")
+    parser.add_argument("--force", action="store_true", help="retrain from scratch even if the data is unchanged")
+    args = parser.parse_args()
+    main(force=args.force)